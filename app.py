@@ -1,36 +1,64 @@
 from flask import Flask, jsonify
 from config import Config
+from db_config import init_database
+from extensions import db  # noqa: F401  (re-exported: ``from app import create_app, db``)
 from logging_config import configure_logging
-from flask_sqlalchemy import SQLAlchemy
+from utils.json_provider import init_json
 
-db = SQLAlchemy()
+# name -> (module, attribute, url prefix); BLUEPRINTS selects which ones a process imports
+BLUEPRINT_MANIFEST = {
+    'auth': ('blueprints.auth', 'auth_bp', '/api/auth'),
+    'users': ('blueprints.users', 'users_bp', '/api/users'),
+    'files': ('blueprints.files', 'files_bp', '/api/files'),
+    'images': ('blueprints.images', 'images_bp', '/api/images'),
+    'search': ('blueprints.search', 'search_bp', '/api/search'),
+    'processing': ('blueprints.processing', 'processing_bp', '/api/process'),
+    'analytics': ('blueprints.analytics', 'analytics_bp', '/api/analytics'),
+    'web': ('blueprints.web', 'web_bp', '/web'),
+}
+
+
+def register_blueprints(app):
+    names = app.config.get('BLUEPRINTS') or list(BLUEPRINT_MANIFEST)
+    if isinstance(names, str):
+        names = [n.strip() for n in names.split(',') if n.strip()]
+    unknown = sorted(set(names) - set(BLUEPRINT_MANIFEST))
+    if unknown:
+        raise ValueError(f"unknown blueprints in BLUEPRINTS: {', '.join(unknown)}")
+    for name in names:
+        module, attr, prefix = BLUEPRINT_MANIFEST[name]
+        # __import__ rather than importlib.import_module: only the former shows up in -X importtime
+        app.register_blueprint(getattr(__import__(module, fromlist=[attr]), attr), url_prefix=prefix)
 
 
 def create_app(config_overrides: dict | None = None):
+    from services.upload_spool import UploadRequest
+
     app = Flask(__name__)
+    app.request_class = UploadRequest
     app.config.from_object(Config)
     if config_overrides:
         app.config.update(config_overrides)
     configure_logging(app)
-    db.init_app(app)
-
-    from blueprints.auth import auth_bp
-    from blueprints.files import files_bp
-    from blueprints.images import images_bp
-    from blueprints.search import search_bp
-    from blueprints.processing import processing_bp
-    from blueprints.analytics import analytics_bp
-    from blueprints.web import web_bp
-    from blueprints.users import users_bp
-
-    app.register_blueprint(auth_bp, url_prefix="/api/auth")
-    app.register_blueprint(users_bp, url_prefix="/api/users")
-    app.register_blueprint(files_bp, url_prefix="/api/files")
-    app.register_blueprint(images_bp, url_prefix="/api/images")
-    app.register_blueprint(search_bp, url_prefix="/api/search")
-    app.register_blueprint(processing_bp, url_prefix="/api/process")
-    app.register_blueprint(analytics_bp, url_prefix="/api/analytics")
-    app.register_blueprint(web_bp, url_prefix="/web")
+    init_json(app)
+    init_database(app, db)
+    register_blueprints(app)
+
+    from cli import register_commands
+    register_commands(app)
+
+    from services.metrics import init_metrics
+    init_metrics(app)
+    # after init_metrics: after_request hooks run in reverse, so metrics count the compressed bytes
+    from services.compression import init_compression
+    init_compression(app)
+
+    @app.before_request
+    def _start_job_engine():
+        # pending jobs persisted before a restart resume once the app serves traffic
+        if app.config.get('JOB_AUTOSTART') and not app.testing and 'job_engine' not in app.extensions:
+            from services.jobs import get_job_engine
+            get_job_engine()
 
     @app.route('/')
     def index():
@@ -0,0 +1,264 @@
+"""ASGI entry point: ``uvicorn --factory asgi:create_asgi_app --workers 4``.
+
+Under WSGI a request holds a worker thread from the first byte of its body to
+the last byte of its response, so a handful of slow mobile clients uploading
+or downloading large files is enough to exhaust the pool. ``AsyncBridge``
+serves the same Flask app but keeps the slow network halves on the event loop
+and borrows a thread (one of ``ASGI_THREADS``) only while Flask code runs:
+
+* the request body is received asynchronously into a spooled temp file
+  (memory up to ``ASGI_BODY_MEMORY_BYTES``, then disk under ``UPLOAD_FOLDER``)
+  before the view is called, so upload views read from local storage;
+* the response iterable is pulled ``ASGI_CHUNK_BYTES`` at a time on the pool
+  and sent from the loop, so a slow reader costs no thread between chunks;
+  ``send_file`` bodies are read in pieces of that size;
+* ``GET /api/process/status?wait=N`` long-polls without a thread: the view is
+  re-run with ``wait=0`` every ``PROCESS_STATUS_POLL_SECONDS`` until it
+  reports ``settled`` (uncompressed; the final answer is rendered once more
+  with the client's ``Accept-Encoding``).
+
+Blueprints are unchanged; async views (``/api/search/all``) run in both modes.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+
+from werkzeug.wsgi import FileWrapper
+
+from app import create_app
+
+LONG_POLL_PATH = '/api/process/status'
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+def _unsupported_write(data):
+    raise NotImplementedError('the WSGI write() callable is not supported')
+
+
+class AsyncBridge:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        self.executor = ThreadPoolExecutor(max_workers=config['ASGI_THREADS'], thread_name_prefix='asgi')
+        self.memory_bytes = config['ASGI_BODY_MEMORY_BYTES']
+        self.max_body = config['ASGI_MAX_BODY_BYTES']
+        self.chunk_bytes = config['ASGI_CHUNK_BYTES']
+        self.spool_dir = config['UPLOAD_FOLDER']
+        self.poll_seconds = config['PROCESS_STATUS_POLL_SECONDS']
+        self.max_wait = config['PROCESS_STATUS_MAX_WAIT']
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise NotImplementedError(f"unsupported ASGI scope {scope['type']!r}")
+        try:
+            body, length = await self._receive_body(receive)
+        except BodyTooLarge:
+            return await self._send_json(send, 413, {'success': False, 'data': None, 'error': {
+                'code': 1002, 'message': 'request body too large', 'details': None}})
+        except ClientDisconnected:
+            return
+
+        disconnected = asyncio.Event()
+
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            poll = self._long_poll(scope)
+            if poll is not None:
+                body.close()
+                await self._serve_long_poll(scope, send, disconnected, *poll)
+            else:
+                await self._serve(self._environ(scope, body, length), send, disconnected)
+        finally:
+            watcher.cancel()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _receive_body(self, receive):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        body = tempfile.SpooledTemporaryFile(max_size=self.memory_bytes, prefix='.asgi-', dir=self.spool_dir)
+        length = 0
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    raise ClientDisconnected()
+                chunk = message.get('body', b'')
+                length += len(chunk)
+                if self.max_body and length > self.max_body:
+                    raise BodyTooLarge()
+                if chunk:
+                    body.write(chunk)
+                if not message.get('more_body'):
+                    body.seek(0)
+                    return body, length
+        except BaseException:
+            body.close()
+            raise
+
+    def _environ(self, scope, body, length: int, query_string: bytes | None = None) -> dict:
+        script_name = scope.get('root_path', '')
+        path = scope['path']
+        if script_name and path.startswith(script_name):
+            path = path[len(script_name):]
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name.encode('utf8').decode('latin1'),
+            'PATH_INFO': path.encode('utf8').decode('latin1'),
+            'QUERY_STRING': (scope['query_string'] if query_string is None else query_string).decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(length),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            # send_file() wraps its file with this; read in large pieces so each pool hop moves a chunk
+            'wsgi.file_wrapper': lambda f, buffer_size=8192: FileWrapper(f, max(buffer_size, self.chunk_bytes)),
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin1')
+            if name == 'content-length':
+                continue
+            key = 'CONTENT_TYPE' if name == 'content-type' else 'HTTP_' + name.upper().replace('-', '_')
+            value = value.decode('latin1')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _start(self, environ: dict):
+        """Call the WSGI app and pull the first chunk (runs on the pool)."""
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]
+            return _unsupported_write
+
+        iterable = self.flask_app(environ, start_response)
+        chunks = iter(iterable)
+        try:
+            # generator bodies may only call start_response once iterated
+            first, done = self._pull(chunks)
+        except BaseException:
+            self._close(iterable)
+            raise
+        return started['status'], started['headers'], iterable, chunks, first, done
+
+    def _pull(self, chunks) -> tuple[bytes, bool]:
+        """About ``chunk_bytes`` of body, and whether the iterable is exhausted."""
+        parts, size = [], 0
+        for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= self.chunk_bytes:
+                return b''.join(parts), False
+        return b''.join(parts), True
+
+    @staticmethod
+    def _close(iterable):
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _serve(self, environ: dict, send, disconnected: asyncio.Event):
+        try:
+            status, headers, iterable, chunks, data, done = await self._run(self._start, environ)
+        finally:
+            environ['wsgi.input'].close()
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while not done and not disconnected.is_set():
+                if data:
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+                data, done = await self._run(self._pull, chunks)
+            await send({'type': 'http.response.body', 'body': data if done else b''})
+        finally:
+            await self._run(self._close, iterable)
+
+    def _long_poll(self, scope):
+        """``(wait, query string without wait)`` for a long-poll request, else None."""
+        if scope['method'] != 'GET' or scope['path'][len(scope.get('root_path', '')):] != LONG_POLL_PATH:
+            return None
+        params = parse_qsl(scope['query_string'].decode('latin1'))
+        try:
+            wait = min(float(dict(params).get('wait', 0)), self.max_wait)
+        except ValueError:
+            return None
+        if not wait > 0:
+            return None
+        return wait, urlencode([(k, v) for k, v in params if k != 'wait']).encode('latin1')
+
+    def _call(self, environ: dict):
+        status, headers, iterable, chunks, data, done = self._start(environ)
+        try:
+            while not done:
+                more, done = self._pull(chunks)
+                data += more
+            return status, headers, data
+        finally:
+            self._close(iterable)
+
+    async def _serve_long_poll(self, scope, send, disconnected: asyncio.Event, wait: float, query: bytes):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            environ = self._environ(scope, tempfile.SpooledTemporaryFile(), 0, query_string=query)
+            # the loop parses each body; only the response sent is compressed
+            accept_encoding = environ.pop('HTTP_ACCEPT_ENCODING', None)
+            status, headers, data = await self._run(self._call, environ)
+            remaining = deadline - loop.time()
+            if status != 200 or remaining <= 0 or disconnected.is_set() or json.loads(data)['data']['settled']:
+                break
+            await asyncio.sleep(min(self.poll_seconds, remaining))
+        if accept_encoding is not None and status == 200 and not disconnected.is_set():
+            environ = self._environ(scope, tempfile.SpooledTemporaryFile(), 0, query_string=query)
+            status, headers, data = await self._run(self._call, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': data})
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_asgi_app(config_overrides: dict | None = None) -> AsyncBridge:
+    return AsyncBridge(create_app(config_overrides))
@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (PROJECT_ROOT, os.path.join(PROJECT_ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from app import create_app, db  # noqa: E402
+from seed import PASSWORD, seed_images, seed_users  # noqa: E402
+
+# catalog size for the pagination benchmarks; BENCH_IMAGES=1000000 for the large run
+BENCH_IMAGES = int(os.environ.get('BENCH_IMAGES', '10000'))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('bench')
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp / 'bench.db'}",
+        "UPLOAD_FOLDER": str(tmp / "uploads"),
+        "LOG_DIR": str(tmp / "logs"),
+        "THUMB_WORKERS": 0,
+        "HASH_WORKERS": 0,
+        "JOB_AUTOSTART": False,
+        "SLOW_REQUEST_MS": 0,
+        "PAGE_SIZE_MAX": 1000,
+    })
+    with app.app_context():
+        db.create_all()
+        user_ids = seed_users(5)
+        seed_images(BENCH_IMAGES, user_ids, random.Random(1))
+    yield app
+
+
+@pytest.fixture(scope='session')
+def token(app):
+    client = app.test_client()
+    resp = client.post('/api/auth/login', json={"username": "bench0", "password": PASSWORD})
+    return resp.get_json()["data"]["access_token"]
@@ -0,0 +1,133 @@
+"""Microbenchmarks of the hot paths; not part of the default ``pytest`` run (testpaths = tests).
+Run: `pytest benchmarks --benchmark-autosave` then `pytest benchmarks --benchmark-compare`
+(or `--benchmark-json out.json`). Catalog size: BENCH_IMAGES (default 10000).
+"""
+import io
+import os
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from app import db
+from models import Image
+from services import compression
+from services.auth_cache import get_token_cache, get_user_cache, load_user
+from services.file_service import spool_stream
+from services.image_service import LIST_COLUMNS, image_query, image_rows_to_dicts, image_to_dict
+from services.pagination import count_cached, paginate
+from utils.auth import decode_token
+from utils.json_provider import OrjsonProvider
+
+KEYS = (Image.created_at, Image.id)
+PAGE_SIZES = pytest.mark.parametrize('size', [100, 1000])
+
+
+@pytest.mark.parametrize('size', [64 * 1024, 8 * 1024 * 1024], ids=['64KiB', '8MiB'])
+def test_checksum_spool(benchmark, app, tmp_path, size):
+    payload = os.urandom(size)
+
+    def spool():
+        s = spool_stream(io.BytesIO(payload), str(tmp_path))
+        s.hexdigest()
+        s.discard()
+
+    benchmark(spool)
+
+
+@pytest.mark.parametrize('cached', [False, True], ids=['cold', 'cached'])
+def test_auth_decode(benchmark, app, token, cached):
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        def auth():
+            if not cached:
+                get_token_cache().clear()
+                get_user_cache().clear()
+            return load_user(int(decode_token(token)['sub']))
+
+        assert benchmark(auth) is not None
+
+
+def test_protected_endpoint(benchmark, app, token):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    assert benchmark(client.get, '/api/users/me', headers=headers).status_code == 200
+
+
+@pytest.mark.parametrize('filters', [{}, {'category': 'travel'}, {'tags': 'cat,night'}, {'q': 'sunset'}],
+                         ids=['all', 'category', 'tags', 'fulltext'])
+def test_paginate_first_page(benchmark, app, filters):
+    with app.app_context():
+        page = benchmark(lambda: paginate(image_query(**filters), KEYS, page_size=20))
+        assert page.items
+        db.session.rollback()
+
+
+def test_paginate_deep_cursor(benchmark, app):
+    with app.app_context():
+        page = paginate(image_query(), KEYS, page_size=20)
+        for _ in range(50):
+            page = paginate(image_query(), KEYS, cursor=page.next_cursor, page_size=20)
+        cursor = page.next_cursor
+        assert benchmark(lambda: paginate(image_query(), KEYS, cursor=cursor, page_size=20)).items
+
+
+def test_count_total(benchmark, app):
+    with app.app_context():
+        app.config['PAGINATION_COUNT_TTL'] = 0
+        assert benchmark(lambda: count_cached(image_query(category='travel'))) > 0
+
+
+def test_list_images_endpoint(benchmark, app):
+    client = app.test_client()
+    assert benchmark(client.get, '/api/images?page_size=50').status_code == 200
+
+
+@PAGE_SIZES
+@pytest.mark.parametrize('mode', ['orm', 'projection'])
+def test_serialize_page(benchmark, app, mode, size):
+    """Rows -> Image dicts: ORM objects + image_to_dict vs LIST_COLUMNS tuples + image_rows_to_dicts."""
+    with app.test_request_context():
+        def build():
+            db.session.expunge_all()  # a request starts with an empty identity map
+            query = image_query().order_by(Image.id.desc()).limit(size)
+            if mode == 'orm':
+                return [image_to_dict(img) for img in query]
+            return image_rows_to_dicts(query.with_entities(*LIST_COLUMNS))
+
+        assert len(benchmark(build)) == size
+        db.session.rollback()
+
+
+def _page_payload(app, size):
+    with app.test_request_context():
+        items = image_rows_to_dicts(image_query().with_entities(*LIST_COLUMNS).order_by(Image.id.desc()).limit(size))
+        db.session.rollback()
+    return {'success': True, 'data': {'items': items, 'meta': {'page_size': size}}, 'error': None}
+
+
+@PAGE_SIZES
+@pytest.mark.parametrize('provider', ['std', 'orjson'])
+def test_json_encode_page(benchmark, app, provider, size):
+    payload = _page_payload(app, size)
+    json_provider = OrjsonProvider(app) if provider == 'orjson' else DefaultJSONProvider(app)
+    with app.app_context():
+        assert benchmark(json_provider.response, payload).status_code == 200
+
+
+@PAGE_SIZES
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_compress_page(benchmark, app, encoding, size):
+    if encoding == 'br' and compression.brotli is None:
+        pytest.skip('Brotli not installed')
+    with app.app_context():
+        body = app.json.response(_page_payload(app, size)).get_data()
+    compressed = benchmark(compression.compress, body, encoding)
+    benchmark.extra_info['ratio'] = round(len(body) / len(compressed), 1)
+
+
+@PAGE_SIZES
+@pytest.mark.parametrize('accept', ['identity', 'gzip'])
+def test_list_images_page_sizes(benchmark, app, accept, size):
+    client = app.test_client()
+    resp = benchmark(client.get, f'/api/images?page_size={size}', headers={'Accept-Encoding': accept})
+    assert resp.status_code == 200
+    benchmark.extra_info['bytes'] = len(resp.get_data())
@@ -1,8 +1,38 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, request, stream_with_context
+
+from services import analytics
+from utils.auth import jwt_required
+from utils.response import success, error
 
 analytics_bp = Blueprint('analytics', __name__)
 
+EXPORT_FORMATS = {'csv': 'text/csv; charset=utf-8', 'json': 'application/json'}
+
 
 @analytics_bp.route('/summary', methods=['GET'])
 def summary():
-    return jsonify({'summary': {}}), 200
+    window = request.args.get('window', 'week')
+    if window not in analytics.WINDOWS:
+        return error(1002, f"window must be one of {', '.join(analytics.WINDOWS)}")
+    return success(analytics.summary(window, category=request.args.get('category'),
+                                     uploader_id=request.args.get('uploader_id', type=int)))
+
+
+@analytics_bp.route('/export', methods=['GET'])
+@jwt_required(role='admin')
+def export():
+    fmt = request.args.get('format', 'csv')
+    dataset = request.args.get('dataset', 'rollups')
+    window = request.args.get('window')
+    if fmt not in EXPORT_FORMATS:
+        return error(1002, 'format must be csv or json')
+    if dataset not in analytics.EXPORTS:
+        return error(1002, f"dataset must be one of {', '.join(analytics.EXPORTS)}")
+    if window is not None and window not in analytics.WINDOWS:
+        return error(1002, f"window must be one of {', '.join(analytics.WINDOWS)}")
+
+    rows = analytics.export_rows(dataset, since=analytics.window_start(window) if window else None)
+    body = analytics.stream_csv(rows) if fmt == 'csv' else analytics.stream_json(rows)
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{dataset}.{fmt}"',
+    })
@@ -1,18 +1,35 @@
 from flask import Blueprint, request
 from utils.response import success, error
+from services.password_hasher import HasherOverloaded, HasherTimeout, get_password_hasher
 from utils.auth import (
     get_user_by_username,
     create_user,
-    verify_password,
+    jwt_required,
+    verify_password_and_update,
     create_access_token,
     create_refresh_token,
     decode_token,
+    is_refresh_token_active,
     revoke_refresh_token,
 )
 
 auth_bp = Blueprint('auth', __name__)
 
 
+@auth_bp.errorhandler(HasherOverloaded)
+def _hasher_overloaded(exc):
+    resp, status = error(2007, 'too many concurrent logins, retry shortly', status=429)
+    resp.headers['Retry-After'] = '1'
+    return resp, status
+
+
+@auth_bp.errorhandler(HasherTimeout)
+def _hasher_timeout(exc):
+    resp, status = error(2008, 'password hashing timed out', status=503)
+    resp.headers['Retry-After'] = '5'
+    return resp, status
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json() or {}
@@ -35,7 +52,7 @@ def login():
     if not username or not password:
         return error(1001, 'username and password required')
     user = get_user_by_username(username)
-    if not user or not verify_password(password, user.password_hash):
+    if not user or not verify_password_and_update(user, password):
         return error(1004, 'invalid credentials', status=401)
     access = create_access_token(user.id, user.role)
     refresh = create_refresh_token(user.id, user.role)
@@ -51,11 +68,8 @@ def refresh():
     payload = decode_token(token)
     if not payload or payload.get('type') != 'refresh':
         return error(2005, 'invalid refresh token', status=401)
-    # check if revoked
-    jti = payload.get('jti')
-    # simple revoked check handled by absence in store (not persisted yet)
-    from utils.auth import _refresh_token_store  # local import for introspection
-    if jti not in _refresh_token_store:
+    # revoked (logged out) tokens are absent from the shared token store
+    if not is_refresh_token_active(payload.get('jti')):
         return error(2006, 'refresh token revoked', status=401)
     access = create_access_token(payload['sub'], payload.get('role'))
     return success({"access_token": access})
@@ -72,3 +86,9 @@ def logout():
         return error(2005, 'invalid refresh token', status=401)
     revoke_refresh_token(payload.get('jti'))
     return success({"revoked": True})
+
+
+@auth_bp.route('/metrics', methods=['GET'])
+@jwt_required(role='admin')
+def metrics():
+    return success({"password_hasher": get_password_hasher().stats()})
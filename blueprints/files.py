@@ -1,11 +1,56 @@
-from flask import Blueprint, request, current_app
 import os
+from flask import Blueprint, request, send_file, current_app
 from werkzeug.utils import secure_filename
+from extensions import db
+from models import Image
 from utils.response import success, error
+from utils.auth import optional_user_id
+from services.blob_store import get_blob_backend
+from services.download_log import get_download_log_writer
+from services.file_service import store_upload
+from services.dedup import near_duplicates
+from services import upload_sessions
+from services.upload_sessions import UploadSessionError
 
 files_bp = Blueprint('files', __name__)
 
 
+def _image_payload(img, duplicate):
+    payload = {
+        'id': img.id,
+        'filename': img.filename,
+        'path': img.path,
+        'checksum': img.checksum,
+        'size': img.size,
+        'duplicate': duplicate,
+        'near_duplicates': [],
+    }
+    distance = current_app.config.get('PHASH_UPLOAD_DISTANCE', 4)
+    if not duplicate and img.phash is not None and distance >= 0:
+        payload['near_duplicates'] = [{'id': i, 'distance': d}
+                                      for i, d in near_duplicates(img.phash, distance, exclude=img.id, limit=10)]
+    return payload
+
+
+def _session_payload(session):
+    received = upload_sessions.received_chunks(session)
+    total = upload_sessions.total_chunks(session)
+    return {
+        'upload_id': session.id,
+        'filename': session.filename,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'total_chunks': total,
+        'received_chunks': received,
+        'missing_chunks': sorted(set(range(total)) - set(received)),
+    }
+
+
+@files_bp.errorhandler(UploadSessionError)
+def _upload_session_error(exc):
+    return error(exc.code, exc.message, status=exc.status)
+
+
 @files_bp.route('/upload', methods=['POST'])
 def upload():
     if 'file' not in request.files:
@@ -14,7 +59,77 @@ def upload():
     if not f.filename:
         return error(1002, 'empty filename')
     filename = secure_filename(f.filename)
-    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    f.save(file_path)
-    return success({'filename': filename, 'path': file_path}, status=201)
+    img, duplicate = store_upload(f, filename,
+                                  category=request.form.get('category'),
+                                  tags=request.form.get('tags'),
+                                  uploader_id=optional_user_id())
+    return success(_image_payload(img, duplicate), status=200 if duplicate else 201)
+
+
+@files_bp.route('/uploads', methods=['POST'])
+def create_upload_session():
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or data.get('size') is None:
+        return error(1001, 'filename and size required')
+    try:
+        size = int(data['size'])
+        chunk_size = int(data['chunk_size']) if data.get('chunk_size') else None
+    except (TypeError, ValueError):
+        return error(1002, 'size and chunk_size must be integers')
+    session = upload_sessions.create_session(filename, size, chunk_size=chunk_size,
+                                             checksum=data.get('checksum'),
+                                             category=data.get('category'), tags=data.get('tags'),
+                                             uploader_id=optional_user_id())
+    return success(_session_payload(session), status=201)
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['GET'])
+def upload_session_status(upload_id):
+    return success(_session_payload(upload_sessions.get_session(upload_id)))
+
+
+@files_bp.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_chunk(upload_id, index):
+    session = upload_sessions.get_session(upload_id)
+    written = upload_sessions.write_chunk(session, index, request.stream)
+    return success({'upload_id': upload_id, 'index': index, 'size': written})
+
+
+@files_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    session = upload_sessions.get_session(upload_id)
+    img, duplicate = upload_sessions.complete_session(session)
+    return success(_image_payload(img, duplicate), status=200 if duplicate else 201)
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload_session(upload_id):
+    upload_sessions.abort_session(upload_sessions.get_session(upload_id))
+    return success({'upload_id': upload_id, 'aborted': True})
+
+
+@files_bp.route('/<int:image_id>/download', methods=['GET'])
+def download(image_id):
+    img = db.session.get(Image, image_id)
+    if img is None:
+        return error(3001, 'image not found', status=404)
+    # checksum is a strong validator: answer revalidations before touching the file
+    if img.checksum and img.checksum in request.if_none_match:
+        resp = current_app.response_class(status=304)
+        resp.set_etag(img.checksum)
+        return resp
+    path = get_blob_backend().local_path(img.path)
+    if path is None or not os.path.exists(path):
+        return error(3001, 'file not found', status=404)
+    # send_file hands the open file to wsgi.file_wrapper (sendfile) and handles Range/If-Range
+    resp = send_file(path, mimetype=img.mime, download_name=img.filename,
+                     as_attachment=request.args.get('inline') != '1',
+                     etag=img.checksum or True, conditional=True,
+                     max_age=current_app.config.get('DOWNLOAD_MAX_AGE'))
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    # a 206 continuing past byte 0 is the same download resuming, not a new one
+    if resp.status_code == 200 or (resp.status_code == 206 and resp.content_range.start == 0):
+        get_download_log_writer().record(img.id, optional_user_id(), request.remote_addr)
+    return resp
@@ -1,14 +1,75 @@
-from flask import Blueprint
-from utils.response import success
+from flask import Blueprint, request, send_file, current_app
+from extensions import db
+from models import Image
+from utils.response import success, error
+from utils.imaging import THUMB_MIME
+from services.derivatives import get_or_render, snap_width
+from services.image_metadata import ORIENTATIONS
+from services.image_service import LIST_COLUMNS, image_query, image_rows_to_dicts
+from services.metadata_cache import image_detail as cached_detail, viewer_record
+from services.pagination import InvalidCursor, paginate
+from services.tags import ALL, ANY
+from utils.auth import optional_user_id
 
 images_bp = Blueprint('images', __name__)
 
 
-@images_bp.route('/', methods=['GET'])
+@images_bp.route('/', methods=['GET'], strict_slashes=False)
 def list_images():
-    return success({'items': [], 'meta': {'page': 1, 'page_size': 20, 'total': 0}})
+    args = request.args
+    sort = args.get('sort', '-created_at')
+    if sort not in ('created_at', '-created_at'):
+        return error(1002, 'sort must be created_at or -created_at')
+    page_size = max(1, min(args.get('page_size', 20, type=int), current_app.config.get('PAGE_SIZE_MAX', 100)))
+    tag_mode = args.get('tag_mode', ALL)
+    if tag_mode not in (ALL, ANY):
+        return error(1002, 'tag_mode must be all or any')
+    orientation = args.get('orientation')
+    if orientation and orientation not in ORIENTATIONS:
+        return error(1002, 'orientation must be landscape, portrait or square')
+    query = image_query(category=args.get('category'), uploader_id=args.get('uploader_id', type=int),
+                        q=args.get('q'), tags=args.get('tags'), tag_mode=tag_mode, orientation=orientation,
+                        min_width=args.get('min_width', type=int), min_height=args.get('min_height', type=int))
+    # column rows, not ORM objects: image_rows_to_dicts only reads these attributes
+    query = query.with_entities(*LIST_COLUMNS)
+    try:
+        page = paginate(query, (Image.created_at, Image.id), cursor=args.get('cursor'), page_size=page_size,
+                        descending=sort.startswith('-'), with_total=args.get('with_total') in ('1', 'true'))
+    except InvalidCursor:
+        return error(1002, 'invalid cursor')
+    return success({'items': image_rows_to_dicts(page.items), 'meta': page.meta()})
 
 
 @images_bp.route('/<int:image_id>', methods=['GET'])
 def image_detail(image_id):
-    return success({'id': image_id, 'metadata': {}})
+    found = cached_detail(image_id)
+    if found is None:
+        return error(3001, 'image not found', status=404)
+    etag, data = viewer_record(found, optional_user_id())
+    # weak comparison: compressed responses carry the ETag as W/"..."
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp, _ = success(data)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.vary.add('Authorization')
+    return resp
+
+
+@images_bp.route('/<int:image_id>/thumb', methods=['GET'])
+def thumbnail(image_id):
+    img = db.session.get(Image, image_id)
+    if img is None or not img.checksum:
+        return error(3001, 'image not found', status=404)
+    width = snap_width(request.args.get('w', type=int))
+    etag = f'{img.checksum}-{width}'
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+        resp.set_etag(etag)
+        return resp
+    path = get_or_render(img, width)
+    if path is None:
+        return error(3003, 'cannot render thumbnail for this file', status=415)
+    return send_file(path, mimetype=THUMB_MIME, etag=etag, conditional=True,
+                     max_age=current_app.config.get('DOWNLOAD_MAX_AGE'))
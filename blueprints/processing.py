@@ -1,13 +1,61 @@
-from flask import Blueprint, request
+import time
+
+from flask import Blueprint, current_app, request
+from extensions import db
+from models import Image
 from utils.response import success, error
+from services import jobs
 
 processing_bp = Blueprint('processing', __name__)
 
 
+def _job_payload(job):
+    return {
+        'id': job.id,
+        'name': job.task,
+        'status': job.status,
+        'attempts': job.attempts,
+        'last_error': job.last_error,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
 @processing_bp.route('/trigger', methods=['POST'])
 def trigger_processing():
     data = request.get_json() or {}
-    if 'image_id' not in data:
-        return error(1001, 'image_id required')
     tasks = data.get('tasks', ['embedding', 'ocr'])
-    return success({'image_id': data['image_id'], 'queued_tasks': tasks}, status=202)
+    if not isinstance(tasks, list) or not all(isinstance(t, str) for t in tasks):
+        return error(1002, 'tasks must be a list of task names')
+    jobs.get_job_engine()
+    unknown = [t for t in tasks if t not in jobs.TASKS]
+    if unknown:
+        return error(1002, 'unknown task', details={'tasks': unknown, 'available': sorted(jobs.TASKS)})
+    # catalog-wide tasks (e.g. duplicate_clusters) run once, without an image
+    image_id = data.get('image_id')
+    if image_id is None and any(jobs.TASKS[t].per_image for t in tasks):
+        return error(1001, 'image_id required')
+    if image_id is not None and db.session.get(Image, image_id) is None:
+        return error(3001, 'image not found', status=404)
+    queued = [jobs.enqueue(image_id if jobs.TASKS[t].per_image else None, t, force=bool(data.get('force')))
+              for t in tasks]
+    return success({'image_id': image_id, 'queued_tasks': tasks,
+                    'tasks': [_job_payload(j) for j in queued]}, status=202)
+
+
+@processing_bp.route('/status', methods=['GET'])
+def processing_status():
+    image_id = request.args.get('image_id', type=int)
+    if image_id is None:
+        return error(1001, 'image_id required')
+    # long-poll: hold the answer until every job has settled or `wait` seconds passed.
+    # Under WSGI this sleeps on the worker thread; asgi.py polls from the event loop instead.
+    wait = min(max(request.args.get('wait', 0, type=float), 0), current_app.config['PROCESS_STATUS_MAX_WAIT'])
+    deadline = time.monotonic() + wait
+    while True:
+        found = jobs.job_status(image_id)
+        done = jobs.settled(found)
+        if done or time.monotonic() >= deadline:
+            break
+        time.sleep(min(current_app.config['PROCESS_STATUS_POLL_SECONDS'], deadline - time.monotonic()))
+        db.session.expire_all()
+    return success({'image_id': image_id, 'settled': done, 'tasks': [_job_payload(j) for j in found]})
@@ -1,10 +1,169 @@
-from flask import Blueprint, request
-from utils.response import success
+import asyncio
+
+from flask import Blueprint, current_app, request
+from extensions import db
+from models import Image
+from utils.response import success, error
+from services.image_service import image_dicts_by_id
+from services import dedup, fulltext
 
 search_bp = Blueprint('search', __name__)
 
+# embedding_pipeline (numpy, Pillow, the vector store) is imported by the handlers that need it,
+# so workers that never serve vector search do not load it
+
+
+def _score(cosine: float) -> float:
+    # cosine in [-1, 1] -> score in [0, 1] per api_conventions
+    return round((cosine + 1.0) / 2.0, 6)
+
+
+def _results(hits):
+    images = image_dicts_by_id(i for i, _ in hits)
+    return [{'image': images[i], 'score': _score(s)} for i, s in hits if i in images]
+
+
+def _ocr_results(hits):
+    images = image_dicts_by_id(i for i, _, _ in hits)
+    return [{'image': images[i], 'score': round(score, 6), 'snippet': snippet}
+            for i, score, snippet in hits if i in images]
+
+
+def _duplicate_results(hits):
+    images = image_dicts_by_id(i for i, _ in hits)
+    return [{'image': images[i], 'distance': d} for i, d in hits if i in images]
+
+
+@search_bp.route('/similar', methods=['GET'])
+def similar_search():
+    import embedding_pipeline
+
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    image_id = request.args.get('image_id', type=int)
+    ref = request.args.get('embedding_ref')
+    if image_id is None and ref:
+        parsed = embedding_pipeline.parse_vector_ref(ref)
+        if parsed is None or parsed[0] != embedding_pipeline.MODEL_NAME:
+            return error(1002, 'unknown embedding_ref')
+        image_id = parsed[1]
+    if image_id is None:
+        return error(1001, 'image_id or embedding_ref required')
+    if db.session.get(Image, image_id) is None:
+        return error(3001, 'image not found', status=404)
+    store = embedding_pipeline.vector_store()
+    vector = store.get(image_id)
+    if vector is None:
+        return error(5001, 'no embedding for this image yet; trigger the embedding task first', status=409)
+    hits = store.search(vector, k, mode=request.args.get('mode', 'auto'), exclude={image_id})
+    return success({'image_id': image_id, 'results': _results(hits), 'k': k})
+
+
+@search_bp.route('/ocr', methods=['GET'])
+def ocr_search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return error(1001, 'q required')
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = min(max(request.args.get('page_size', 20, type=int), 1), 100)
+    try:
+        hits, total = fulltext.search(q, page, page_size)
+    except fulltext.FullTextUnavailable as exc:
+        return error(5002, 'full-text index not ready', status=503, details=str(exc))
+    return success({'query': q, 'results': _ocr_results(hits),
+                    'meta': {'page': page, 'page_size': page_size, 'total': total}})
+
+
+@search_bp.route('/duplicates', methods=['GET'])
+def duplicate_search():
+    image_id = request.args.get('image_id', type=int)
+    if image_id is None:
+        return error(1001, 'image_id required')
+    distance = min(max(request.args.get('distance', 6, type=int), 0), 16)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    img = db.session.get(Image, image_id)
+    if img is None:
+        return error(3001, 'image not found', status=404)
+    if img.phash is None:
+        return error(5001, 'no perceptual hash for this image yet; trigger the phash task first', status=409)
+    hits = dedup.near_duplicates(img.phash, distance, exclude=image_id, limit=limit)
+    return success({'image_id': image_id, 'distance': distance, 'results': _duplicate_results(hits)})
+
+
+@search_bp.route('/duplicates/clusters', methods=['GET'])
+def duplicate_clusters():
+    report = dedup.read_cluster_report()
+    if report is None:
+        return error(3001, 'no cluster report yet; trigger the duplicate_clusters task', status=404)
+    return success(report)
+
+
+class _NotReady(Exception):
+    """A fan-out source that cannot answer yet; reported per source, not as a failed request."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _ocr_source(q: str, k: int):
+    try:
+        hits, _ = fulltext.search(q, 1, k)
+    except fulltext.FullTextUnavailable:
+        raise _NotReady(5002, 'full-text index not ready') from None
+    return _ocr_results(hits)
+
+
+def _similar_source(image_id: int, k: int):
+    import embedding_pipeline
+
+    store = embedding_pipeline.vector_store()
+    vector = store.get(image_id)
+    if vector is None:
+        raise _NotReady(5001, 'no embedding for this image yet')
+    return _results(store.search(vector, k, exclude={image_id}))
+
+
+def _duplicate_source(image_id: int, distance: int, k: int):
+    img = db.session.get(Image, image_id)
+    if img is None:
+        raise _NotReady(3001, 'image not found')
+    if img.phash is None:
+        raise _NotReady(5001, 'no perceptual hash for this image yet')
+    return _duplicate_results(dedup.near_duplicates(img.phash, distance, exclude=image_id, limit=k))
+
+
+async def _in_thread(fn, *args):
+    """Run ``fn`` on a worker thread inside its own app context, hence its own DB session."""
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args)
+    return await asyncio.to_thread(run)
+
 
-@search_bp.route('/text', methods=['GET'])
-def text_search():
-    q = request.args.get('q', '')
-    return success({'query': q, 'results': [], 'k': int(request.args.get('k', 10))})
+@search_bp.route('/all', methods=['GET'])
+async def fanout_search():
+    """Query every applicable source concurrently: ocr for ``q``, similar/duplicates for ``image_id``."""
+    q = request.args.get('q', '').strip()
+    image_id = request.args.get('image_id', type=int)
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    distance = min(max(request.args.get('distance', 6, type=int), 0), 16)
+    if not q and image_id is None:
+        return error(1001, 'q or image_id required')
+    sources = {}
+    if q:
+        sources['ocr'] = _in_thread(_ocr_source, q, k)
+    if image_id is not None:
+        sources['similar'] = _in_thread(_similar_source, image_id, k)
+        sources['duplicates'] = _in_thread(_duplicate_source, image_id, distance, k)
+    outcomes = await asyncio.gather(*sources.values(), return_exceptions=True)
+    results, errors = {}, {}
+    for name, outcome in zip(sources, outcomes):
+        if isinstance(outcome, _NotReady):
+            errors[name] = {'code': outcome.code, 'message': str(outcome)}
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results[name] = outcome
+    return success({'query': q, 'image_id': image_id, 'k': k, 'results': results, 'errors': errors})
@@ -1,7 +1,7 @@
 from flask import Blueprint, request
-from utils.response import success
+from utils.response import success, error
 from utils.auth import jwt_required
-from models import User
+from services.auth_cache import load_user
 
 users_bp = Blueprint('users', __name__)
 
@@ -9,8 +9,9 @@ users_bp = Blueprint('users', __name__)
 @users_bp.route('/me', methods=['GET'])
 @jwt_required()
 def me():
-    uid = getattr(request, 'user_id', None)
-    user = User.query.get(uid)
+    user = load_user(request.user_id)
+    if user is None:
+        return error(3001, 'user not found', status=404)
     return success({
         "id": user.id,
         "username": user.username,
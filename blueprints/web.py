@@ -1,49 +1,61 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+import hashlib
+
+from flask import Blueprint, abort, current_app, render_template, request, redirect, session, url_for, flash
 from werkzeug.utils import secure_filename
-from app import db
 from models import Image
-import os
-import hashlib
-from datetime import datetime
+from services.file_service import store_upload
+from services.dedup import near_duplicates
+from services.image_service import LIST_COLUMNS, image_query
+from services.metadata_cache import image_detail as cached_detail, viewer_record
+from services.pagination import InvalidCursor, paginate
+from utils.auth import optional_user_id
 
 web_bp = Blueprint('web', __name__, url_prefix='/web')
 
 
-def _compute_checksum(file_stream):
-    sha256 = hashlib.sha256()
-    for chunk in iter(lambda: file_stream.read(8192), b''):
-        sha256.update(chunk)
-    file_stream.seek(0)
-    return sha256.hexdigest()
-
-
 @web_bp.route('/')
 def gallery():
-    page = int(request.args.get('page', 1))
-    page_size = min(int(request.args.get('page_size', 20)), 100)
+    cursor = request.args.get('cursor') or None
+    page_size = max(1, min(request.args.get('page_size', 20, type=int), current_app.config.get('PAGE_SIZE_MAX', 100)))
     category = request.args.get('category')
-    q = request.args.get('q')  # simple substring filter on filename for now
-
-    query = Image.query
-    if category:
-        query = query.filter(Image.category == category)
-    if q:
-        like = f"%{q}%"
-        query = query.filter(Image.filename.like(like))
+    q = request.args.get('q')  # full-text match on filename/tags
 
-    total = query.count()
-    items = (query.order_by(Image.created_at.desc())
-                  .offset((page - 1) * page_size)
-                  .limit(page_size)
-                  .all())
+    # column rows, not ORM objects: the cards only read these attributes
+    query = image_query(category=category, q=q).with_entities(*LIST_COLUMNS)
+    try:
+        page = paginate(query, (Image.created_at, Image.id), cursor=cursor, page_size=page_size, with_total=True)
+    except InvalidCursor:
+        return redirect(url_for('web.gallery', page_size=page_size, q=q, category=category))
 
-    return render_template('gallery.html', images=items, page=page, page_size=page_size, total=total, q=q, category=category)
+    return render_template('gallery.html', images=page.items, page=page, page_size=page_size, total=page.total, q=q, category=category)
 
 
 @web_bp.route('/images/<int:image_id>')
 def image_detail(image_id):
-    img = Image.query.get_or_404(image_id)
-    return render_template('detail.html', image=img)
+    found = cached_detail(image_id)
+    if found is None:
+        abort(404)
+    etag, data = viewer_record(found, optional_user_id())
+    # the page is the cached record rendered through the templates; a deploy that changes them changes the tag
+    etag = f'{etag}-{_template_version()}'
+    # pending flash messages are rendered into the page, so they must not be answered with a 304
+    if request.if_none_match.contains_weak(etag) and not session.get('_flashes'):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = current_app.make_response(render_template('detail.html', image=data))
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+
+def _template_version() -> str:
+    version = current_app.extensions.get('detail_template_version')
+    if version is None:
+        loader = current_app.jinja_env.loader
+        sources = (loader.get_source(current_app.jinja_env, name)[0] for name in ('layout.html', 'detail.html'))
+        version = hashlib.sha1(''.join(sources).encode()).hexdigest()[:8]
+        current_app.extensions['detail_template_version'] = version
+    return version
 
 
 @web_bp.route('/upload', methods=['GET', 'POST'])
@@ -56,19 +68,14 @@ def upload():
             flash('请选择文件', 'error')
             return redirect(request.url)
         filename = secure_filename(f.filename)
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        checksum = _compute_checksum(f.stream)
-        existing = Image.query.filter_by(checksum=checksum).first()
-        if existing:
-            flash(f'文件已存在，引用 ID={existing.id}', 'info')
-            return redirect(url_for('web.image_detail', image_id=existing.id))
-        path = os.path.join(upload_folder, filename)
-        f.save(path)
-        size = os.path.getsize(path)
-        img = Image(filename=filename, path=path, checksum=checksum, size=size, category=category, tags=tags, created_at=datetime.utcnow())
-        db.session.add(img)
-        db.session.commit()
+        img, duplicate = store_upload(f, filename, category=category, tags=tags, uploader_id=optional_user_id())
+        if duplicate:
+            flash(f'文件已存在，引用 ID={img.id}', 'info')
+            return redirect(url_for('web.image_detail', image_id=img.id))
         flash('上传成功', 'success')
+        if img.phash is not None:
+            similar = near_duplicates(img.phash, current_app.config.get('PHASH_UPLOAD_DISTANCE', 4), exclude=img.id, limit=5)
+            if similar:
+                flash('发现近似图片：' + '、'.join(f'ID={i}' for i, _ in similar), 'info')
         return redirect(url_for('web.image_detail', image_id=img.id))
     return render_template('upload.html')
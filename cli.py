@@ -0,0 +1,190 @@
+"""Flask CLI commands (``flask --app app:create_app <command>``)."""
+import click
+
+
+class LazyGroup(click.Group):
+    """Command group whose real implementation is only imported when it is invoked or listed."""
+
+    def __init__(self, name, load, **kwargs):
+        super().__init__(name, **kwargs)
+        self._load = load
+        self._group = None
+
+    def _real(self) -> click.Group:
+        if self._group is None:
+            self._group = self._load()
+        return self._group
+
+    def list_commands(self, ctx):
+        return self._real().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self._real().get_command(ctx, cmd_name)
+
+
+def register_commands(app):
+    def load_migrate_cli():
+        from db_config import init_migrations
+        from extensions import db
+        from flask_migrate.cli import db as db_cli
+        init_migrations(app, db)
+        return db_cli
+
+    app.cli.add_command(LazyGroup('db', load_migrate_cli, help='Perform database migrations (Flask-Migrate).'))
+
+    @app.cli.command('importtime')
+    @click.option('--top', default=25, show_default=True, help='Rows to show.')
+    @click.option('--by', type=click.Choice(['package', 'module']), default='package', show_default=True,
+                  help='Aggregate self time per top-level package, or list cumulative time per module.')
+    @click.option('--blueprints', default=None, help='Profile with this BLUEPRINTS setting (comma-separated).')
+    @click.option('--why', default=None, help='Show the import chain that pulled in this module.')
+    def importtime(top, by, blueprints, why):
+        """Profile create_app() imports in a fresh interpreter (python -X importtime)."""
+        from startup_profile import by_module, by_package, import_chain, profile_startup
+
+        try:
+            records, elapsed = profile_startup(env={'BLUEPRINTS': blueprints} if blueprints is not None else None)
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc))
+        total = sum(r.self_us for r in records)
+        click.echo(f'{len(records)} modules, {total / 1000:.1f} ms importing, {elapsed * 1000:.0f} ms wall')
+        rows = by_package(records) if by == 'package' else by_module(records)
+        for name, us in rows[:top]:
+            click.echo(f'{us / 1000:9.1f} ms  {name}')
+        if why:
+            chain = import_chain(records, why)
+            click.echo(f'{why}: ' + (' -> '.join(chain) if chain else 'not imported at startup'))
+
+    @app.cli.command('backfill')
+    @click.argument('task', type=click.Choice(['embedding', 'metadata', 'ocr', 'phash', 'thumbnail']))
+    @click.option('--batch-size', default=256, show_default=True, help='Images per batch.')
+    @click.option('--workers', default=2, show_default=True, help='Worker processes (0 = inline).')
+    @click.option('--limit', type=int, default=None, help='Stop after scanning this many images.')
+    @click.option('--restart', is_flag=True, help='Ignore the saved checkpoint and start from the first id.')
+    def backfill(task, batch_size, workers, limit, restart):
+        """Reprocess every image that is not current for TASK, resumably."""
+        from services.backfill import run_backfill
+
+        def report(p):
+            click.echo(f'[{p.task}] last_id={p.last_id} scanned={p.scanned} processed={p.processed} '
+                       f'skipped={p.skipped} failed={p.failed} {p.rate:.1f} img/s')
+
+        progress = run_backfill(task, batch_size=batch_size, workers=workers,
+                                restart=restart, limit=limit, on_batch=report)
+        click.echo(f'done: {progress.processed} processed, {progress.skipped} already current, '
+                   f'{progress.failed} failed in {progress.elapsed:.1f}s ({progress.rate:.1f} img/s)')
+
+    @app.cli.command('ingest')
+    @click.argument('directory', type=click.Path(exists=True, file_okay=False))
+    @click.option('--batch-size', default=1000, show_default=True, help='Files per hashing batch / transaction.')
+    @click.option('--workers', default=4, show_default=True, help='Hashing processes (0 = inline).')
+    @click.option('--link', is_flag=True, help='Hardlink files into storage instead of copying (same filesystem).')
+    @click.option('--category', default=None, help='Category for every imported image.')
+    @click.option('--category-from-dir', is_flag=True, help='Use the top-level subdirectory name as category.')
+    @click.option('--tags', default=None, help='Comma-separated tags for every imported image.')
+    @click.option('--uploader', default=None, help='Username that owns the imported images.')
+    @click.option('--mtime', is_flag=True, help='Use file modification times as created_at.')
+    @click.option('--all-files', is_flag=True, help='Import every file, not only image extensions.')
+    @click.option('--limit', type=int, default=None, help='Stop after this many files.')
+    @click.option('--restart', is_flag=True, help='Ignore the saved checkpoint and walk from the start.')
+    def ingest(directory, batch_size, workers, link, category, category_from_dir, tags, uploader, mtime,
+               all_files, limit, restart):
+        """Import every image under DIRECTORY, skipping checksums already stored, resumably."""
+        from services.ingest import IMAGE_EXTENSIONS, run_ingest
+        from utils.auth import get_user_by_username
+
+        uploader_id = None
+        if uploader:
+            user = get_user_by_username(uploader)
+            if user is None:
+                raise click.BadParameter(f'no user {uploader!r}', param_hint='--uploader')
+            uploader_id = user.id
+
+        def report(p):
+            click.echo(f'position={p.position} ingested={p.ingested} skipped={p.skipped} failed={p.failed} '
+                       f'{p.rate:.1f} files/s {p.mb_rate:.1f} MB/s')
+
+        try:
+            progress = run_ingest(directory, batch_size=batch_size, workers=workers, restart=restart, limit=limit,
+                                  extensions=None if all_files else IMAGE_EXTENSIONS, on_batch=report,
+                                  category=category, category_from_dir=category_from_dir, tags=tags,
+                                  uploader_id=uploader_id, link=link, use_mtime=mtime)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        click.echo(f'done: {progress.ingested} ingested, {progress.skipped} already stored, {progress.failed} '
+                   f'unreadable in {progress.elapsed:.1f}s ({progress.rate:.1f} files/s); '
+                   f'run `flask backfill thumbnail` and `flask backfill phash` next')
+
+    @app.cli.group('vectors')
+    def vectors():
+        """Maintain the vector index of the current embedding model."""
+
+    @vectors.command('build-ivf')
+    @click.option('--nlist', type=int, default=None, help='Number of clusters (default sqrt(n)).')
+    @click.option('--iters', default=10, show_default=True)
+    def build_ivf(nlist, iters):
+        """Train the IVF index used for approximate search on large corpora."""
+        import embedding_pipeline
+        store = embedding_pipeline.vector_store()
+        built = store.build_ivf(nlist=nlist, iters=iters)
+        click.echo(f'IVF index: {built} lists over {len(store)} live vectors')
+
+    @vectors.command('compact')
+    def compact():
+        """Drop tombstoned rows from the vector files."""
+        import embedding_pipeline
+        click.echo(f'{embedding_pipeline.vector_store().compact()} vectors kept')
+
+    @app.cli.group('fts')
+    def fts():
+        """Maintain the OCR/filename full-text index."""
+
+    @fts.command('rebuild')
+    def fts_rebuild():
+        """Repopulate ocr_texts_fts from image/ocr_text (SQLite)."""
+        from services import fulltext
+        click.echo(f'{fulltext.rebuild()} rows indexed')
+
+    @app.cli.group('tags')
+    def tags():
+        """Maintain the normalised tag index."""
+
+    @tags.command('migrate')
+    @click.option('--batch-size', default=1000, show_default=True)
+    def tags_migrate(batch_size):
+        """Split the comma-separated Image.tags of every image into image_tag (idempotent)."""
+        from services.tags import migrate_tags
+        total = migrate_tags(batch_size, on_batch=lambda last_id, n: click.echo(f'last_id={last_id} tagged={n}'))
+        click.echo(f'{total} images tagged')
+
+    @app.cli.group('analytics')
+    def analytics():
+        """Maintain the analytics rollup table."""
+
+    @analytics.command('rebuild')
+    def analytics_rebuild():
+        """Recompute stat_rollup from image and download_log."""
+        from services import analytics as service
+        click.echo(f'{service.rebuild()} rollup rows written')
+
+    @analytics.command('compact')
+    @click.option('--keep-hours', default=24 * 7, show_default=True, help='Hourly rows newer than this are kept.')
+    def analytics_compact(keep_hours):
+        """Drop old hourly rollups; daily rows keep the totals."""
+        from services import analytics as service
+        click.echo(f'{service.compact(keep_hours)} hourly rows deleted')
+
+    @app.cli.group('dedup')
+    def dedup():
+        """Near-duplicate detection over Image.phash."""
+
+    @dedup.command('clusters')
+    @click.option('--distance', type=int, default=None, help='Max Hamming distance in bits (default PHASH_CLUSTER_DISTANCE).')
+    def dedup_clusters(distance):
+        """Group near-duplicate images and write the cluster report."""
+        from services import dedup as service
+        if distance is None:
+            distance = app.config['PHASH_CLUSTER_DISTANCE']
+        report = service.write_cluster_report(distance)
+        click.echo(f"{len(report['clusters'])} clusters over {report['images']} hashed images "
+                   f"in {report['seconds']}s -> {service.report_path()}")
@@ -7,9 +7,119 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///" + os.path.join(basedir, "data.db"))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine tuning (db_config.py): connection pool for PostgreSQL and file SQLite
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    # SQLite pragmas set on every connection
+    SQLITE_WAL = os.environ.get("SQLITE_WAL", "1") == "1"
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Blueprints this process registers (app.BLUEPRINT_MANIFEST names, comma-separated; empty = all),
+    # e.g. "auth,users,files,images" for API-only workers that never import the web/search stacks
+    BLUEPRINTS = os.environ.get("BLUEPRINTS", "")
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", os.path.join(basedir, "uploads"))
+    # Per-file upload cap enforced while streaming; 0 disables the check
+    UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(512 * 1024 * 1024)))
+    # Resumable chunked uploads (/api/files/uploads)
+    UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get("UPLOAD_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+    # Blob storage: "local" keeps sharded ab/cd/<sha256> files under BLOB_ROOT (defaults to UPLOAD_FOLDER)
+    BLOB_BACKEND = os.environ.get("BLOB_BACKEND", "local")
+    BLOB_ROOT = os.environ.get("BLOB_ROOT")
+    # Thumbnails/previews: longest edge in px; rendered on a process pool at upload (0 workers = inline)
+    THUMB_SIZES = tuple(int(x) for x in os.environ.get("THUMB_SIZES", "256,1024").split(","))
+    THUMB_WORKERS = int(os.environ.get("THUMB_WORKERS", "2"))
+    THUMB_QUALITY = int(os.environ.get("THUMB_QUALITY", "80"))
+    THUMB_ROOT = os.environ.get("THUMB_ROOT")
+    # Job engine (/api/process): worker threads, process pool for CPU-bound work, retry backoff
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+    JOB_PROCESS_WORKERS = int(os.environ.get("JOB_PROCESS_WORKERS", "2"))
+    JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "2.0"))
+    JOB_RETRY_BASE_SECONDS = int(os.environ.get("JOB_RETRY_BASE_SECONDS", "5"))
+    JOB_RETRY_MAX_SECONDS = int(os.environ.get("JOB_RETRY_MAX_SECONDS", "600"))
+    JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "900"))
+    JOB_AUTOSTART = os.environ.get("JOB_AUTOSTART", "1") == "1"
+    # per-task concurrency overrides, e.g. {"embedding": 2}
+    JOB_CONCURRENCY: dict = {}
+    # /api/process/status?wait=N long-polling: cap on N and how often pending jobs are re-checked
+    PROCESS_STATUS_MAX_WAIT = float(os.environ.get("PROCESS_STATUS_MAX_WAIT", "30"))
+    PROCESS_STATUS_POLL_SECONDS = float(os.environ.get("PROCESS_STATUS_POLL_SECONDS", "0.5"))
+    # ASGI mode (asgi.py): threads running Flask code, request bodies kept in memory up to
+    # ASGI_BODY_MEMORY_BYTES then spooled to disk, rejected above ASGI_MAX_BODY_BYTES (0 = no cap),
+    # response bodies sent in ASGI_CHUNK_BYTES pieces
+    ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "16"))
+    ASGI_BODY_MEMORY_BYTES = int(os.environ.get("ASGI_BODY_MEMORY_BYTES", str(1024 * 1024)))
+    ASGI_MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", str(576 * 1024 * 1024)))
+    ASGI_CHUNK_BYTES = int(os.environ.get("ASGI_CHUNK_BYTES", str(256 * 1024)))
+    # Vector index (vector_store.py): memory-mapped matrix per embedding model; IVF above the threshold
+    VECTOR_DIR = os.environ.get("VECTOR_DIR")
+    VECTOR_DTYPE = os.environ.get("VECTOR_DTYPE", "float32")
+    VECTOR_ANN_THRESHOLD = int(os.environ.get("VECTOR_ANN_THRESHOLD", "1000000"))
+    VECTOR_NPROBE = int(os.environ.get("VECTOR_NPROBE", "16"))
+    # Downloads: DownloadLog rows are buffered and flushed in batches
+    DOWNLOAD_LOG_BATCH_SIZE = int(os.environ.get("DOWNLOAD_LOG_BATCH_SIZE", "200"))
+    DOWNLOAD_LOG_FLUSH_SECONDS = float(os.environ.get("DOWNLOAD_LOG_FLUSH_SECONDS", "2.0"))
+    DOWNLOAD_LOG_MAX_PENDING = int(os.environ.get("DOWNLOAD_LOG_MAX_PENDING", "10000"))
+    DOWNLOAD_MAX_AGE = int(os.environ.get("DOWNLOAD_MAX_AGE", "86400"))
+    # Let nginx/apache stream the file (X-Sendfile) instead of the worker
+    USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "0") == "1"
+    # Near-duplicates: dHash at upload, distance (bits) reported as near_duplicates (-1 = off), index reload
+    PHASH_ON_UPLOAD = os.environ.get("PHASH_ON_UPLOAD", "1") == "1"
+    PHASH_UPLOAD_DISTANCE = int(os.environ.get("PHASH_UPLOAD_DISTANCE", "4"))
+    PHASH_CLUSTER_DISTANCE = int(os.environ.get("PHASH_CLUSTER_DISTANCE", "4"))
+    PHASH_INDEX_SEGMENTS = int(os.environ.get("PHASH_INDEX_SEGMENTS", "4"))
+    PHASH_INDEX_RELOAD_SECONDS = int(os.environ.get("PHASH_INDEX_RELOAD_SECONDS", "600"))
+    # Listings: cursor pagination; exact totals are cached this long (0 = always recount)
+    PAGE_SIZE_MAX = int(os.environ.get("PAGE_SIZE_MAX", "100"))
+    PAGINATION_COUNT_TTL = int(os.environ.get("PAGINATION_COUNT_TTL", "30"))
+    # Image detail records (services/metadata_cache.py): per-process LRU (0 = off), optional SQLite file
+    # shared by one host's workers; with it, a worker trusts its own copy for METADATA_CACHE_LOCAL_TTL seconds
+    METADATA_CACHE_SIZE = int(os.environ.get("METADATA_CACHE_SIZE", "10000"))
+    METADATA_CACHE_TTL = int(os.environ.get("METADATA_CACHE_TTL", "300"))
+    METADATA_CACHE_PATH = os.environ.get("METADATA_CACHE_PATH")
+    METADATA_CACHE_LOCAL_TTL = float(os.environ.get("METADATA_CACHE_LOCAL_TTL", "5"))
+    # Tags: in-memory posting lists of hot tags (0 = off); results above TAG_CACHE_MAX_IN ids fall back to SQL
+    TAG_CACHE_SIZE = int(os.environ.get("TAG_CACHE_SIZE", "0"))
+    TAG_CACHE_TTL = int(os.environ.get("TAG_CACHE_TTL", "60"))
+    TAG_CACHE_MAX_IN = int(os.environ.get("TAG_CACHE_MAX_IN", "2000"))
     LOG_DIR = os.environ.get("LOG_DIR", os.path.join(basedir, "logs"))
+    # Logging: text | json (python-json-logger); ACCESS_LOG writes one line per request to LOG_DIR/access.log
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+    ACCESS_LOG = os.environ.get("ACCESS_LOG", "0") == "1"
+    # Request metrics (services/metrics.py): /metrics (optional bearer token), slow-request SQL log (0 = off)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", "1000"))
+    SLOW_REQUEST_MAX_STATEMENTS = int(os.environ.get("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+    # JSON responses (utils/json_provider.py): auto = orjson when installed, orjson, std
+    JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "auto")
+    # Response compression (services/compression.py): gzip, or br with the Brotli package, for text/JSON
+    # bodies of at least COMPRESS_MIN_BYTES (0 = off; streamed exports are always compressed when enabled)
+    COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+    # gzip level 1: on JSON listings about the ratio of level 6 at 40% of the CPU time
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "1"))
+    COMPRESS_BR_QUALITY = int(os.environ.get("COMPRESS_BR_QUALITY", "4"))
     # JWT settings
     JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
     JWT_ACCESS_EXPIRES_MINUTES = int(os.environ.get("JWT_ACCESS_EXPIRES_MINUTES", "30"))
     JWT_REFRESH_EXPIRES_DAYS = int(os.environ.get("JWT_REFRESH_EXPIRES_DAYS", "7"))
+    # Password hashing: process pool size (0 = inline), queue bound (429 beyond it), wait limit (503)
+    PASSWORD_ROUNDS = int(os.environ.get("PASSWORD_ROUNDS", "0")) or None
+    HASH_WORKERS = int(os.environ.get("HASH_WORKERS", "2"))
+    HASH_MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", "32"))
+    HASH_TIMEOUT_SECONDS = float(os.environ.get("HASH_TIMEOUT_SECONDS", "10"))
+    # Verified-token and user snapshot caches on the jwt_required path (size 0 = off)
+    JWT_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "10000"))
+    JWT_CACHE_TTL = int(os.environ.get("JWT_CACHE_TTL", "300"))
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "30"))
+    # Refresh-token store: database | sqlite (TOKEN_STORE_PATH, one host) | memory (single process)
+    TOKEN_STORE = os.environ.get("TOKEN_STORE", "database")
+    TOKEN_STORE_PATH = os.environ.get("TOKEN_STORE_PATH")
+    TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
+    TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "5"))
+    TOKEN_SWEEP_SECONDS = int(os.environ.get("TOKEN_SWEEP_SECONDS", "3600"))
@@ -0,0 +1,99 @@
+"""Database engine tuning, applied by ``create_app``.
+
+SQLite (the default deployment) otherwise runs with a rollback journal, where
+an upload's write transaction blocks every reader until it commits. Each new
+SQLite connection gets:
+
+* ``journal_mode=WAL``: readers keep reading the last committed snapshot
+  while one writer appends to the log
+* ``synchronous=NORMAL``: fsync at checkpoints instead of on every commit;
+  with WAL a power loss can drop the latest commits but not corrupt the file
+* ``mmap_size`` / ``cache_size``: hot pages are served from memory rather
+  than a read() per page
+* ``busy_timeout``: a second writer waits for the lock instead of failing
+  with "database is locked"
+
+Server databases (PostgreSQL) get an explicitly sized pool with pre-ping and
+recycling, so connections dropped by the server or a proxy are replaced
+instead of surfacing as errors. File SQLite uses the same pool sizing.
+Anything set in ``SQLALCHEMY_ENGINE_OPTIONS`` wins over these defaults.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def _is_memory(url) -> bool:
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def engine_options(config) -> dict:
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    pool = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        options.update(pool, pool_recycle=config['DB_POOL_RECYCLE'], pool_pre_ping=True)
+    elif not _is_memory(url):
+        # in-memory databases get Flask-SQLAlchemy's single shared connection instead
+        options.update(pool)
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def sqlite_pragmas(config) -> list[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+    if config['SQLITE_WAL']:
+        pragmas.insert(0, 'PRAGMA journal_mode = WAL')
+    return pragmas
+
+
+# objects models.py creates through DDL events; autogenerate must not try to drop them
+UNMANAGED_PREFIXES = ('ocr_texts_fts', 'ix_ocr_text_tsv', 'ix_image_tsv')
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Alembic autogenerate filter (passed to ``Migrate``)."""
+    return not (name and type_ in ('table', 'index') and name.startswith(UNMANAGED_PREFIXES))
+
+
+def init_database(app, db):
+    """``db.init_app`` with tuned engine options and per-connection SQLite pragmas."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    pragmas = sqlite_pragmas(app.config)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', on_connect)
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def init_migrations(app, db):
+    """Attach Flask-Migrate (and with it alembic) to ``app``; done on first use of ``flask db``.
+
+    Serving processes never run migrations, so they skip importing alembic.
+    """
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        # render_as_batch: SQLite can only ALTER via copy-and-move table batches
+        Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True, include_name=include_name)
+    return app.extensions['migrate']
@@ -0,0 +1,101 @@
+"""Image embedding pipeline.
+
+``compute_embedding`` is deliberately dependency-light: until a learned model
+is wired in, it produces a 128-d colour/layout descriptor (4x4x4 RGB joint
+histogram + 8x8 grayscale layout), L2-normalised so cosine similarity is a dot
+product. Swap ``MODEL_NAME`` and ``compute_embedding`` together when a real
+model lands so stale vectors can be detected by name.
+
+Vectors live in the memory-mapped ``vector_store`` for ``MODEL_NAME``;
+``Embedding.vector_ref`` records ``vs:<model>:<image_id>``.
+"""
+import numpy as np
+from PIL import Image as PILImage
+
+from extensions import db
+from models import Embedding
+from services import metadata_cache
+from vector_store import VectorStore, get_vector_store
+
+MODEL_NAME = 'color-layout-v1'
+DIM = 128
+
+
+def compute_embedding(image_path: str) -> np.ndarray:
+    with PILImage.open(image_path) as im:
+        im.draft('RGB', (64, 64))
+        im = im.convert('RGB').resize((32, 32), PILImage.BILINEAR)
+        rgb = np.asarray(im, dtype=np.uint8)
+    bins = (rgb // 64).reshape(-1, 3).astype(np.int64)
+    hist = np.bincount(bins[:, 0] * 16 + bins[:, 1] * 4 + bins[:, 2], minlength=64).astype(np.float32)
+    hist /= hist.sum() or 1.0
+    gray = rgb.astype(np.float32).mean(axis=2)
+    layout = gray.reshape(8, 4, 8, 4).mean(axis=(1, 3)).ravel() / 255.0
+    layout -= layout.mean()
+    vec = np.concatenate([hist, layout]).astype(np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def compute_embeddings(image_paths: list[str]) -> list[np.ndarray | None]:
+    """Batch variant for backfills; unreadable files yield None instead of failing the batch."""
+    out = []
+    for path in image_paths:
+        try:
+            out.append(compute_embedding(path))
+        except (OSError, ValueError, PILImage.DecompressionBombError):
+            out.append(None)
+    return out
+
+
+def vector_store() -> VectorStore:
+    return get_vector_store(MODEL_NAME, DIM)
+
+
+def vector_ref(image_id: int) -> str:
+    return f'vs:{MODEL_NAME}:{image_id}'
+
+
+def parse_vector_ref(ref: str) -> tuple[str, int] | None:
+    try:
+        scheme, model_name, image_id = ref.split(':')
+        return (model_name, int(image_id)) if scheme == 'vs' else None
+    except ValueError:
+        return None
+
+
+def persist_embedding(image_id: int, vector: np.ndarray) -> Embedding:
+    vector_store().add([image_id], vector[None, :])
+    emb = Embedding.query.filter_by(image_id=image_id).first()
+    if emb is None:
+        emb = Embedding(image_id=image_id)
+        db.session.add(emb)
+    emb.vector_ref = vector_ref(image_id)
+    emb.model_name = MODEL_NAME
+    emb.dim = int(vector.shape[0])
+    db.session.commit()
+    metadata_cache.invalidate([image_id])
+    return emb
+
+
+def persist_embeddings(pairs: list[tuple[int, np.ndarray]]):
+    """Bulk upsert for a batch: one DELETE + one multi-row INSERT + one commit."""
+    if not pairs:
+        return
+    ids = [image_id for image_id, _ in pairs]
+    vector_store().add(ids, np.stack([vector for _, vector in pairs]))
+    rows = [{'image_id': i, 'vector_ref': vector_ref(i), 'model_name': MODEL_NAME, 'dim': DIM} for i in ids]
+    db.session.query(Embedding).filter(Embedding.image_id.in_(ids)).delete(synchronize_session=False)
+    db.session.execute(Embedding.__table__.insert(), rows)
+    db.session.commit()
+    metadata_cache.invalidate(ids)
+
+
+def current_ids(image_ids: list[int]) -> set[int]:
+    """Ids that already have an embedding from the current model."""
+    return {i for (i,) in db.session.query(Embedding.image_id)
+            .filter(Embedding.image_id.in_(image_ids), Embedding.model_name == MODEL_NAME)}
+
+
+def get_embedding(image_id: int) -> Embedding | None:
+    return Embedding.query.filter_by(image_id=image_id).first()
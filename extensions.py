@@ -0,0 +1,8 @@
+"""Flask extension instances, bound to the app in ``create_app``.
+
+Kept apart from ``app`` so models and services can import ``db`` without
+importing the application factory (and everything it pulls in) first.
+"""
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
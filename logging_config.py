@@ -2,13 +2,36 @@ import logging
 import os
 from logging.handlers import RotatingFileHandler
 
+ACCESS_LOGGER = 'imagedrive.access'
+
+
+def _formatter(app):
+    if app.config.get('LOG_FORMAT') == 'json':
+        from pythonjsonlogger import jsonlogger
+        return jsonlogger.JsonFormatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+    return logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+
+
+def _attach(logger, path: str, formatter):
+    # create_app may run several times per process (tests, CLI); one handler per file
+    path = os.path.abspath(path)
+    if any(getattr(h, 'baseFilename', None) == path for h in logger.handlers):
+        return
+    handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=5)
+    handler.setFormatter(formatter)
+    handler.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
 
 def configure_logging(app):
     log_dir = app.config.get('LOG_DIR', './logs')
     os.makedirs(log_dir, exist_ok=True)
-    handler = RotatingFileHandler(os.path.join(log_dir, 'app.log'), maxBytes=10 * 1024 * 1024, backupCount=5)
-    formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')
-    handler.setFormatter(formatter)
-    handler.setLevel(logging.INFO)
+    formatter = _formatter(app)
     app.logger.setLevel(logging.INFO)
-    app.logger.addHandler(handler)
+    _attach(app.logger, os.path.join(log_dir, 'app.log'), formatter)
+    if app.config.get('ACCESS_LOG'):
+        # fields arrive via ``extra`` (services/metrics.py); only the JSON formatter shows them all
+        access = logging.getLogger(ACCESS_LOGGER)
+        access.setLevel(logging.INFO)
+        access.propagate = False
+        _attach(access, os.path.join(log_dir, 'access.log'), formatter)
@@ -1,5 +1,7 @@
+import os
 from datetime import datetime, UTC
-from app import db
+from sqlalchemy import DDL, event
+from extensions import db
 
 
 class User(db.Model):
@@ -10,16 +12,77 @@ class User(db.Model):
     role = db.Column(db.String(32), default="user")
 
 
+class RefreshToken(db.Model):
+    """Issued refresh tokens; a row exists while the token is usable (logout deletes it)."""
+    jti = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+
 class Image(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(512), nullable=False)
     path = db.Column(db.String(1024), nullable=False)
-    checksum = db.Column(db.String(64), index=True)
+    checksum = db.Column(db.String(64))
     uploader_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     size = db.Column(db.Integer)
     mime = db.Column(db.String(64))
     category = db.Column(db.String(128))
     tags = db.Column(db.String(512))
+    phash = db.Column(db.BigInteger)  # 64-bit dHash, signed; see services/dedup.py
+    # read from the file header at ingest (services/image_metadata.py); width/height as displayed
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    format = db.Column(db.String(16))
+    orientation = db.Column(db.SmallInteger)  # EXIF Orientation tag 1-8, NULL when absent
+    exif_json = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+    # keyset pagination seeks on (created_at, id), optionally behind an equality filter;
+    # one row per (checksum, uploader) backs upload dedup (NULL uploaders need the partial index)
+    __table_args__ = (
+        db.Index('uq_image_checksum_uploader', 'checksum', 'uploader_id', unique=True),
+        db.Index('uq_image_checksum_anonymous', 'checksum', unique=True,
+                 sqlite_where=db.text('uploader_id IS NULL'), postgresql_where=db.text('uploader_id IS NULL')),
+        db.Index('ix_image_created_id', 'created_at', 'id'),
+        db.Index('ix_image_category_created', 'category', 'created_at', 'id'),
+        db.Index('ix_image_uploader_created', 'uploader_id', 'created_at', 'id'),
+        db.Index('ix_image_dimensions', 'width', 'height'),
+    )
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128), unique=True, nullable=False)  # normalised: stripped, lower-case
+
+
+class ImageTag(db.Model):
+    # PK (tag_id, image_id) doubles as the posting list index for tag filters
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('image.id'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_image_tag_image', 'image_id'),
+    )
+
+
+class Blob(db.Model):
+    checksum = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+
+class UploadSession(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(512), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    checksum = db.Column(db.String(64))
+    uploader_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    category = db.Column(db.String(128))
+    tags = db.Column(db.String(512))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
 
 
@@ -27,6 +90,8 @@ class Embedding(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     image_id = db.Column(db.Integer, db.ForeignKey('image.id'), index=True)
     vector_ref = db.Column(db.String(512))
+    model_name = db.Column(db.String(64))
+    dim = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
 
 
@@ -34,6 +99,7 @@ class OCRText(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     image_id = db.Column(db.Integer, db.ForeignKey('image.id'), index=True)
     text = db.Column(db.Text)
+    engine = db.Column(db.String(32))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
 
 
@@ -43,3 +109,79 @@ class DownloadLog(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
     ip = db.Column(db.String(64))
+
+
+class StatRollup(db.Model):
+    """Pre-aggregated upload/download counters (see services/analytics.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)  # hour | day
+    bucket = db.Column(db.DateTime, nullable=False)  # UTC start of the hour/day
+    category = db.Column(db.String(128), nullable=False, default='')
+    uploader_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = anonymous
+    size_class = db.Column(db.Integer, nullable=False, default=0)
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    upload_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    downloads = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket', 'category', 'uploader_id', 'size_class',
+                            name='uq_stat_rollup_key'),
+    )
+
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('image.id'), nullable=True)
+    task = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
+
+    __table_args__ = (
+        db.UniqueConstraint('image_id', 'task', name='uq_job_image_task'),
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+
+# Full-text search over OCR text + filename/tags.
+# SQLite: FTS5 table keyed by image id (rowid), kept in sync by triggers on image/ocr_text.
+# Set FTS_TOKENIZER=trigram for substring/CJK matching (needs SQLite >= 3.34).
+FTS_TOKENIZER = os.environ.get("FTS_TOKENIZER", "unicode61 remove_diacritics 2")
+
+_FTS_SQLITE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS ocr_texts_fts USING fts5(filename, tags, text, tokenize='{FTS_TOKENIZER}')",
+    """CREATE TRIGGER IF NOT EXISTS image_fts_ai AFTER INSERT ON image BEGIN
+        INSERT INTO ocr_texts_fts(rowid, filename, tags, text) VALUES (new.id, new.filename, coalesce(new.tags, ''), '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS image_fts_au AFTER UPDATE OF filename, tags ON image BEGIN
+        UPDATE ocr_texts_fts SET filename = new.filename, tags = coalesce(new.tags, '') WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS image_fts_ad AFTER DELETE ON image BEGIN
+        DELETE FROM ocr_texts_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ocr_text_fts_ai AFTER INSERT ON ocr_text BEGIN
+        UPDATE ocr_texts_fts SET text = coalesce(new.text, '') WHERE rowid = new.image_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ocr_text_fts_au AFTER UPDATE OF text ON ocr_text BEGIN
+        UPDATE ocr_texts_fts SET text = coalesce(new.text, '') WHERE rowid = new.image_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ocr_text_fts_ad AFTER DELETE ON ocr_text BEGIN
+        UPDATE ocr_texts_fts SET text = '' WHERE rowid = old.image_id;
+    END""",
+]
+# PostgreSQL: GIN indexes on the same tsvector expressions services/fulltext.py queries
+_FTS_POSTGRES = [
+    "CREATE INDEX IF NOT EXISTS ix_ocr_text_tsv ON ocr_text USING GIN (to_tsvector('simple', coalesce(text, '')))",
+    "CREATE INDEX IF NOT EXISTS ix_image_tsv ON image USING GIN "
+    "(to_tsvector('simple', filename || ' ' || coalesce(tags, '')))",
+]
+
+for _stmt in _FTS_SQLITE:
+    event.listen(OCRText.__table__, 'after_create', DDL(_stmt).execute_if(dialect='sqlite'))
+for _stmt in _FTS_POSTGRES:
+    event.listen(OCRText.__table__, 'after_create', DDL(_stmt).execute_if(dialect='postgresql'))
+event.listen(OCRText.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS ocr_texts_fts").execute_if(dialect='sqlite'))
@@ -0,0 +1,68 @@
+"""OCR pipeline.
+
+Uses Tesseract through ``pytesseract`` when it is installed; otherwise
+``run_ocr`` raises ``OCRUnavailable`` and the job is marked failed without
+retries. The import is deferred so workers that never run OCR don't pay for it.
+"""
+from PIL import Image as PILImage
+
+from extensions import db
+from models import OCRText
+from services import metadata_cache
+
+ENGINE_NAME = 'tesseract'
+
+
+class OCRUnavailable(RuntimeError):
+    pass
+
+
+def run_ocr(image_path: str, lang: str = 'eng') -> str:
+    try:
+        import pytesseract
+    except ImportError as exc:
+        raise OCRUnavailable('pytesseract is not installed') from exc
+    with PILImage.open(image_path) as im:
+        try:
+            return pytesseract.image_to_string(im.convert('RGB'), lang=lang).strip()
+        except pytesseract.TesseractNotFoundError as exc:
+            raise OCRUnavailable('tesseract binary not found') from exc
+
+
+def run_ocr_batch(image_paths: list[str]) -> list[str | None]:
+    """Batch variant for backfills; unreadable files yield None. OCRUnavailable propagates."""
+    out = []
+    for path in image_paths:
+        try:
+            out.append(run_ocr(path))
+        except (OSError, ValueError, PILImage.DecompressionBombError):
+            out.append(None)
+    return out
+
+
+def persist_ocr(image_id: int, text: str) -> OCRText:
+    row = OCRText.query.filter_by(image_id=image_id).first()
+    if row is None:
+        row = OCRText(image_id=image_id)
+        db.session.add(row)
+    row.text = text
+    row.engine = ENGINE_NAME
+    db.session.commit()
+    metadata_cache.invalidate([image_id])
+    return row
+
+
+def persist_ocr_batch(pairs: list[tuple[int, str]]):
+    if not pairs:
+        return
+    ids = [image_id for image_id, _ in pairs]
+    db.session.query(OCRText).filter(OCRText.image_id.in_(ids)).delete(synchronize_session=False)
+    db.session.execute(OCRText.__table__.insert(),
+                       [{'image_id': i, 'text': text, 'engine': ENGINE_NAME} for i, text in pairs])
+    db.session.commit()
+    metadata_cache.invalidate(ids)
+
+
+def current_ids(image_ids: list[int]) -> set[int]:
+    return {i for (i,) in db.session.query(OCRText.image_id)
+            .filter(OCRText.image_id.in_(image_ids), OCRText.engine == ENGINE_NAME)}
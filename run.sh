@@ -1,4 +1,8 @@
 #!/usr/bin/env bash
 export FLASK_APP=app:create_app
 export FLASK_ENV=development
+if [ "${SERVER:-flask}" = "asgi" ]; then
+  # slow uploads/downloads stay on the event loop; see asgi.py
+  exec uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 5000 --workers "${WEB_CONCURRENCY:-1}"
+fi
 flask run --host=0.0.0.0 --port=5000
@@ -0,0 +1,24 @@
+"""Reprocess the whole catalog for one task, resuming from the last checkpoint.
+Run: `python scripts/backfill.py embedding` (same as `flask --app app:create_app backfill embedding`).
+"""
+import os
+import sys
+
+# Ensure project root is on sys.path when running from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from flask.cli import ScriptInfo
+
+from app import create_app
+
+
+def main():
+    app = create_app()
+    app.cli.main(args=['backfill', *sys.argv[1:]], prog_name='backfill',
+                 obj=ScriptInfo(create_app=lambda: app))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Load benchmark: concurrent slow clients under WSGI vs ASGI serving.
+Run: `python scripts/bench_asgi.py [--clients 32] [--threads 8] [--scenario upload|download]`.
+
+Starts the app twice in a subprocess with the same thread budget: a WSGI
+server with a fixed pool of ``--threads`` (the gthread/worker-pool model) and
+``asgi:create_asgi_app`` under uvicorn with ``ASGI_THREADS=--threads``. In
+each, ``--clients`` slow clients upload (or download) a file at mobile-like
+speed while a probe client issues a cheap request every 50ms. Reports how
+many slow clients finished, the wall time, and probe latency: with WSGI the
+probes queue behind the slow transfers, with ASGI they do not.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+# Ensure project root is on sys.path when running from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+HOST = '127.0.0.1'
+BOUNDARY = 'benchboundary'
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref server whose requests run on a fixed thread pool."""
+    request_queue_size = 1024
+
+    def __init__(self, address, threads: int):
+        super().__init__(address, _QuietHandler)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(mode: str, port: int, threads: int):
+    if mode == 'asgi':
+        import uvicorn
+        from asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(), host=HOST, port=port, log_level='warning', backlog=1024)
+    else:
+        from app import create_app
+        server = PooledWSGIServer((HOST, port), threads)
+        server.set_app(create_app())
+        server.serve_forever()
+
+
+def _env(tmpdir: str, threads: int) -> dict:
+    return dict(os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+                UPLOAD_FOLDER=os.path.join(tmpdir, 'uploads'),
+                LOG_DIR=os.path.join(tmpdir, 'logs'),
+                ASGI_THREADS=str(threads),
+                THUMB_WORKERS='0',
+                JOB_AUTOSTART='0',
+                PHASH_ON_UPLOAD='0')
+
+
+def _init_db(env: dict):
+    code = 'from app import create_app, db\napp = create_app()\nwith app.app_context(): db.create_all()'
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
+
+
+def _wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def _png_bytes(kib: int) -> bytes:
+    from PIL import Image
+    side = int((kib * 1024 / 3) ** 0.5)
+    buf = io.BytesIO()
+    Image.effect_noise((side, side), 64).convert('RGB').save(buf, 'PNG', compress_level=0)
+    return buf.getvalue()
+
+
+def _multipart(payload: bytes) -> bytes:
+    return (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="bench.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode() + payload + f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+
+async def _request(port: int, method: str, path: str, body: bytes = b'', content_type: str = '',
+                   chunk: int = 0, interval: float = 0.0, read_chunk: int = 0) -> tuple[int, bytes]:
+    """Minimal HTTP/1.0 client; ``chunk``/``interval`` dribble the body, ``read_chunk`` throttles the read."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        head = f'{method} {path} HTTP/1.0\r\nHost: {HOST}\r\nContent-Length: {len(body)}\r\n'
+        if content_type:
+            head += f'Content-Type: {content_type}\r\n'
+        writer.write((head + '\r\n').encode())
+        step = chunk or len(body) or 1
+        for i in range(0, len(body), step):
+            writer.write(body[i:i + step])
+            await writer.drain()
+            if interval and i + step < len(body):
+                await asyncio.sleep(interval)
+        if read_chunk:
+            data = bytearray()
+            while part := await reader.read(read_chunk):
+                data += part
+                await asyncio.sleep(interval)
+            data = bytes(data)
+        else:
+            data = await reader.read()
+    finally:
+        writer.close()
+    status = int(data.split(b' ', 2)[1]) if data else 0
+    return status, data.split(b'\r\n\r\n', 1)[-1]
+
+
+async def _run_scenario(port: int, args, image_id: int | None, payload: bytes) -> dict:
+    ctype = f'multipart/form-data; boundary={BOUNDARY}'
+    dribble = max(1, len(payload) * args.interval / args.seconds)
+
+    async def slow_client(n: int):
+        try:
+            if args.scenario == 'upload':
+                # distinct bytes after IEND so every upload stores a new blob
+                body = _multipart(payload + n.to_bytes(4, 'big'))
+                status, _ = await asyncio.wait_for(
+                    _request(port, 'POST', '/api/files/upload', body, ctype, chunk=int(dribble), interval=args.interval),
+                    args.timeout)
+            else:
+                status, _ = await asyncio.wait_for(
+                    _request(port, 'GET', f'/api/files/{image_id}/download', read_chunk=int(dribble),
+                             interval=args.interval), args.timeout)
+            return status in (200, 201)
+        except (asyncio.TimeoutError, OSError):
+            return False
+
+    started = time.perf_counter()
+    clients = [asyncio.ensure_future(slow_client(n)) for n in range(args.clients)]
+    await asyncio.sleep(0.3)
+    latencies, failures = [], 0
+    while not all(c.done() for c in clients):
+        t0 = time.perf_counter()
+        try:
+            status, _ = await asyncio.wait_for(_request(port, 'GET', '/'), args.timeout)
+            if status == 200:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                failures += 1
+        except (asyncio.TimeoutError, OSError):
+            failures += 1
+        await asyncio.sleep(0.05)
+    done = await asyncio.gather(*clients)
+    latencies.sort()
+    return {
+        'slow_clients_ok': sum(done),
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'probes': len(latencies),
+        'probe_failures': failures,
+        'probe_p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'probe_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        'probe_max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+
+
+def bench(mode: str, args, payload: bytes) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = _env(tmpdir, args.threads)
+        _init_db(env)
+        port = _free_port()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port),
+                                 '--threads', str(args.threads)], cwd=ROOT, env=env)
+        try:
+            _wait_for_port(port)
+            image_id = None
+            if args.scenario == 'download':
+                _, resp = asyncio.run(_request(port, 'POST', '/api/files/upload', _multipart(payload),
+                                               f'multipart/form-data; boundary={BOUNDARY}'))
+                image_id = json.loads(resp)['data']['id']
+            return asyncio.run(_run_scenario(port, args, image_id, payload))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=['upload', 'download'], default='upload')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent slow clients.')
+    parser.add_argument('--threads', type=int, default=8, help='Worker threads in both modes.')
+    parser.add_argument('--size-kb', type=int, default=256, help='Transferred file size.')
+    parser.add_argument('--seconds', type=float, default=2.0, help='How long each slow transfer takes.')
+    parser.add_argument('--interval', type=float, default=0.1, help='Pause between slow client chunks.')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--serve', choices=['sync', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve, args.port, args.threads)
+
+    payload = _png_bytes(args.size_kb)
+    results = {mode: bench(mode, args, payload) for mode in ('sync', 'asgi')}
+    print(json.dumps({'scenario': args.scenario, 'clients': args.clients, 'threads': args.threads,
+                      'bytes': len(payload), 'results': results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Microbenchmark of per-request auth overhead on a protected endpoint.
+Run: `python scripts/bench_auth.py [--requests 5000]`.
+
+Times GET /api/users/me (jwt_required + user lookup) and the bare auth step
+(decode + user load inside a request context) with the verified-token and
+user caches disabled and enabled, against a file-backed SQLite database.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Ensure project root is on sys.path when running from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from services.auth_cache import load_user
+from utils.auth import decode_token
+
+
+def _app(tmpdir: str, cached: bool):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+        "SECRET_KEY": "bench" * 8,
+        "TOKEN_SWEEP_SECONDS": 0,
+        "JWT_CACHE_SIZE": 10000 if cached else 0,
+        "USER_CACHE_SIZE": 10000 if cached else 0,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _token(app) -> str:
+    client = app.test_client()
+    client.post('/api/auth/register', json={"username": "bench", "password": "bench"})
+    return client.post('/api/auth/login', json={"username": "bench", "password": "bench"}).get_json()["data"]["access_token"]
+
+
+def bench(app, token: str, n: int) -> tuple[float, float]:
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+    for _ in range(50):
+        client.get('/api/users/me', headers=headers)
+    start = time.perf_counter()
+    for _ in range(n):
+        client.get('/api/users/me', headers=headers)
+    endpoint = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        with app.test_request_context(headers=headers):
+            load_user(int(decode_token(token)["sub"]))
+    auth_only = (time.perf_counter() - start) / n
+    return endpoint, auth_only
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = _app(tmpdir, cached=False)
+        token = _token(app)
+        results = {'uncached': bench(app, token, args.requests)}
+        results['cached'] = bench(_app(tmpdir, cached=True), token, args.requests)
+
+    print(f"{'':10} {'/users/me':>12} {'auth step':>12}")
+    for name, (endpoint, auth_only) in results.items():
+        print(f"{name:10} {endpoint * 1e6:10.1f}us {auth_only * 1e6:10.1f}us")
+    speedup = results['uncached'][1] / results['cached'][1]
+    print(f"auth step speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Concurrent read/write throughput on file SQLite, default vs tuned engine.
+Run: `python scripts/bench_db.py [--seconds 5] [--readers 8] [--writers 2]`.
+
+Writers insert Image rows (one commit each, like uploads); readers page
+through /api/images-style keyset queries. Compares SQLite defaults (rollback
+journal, synchronous=FULL) with the db_config.py settings.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Ensure project root is on sys.path when running from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from models import Image
+
+UNTUNED = {"SQLITE_WAL": False, "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_CACHE_SIZE_KB": 2000,
+           "SQLITE_MMAP_SIZE": 0, "SQLITE_BUSY_TIMEOUT_MS": 5000}
+
+
+def run(tmpdir: str, name: str, overrides: dict, args) -> dict:
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmpdir, name + '.db')}",
+                      "LOG_DIR": os.path.join(tmpdir, 'logs'), **overrides})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Image(filename=f'seed{i}.png', path='x', checksum=f'{name}-seed-{i}')
+                            for i in range(args.seed)])
+        db.session.commit()
+
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def writer(n):
+        i = 0
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    db.session.add(Image(filename='w.png', path='x', checksum=f'{name}-{n}-{i}'))
+                    db.session.commit()
+                    bump('writes')
+                except OperationalError:
+                    db.session.rollback()
+                    bump('errors')
+                i += 1
+
+    def reader():
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    Image.query.order_by(Image.created_at.desc(), Image.id.desc()).limit(50).all()
+                    db.session.commit()
+                    bump('reads')
+                except OperationalError:
+                    db.session.rollback()
+                    bump('errors')
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return {k: round(v / args.seconds, 1) if k != 'errors' else v for k, v in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=20000, help='Rows inserted before timing.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {'default': run(tmpdir, 'default', UNTUNED, args), 'tuned': run(tmpdir, 'tuned', {}, args)}
+    print(f"{'':8} {'reads/s':>10} {'writes/s':>10} {'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:8} {r['reads']:10} {r['writes']:10} {r['errors']:8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Concurrent load driver for the gallery, listing, search, upload and auth hot paths.
+Run: `python scripts/loadtest.py [--serve sync|asgi] [--images 10000] [--concurrency 16] [--seconds 20] [--out run.json]`.
+
+Without ``--url`` it seeds a temporary database (scripts/seed.py) and starts
+the app in a subprocess, as scripts/bench_asgi.py does. ``--concurrency``
+closed-loop clients then pick a scenario per request from ``--mix``:
+
+* ``gallery``: ``/web/`` (HTML, exact total), sometimes filtered by ``q``
+* ``list``: ``/api/images`` following ``next_cursor`` for a few pages
+* ``search``: ``/api/images?q=`` full text and ``/api/search/ocr``
+* ``upload``: a fresh PNG to ``/api/files/upload``
+* ``auth``: ``/api/users/me`` with a bearer token
+
+Reports throughput and p50/p90/p99 latency per scenario; 5xx and connection
+errors count as errors. ``--out`` saves the run as JSON (with git revision
+and arguments) and ``--compare`` prints the change against an earlier file.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, UTC
+from urllib.parse import urlencode, urlsplit
+
+# Ensure project root is on sys.path when running from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench_asgi import BOUNDARY, HOST, _env, _free_port, _multipart, _png_bytes, _wait_for_port  # noqa: E402
+from seed import PASSWORD, WORDS  # noqa: E402
+
+DEFAULT_MIX = 'gallery=3,list=4,search=2,upload=1,auth=2'
+
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Client:
+    """One keep-alive connection (reopened by http.client when the server closes it)."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None):
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            resp = self.conn.getresponse()
+            return resp.status, resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+
+
+class LoadTest:
+    def __init__(self, host: str, port: int, args, token: str | None):
+        self.host, self.port, self.args, self.token = host, port, args, token
+        self.mix = [(name, float(w)) for name, w in (p.split('=') for p in args.mix.split(','))]
+        self.samples = {name: [] for name, _ in self.mix}
+        self.statuses = {name: {} for name, _ in self.mix}
+        self.errors = {name: 0 for name, _ in self.mix}
+        self.payload = _png_bytes(args.upload_kb)
+        self.lock = threading.Lock()
+        self.upload_seq = 0
+        self.recording = False
+
+    def _timed(self, name: str, client: Client, method: str, path: str, body=None, headers=None):
+        started = time.perf_counter()
+        try:
+            status, data = client.request(method, path, body, headers)
+        except (OSError, http.client.HTTPException):
+            status, data = 0, b''
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            with self.lock:
+                self.samples[name].append(elapsed)
+                self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+                if status == 0 or status >= 500:
+                    self.errors[name] += 1
+        return status, data
+
+    def gallery(self, client: Client, rng: random.Random):
+        params = {'q': rng.choice(WORDS)} if rng.random() < 0.3 else {}
+        self._timed('gallery', client, 'GET', '/web/?' + urlencode(params))
+
+    def list(self, client: Client, rng: random.Random):
+        cursor = None
+        for _ in range(rng.randint(1, 5)):
+            params = {'page_size': 20, **({'cursor': cursor} if cursor else {})}
+            status, data = self._timed('list', client, 'GET', '/api/images?' + urlencode(params))
+            if status != 200 or not (cursor := json.loads(data)['data']['meta'].get('next_cursor')):
+                break
+
+    def search(self, client: Client, rng: random.Random):
+        q = rng.choice(WORDS)
+        if rng.random() < 0.5:
+            self._timed('search', client, 'GET', '/api/images?' + urlencode({'q': q, 'page_size': 20}))
+        else:
+            self._timed('search', client, 'GET', '/api/search/ocr?' + urlencode({'q': q, 'k': 20}))
+
+    def upload(self, client: Client, rng: random.Random):
+        with self.lock:
+            self.upload_seq += 1
+            seq = self.upload_seq
+        # distinct trailing bytes so every upload stores a new blob
+        body = _multipart(self.payload + seq.to_bytes(8, 'big') + os.urandom(8))
+        self._timed('upload', client, 'POST', '/api/files/upload', body,
+                    {'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'})
+
+    def auth(self, client: Client, rng: random.Random):
+        self._timed('auth', client, 'GET', '/api/users/me', headers={'Authorization': f'Bearer {self.token}'})
+
+    def worker(self, n: int, stop: threading.Event):
+        rng = random.Random(n)
+        client = Client(self.host, self.port, self.args.timeout)
+        names, weights = zip(*self.mix)
+        while not stop.is_set():
+            getattr(self, rng.choices(names, weights)[0])(client, rng)
+
+    def run(self) -> dict:
+        stop = threading.Event()
+        threads = [threading.Thread(target=self.worker, args=(n, stop)) for n in range(self.args.concurrency)]
+        for t in threads:
+            t.start()
+        time.sleep(self.args.warmup)
+        self.recording = True
+        started = time.perf_counter()
+        time.sleep(self.args.seconds)
+        self.recording = False
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for t in threads:
+            t.join()
+        return self.summary(elapsed)
+
+    def summary(self, elapsed: float) -> dict:
+        scenarios = {}
+        for name, samples in self.samples.items():
+            samples.sort()
+            scenarios[name] = {
+                'requests': len(samples),
+                'rps': round(len(samples) / elapsed, 1),
+                'errors': self.errors[name],
+                'statuses': {str(k): v for k, v in sorted(self.statuses[name].items())},
+                **{f'{label}_ms': round(v * 1000, 1) if (v := _percentile(samples, q)) is not None else None
+                   for label, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+            }
+        total = sum(s['requests'] for s in scenarios.values())
+        return {'seconds': round(elapsed, 2), 'requests': total, 'rps': round(total / elapsed, 1),
+                'errors': sum(s['errors'] for s in scenarios.values()), 'scenarios': scenarios}
+
+
+def _login(host: str, port: int, timeout: float) -> str | None:
+    status, data = Client(host, port, timeout).request(
+        'POST', '/api/auth/login', json.dumps({'username': 'bench0', 'password': PASSWORD}).encode(),
+        {'Content-Type': 'application/json'})
+    return json.loads(data)['data']['access_token'] if status == 200 else None
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print(result: dict):
+    print(f"{'scenario':10} {'reqs':>7} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for name, s in result['scenarios'].items():
+        print(f"{name:10} {s['requests']:7} {s['rps']:8} {s['p50_ms'] or '-':>8} {s['p90_ms'] or '-':>8} "
+              f"{s['p99_ms'] or '-':>8} {s['max_ms'] or '-':>8} {s['errors']:7}")
+    print(f"{'total':10} {result['requests']:7} {result['rps']:8} {'':>35} {result['errors']:7}")
+
+
+def _compare(result: dict, baseline: dict):
+    print(f"\nvs {baseline.get('git_revision')} ({baseline.get('started_at')}):")
+    for name, s in result['scenarios'].items():
+        old = baseline['result']['scenarios'].get(name)
+        if not old:
+            continue
+        deltas = []
+        for key in ('rps', 'p50_ms', 'p99_ms'):
+            if s[key] is not None and old.get(key):
+                deltas.append(f'{key} {old[key]} -> {s[key]} ({(s[key] - old[key]) / old[key] * 100:+.0f}%)')
+        print(f"  {name:10} " + ', '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Target an already running server instead of starting one.')
+    parser.add_argument('--serve', choices=['sync', 'asgi'], default='sync', help='Server started without --url.')
+    parser.add_argument('--threads', type=int, default=8, help='Server worker threads (without --url).')
+    parser.add_argument('--images', type=int, default=10000, help='Seeded catalog size (without --url).')
+    parser.add_argument('--files', type=int, default=50, help='Seeded real files (without --url).')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Scenario weights, e.g. "list=1,upload=1".')
+    parser.add_argument('--upload-kb', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--out', help='Write the run (result + arguments + git revision) as JSON.')
+    parser.add_argument('--compare', help='Earlier --out file to diff against.')
+    args = parser.parse_args()
+
+    run = {'started_at': datetime.now(UTC).isoformat(timespec='seconds'), 'git_revision': _git_revision(),
+           'python': platform.python_version(), 'args': vars(args)}
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+        run['result'] = LoadTest(host, port, args, _login(host, port, args.timeout)).run()
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = _env(tmpdir, args.threads)
+            env.update(HASH_WORKERS='0', SLOW_REQUEST_MS='0', SECRET_KEY=os.urandom(32).hex())
+            subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'seed.py'), '--images', str(args.images),
+                            '--files', str(args.files), '--users', '5'], cwd=ROOT, env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+            host, port = HOST, _free_port()
+            proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'scripts', 'bench_asgi.py'),
+                                     '--serve', args.serve, '--port', str(port), '--threads', str(args.threads)],
+                                    cwd=ROOT, env=env)
+            try:
+                _wait_for_port(port)
+                run['result'] = LoadTest(host, port, args, _login(host, port, args.timeout)).run()
+            finally:
+                proc.terminate()
+                proc.wait()
+
+    _print(run['result'])
+    if args.compare:
+        with open(args.compare) as fh:
+            _compare(run['result'], json.load(fh))
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump(run, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Fill the configured database with a synthetic catalog for benchmarks and load tests.
+Run: `python scripts/seed.py --images 100000 [--users 20] [--files 200] [--seed 1]`.
+
+Rows are generated deterministically from ``--seed``: users ``bench0..N``
+(password ``bench``), images spread over ``--days`` with a Zipf-ish category
+and tag mix (posting lists in ``tag``/``image_tag``), an OCR text for a
+fraction of them and a random 64-bit phash. Metadata rows point at blob keys
+that do not exist on disk, so ``--files`` additionally stores that many real
+PNGs through the upload path (blob, thumbnails, phash) for download and
+thumbnail traffic. Targets ``DATABASE_URL`` like the app; tables are created
+if missing. 10k rows take seconds, 1M a few minutes on SQLite.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, UTC
+
+# Ensure project root is on sys.path when running from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from models import Image, ImageTag, OCRText, Tag, User
+
+WORDS = ('beach', 'sunset', 'cat', 'dog', 'mountain', 'city', 'night', 'food', 'coffee', 'street',
+         'portrait', 'forest', 'river', 'snow', 'car', 'flower', 'bird', 'bridge', 'concert', 'receipt',
+         'invoice', 'whiteboard', 'menu', 'sign', 'document', 'screenshot', 'map', 'ticket', 'book', 'poster')
+CATEGORIES = ('photos', 'screenshots', 'documents', 'travel', 'work', 'family', 'memes', 'art')
+PASSWORD = 'bench'
+
+
+def _pick(rng: random.Random, items):
+    # Zipf-ish: the first items are much more common, like real tags and categories
+    return items[min(int(rng.paretovariate(1.2)) - 1, len(items) - 1)]
+
+
+def seed_users(n: int) -> list[int]:
+    from utils.auth import hash_password
+    names = [f'bench{i}' for i in range(n)]
+    existing = {u for (u,) in db.session.query(User.username).filter(User.username.in_(names))}
+    if len(existing) < n:
+        # one hash for everyone: seeding should not spend minutes in the password KDF
+        password_hash = hash_password(PASSWORD)
+        db.session.execute(insert(User), [{'username': u, 'password_hash': password_hash, 'role': 'user'}
+                                          for u in names if u not in existing])
+        db.session.commit()
+    return [uid for (uid,) in db.session.query(User.id).filter(User.username.in_(names))]
+
+
+def seed_images(n: int, user_ids: list[int], rng: random.Random, days: int = 365, batch_size: int = 5000,
+                ocr_fraction: float = 0.2, on_batch=None) -> int:
+    """Insert ``n`` synthetic Image rows (plus tags and OCR text) in batches; returns rows inserted."""
+    tag_id = {}
+    for name in WORDS:
+        tag = Tag.query.filter_by(name=name).first() or Tag(name=name)
+        db.session.add(tag)
+        db.session.flush()
+        tag_id[name] = tag.id
+    db.session.commit()
+
+    now = datetime.now(UTC)
+    done = 0
+    while done < n:
+        count = min(batch_size, n - done)
+        rows, tags, texts = [], [], []
+        for _ in range(count):
+            words = sorted({_pick(rng, WORDS) for _ in range(rng.randint(1, 4))})
+            checksum = f'{rng.getrandbits(256):064x}'
+            rows.append({
+                'filename': f"{'_'.join(words)}_{rng.randint(1, 99999)}.jpg",
+                'path': f'{checksum[:2]}/{checksum[2:4]}/{checksum}',
+                'checksum': checksum,
+                'uploader_id': rng.choice(user_ids) if user_ids and rng.random() < 0.9 else None,
+                'size': int(rng.lognormvariate(13, 1)),
+                'mime': 'image/jpeg',
+                'category': _pick(rng, CATEGORIES),
+                'tags': ','.join(words),
+                'phash': rng.getrandbits(64) - (1 << 63),
+                'created_at': now - timedelta(seconds=rng.randint(0, days * 86400)),
+            })
+            tags.append(words)
+            texts.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+                         if rng.random() < ocr_fraction else None)
+        ids = db.session.scalars(insert(Image).returning(Image.id, sort_by_parameter_order=True), rows).all()
+        db.session.execute(insert(ImageTag), [{'tag_id': tag_id[w], 'image_id': i}
+                                              for i, words in zip(ids, tags) for w in words])
+        ocr = [{'image_id': i, 'text': t, 'engine': 'seed'} for i, t in zip(ids, texts) if t]
+        if ocr:
+            db.session.execute(insert(OCRText), ocr)
+        db.session.commit()
+        done += count
+        if on_batch:
+            on_batch(done)
+    return done
+
+
+def _png(rng: random.Random) -> bytes:
+    from PIL import Image as PILImage
+    buf = io.BytesIO()
+    PILImage.frombytes('RGB', (64, 64), rng.randbytes(64 * 64 * 3)).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def seed_files(n: int, user_ids: list[int], rng: random.Random) -> int:
+    """Store ``n`` real PNGs through the upload path; returns how many were new."""
+    from flask import current_app
+    from services.file_service import spool_stream, store_spool
+    stored = 0
+    for i in range(n):
+        spool = spool_stream(io.BytesIO(_png(rng)), current_app.config['UPLOAD_FOLDER'])
+        _, duplicate = store_spool(spool, f'seed_{i}.png', category=_pick(rng, CATEGORIES),
+                                   tags=_pick(rng, WORDS), uploader_id=rng.choice(user_ids) if user_ids else None)
+        stored += not duplicate
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=10000, help='Metadata rows to add.')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--files', type=int, default=0, help='Real PNGs stored through the upload path.')
+    parser.add_argument('--days', type=int, default=365, help='Spread created_at over this many days.')
+    parser.add_argument('--ocr-fraction', type=float, default=0.2)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = create_app({'THUMB_WORKERS': 0, 'JOB_AUTOSTART': False})
+    with app.app_context():
+        db.create_all()
+        user_ids = seed_users(args.users)
+        started = time.perf_counter()
+
+        def report(done):
+            rate = done / (time.perf_counter() - started)
+            print(f'images {done}/{args.images} ({rate:.0f} rows/s)', flush=True)
+
+        seed_images(args.images, user_ids, rng, days=args.days, batch_size=args.batch_size,
+                    ocr_fraction=args.ocr_fraction, on_batch=report)
+        if args.files:
+            print(f'files {seed_files(args.files, user_ids, rng)}/{args.files} stored')
+        print(f'catalog: {Image.query.count()} images, {len(user_ids)} users')
+
+
+if __name__ == "__main__":
+    main()
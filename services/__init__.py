@@ -0,0 +1 @@
+"""Service layer: business logic shared by blueprints, CLI commands and workers"""
@@ -0,0 +1,243 @@
+"""Upload/download analytics backed by the ``stat_rollup`` table.
+
+Every upload and every flushed batch of download logs adds its counts to one
+hourly and one daily row per (category, uploader, size class) with an upsert,
+so ``/api/analytics/summary`` only ever aggregates a few hundred rollup rows
+instead of scanning ``image`` and ``download_log``. Counters record events:
+deleting an image does not take back its upload. ``rebuild`` recomputes the
+table from the base tables (for existing databases or after manual edits) and
+``compact`` drops hourly rows once they are older than any window needs.
+"""
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+
+from flask import current_app
+from sqlalchemy import func
+
+from extensions import db
+from models import DownloadLog, Image, StatRollup
+
+HOUR, DAY = 'hour', 'day'
+# window -> (granularity read, number of buckets including the current one)
+WINDOWS = {'day': (HOUR, 24), 'week': (DAY, 7), 'month': (DAY, 30)}
+# upper bounds (bytes) of the size classes; the last class is open-ended
+SIZE_BOUNDS = (100 * 1024, 1 << 20, 10 << 20, 100 << 20)
+SIZE_LABELS = ('<100KB', '100KB-1MB', '1MB-10MB', '10MB-100MB', '>=100MB')
+_KEY = ('granularity', 'bucket', 'category', 'uploader_id', 'size_class')
+_COUNTERS = ('uploads', 'upload_bytes', 'downloads')
+
+
+def size_class(size: int | None) -> int:
+    size = size or 0
+    for i, bound in enumerate(SIZE_BOUNDS):
+        if size < bound:
+            return i
+    return len(SIZE_BOUNDS)
+
+
+def floor(ts: datetime, granularity: str) -> datetime:
+    """Naive UTC start of the hour/day containing ``ts``."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(UTC).replace(tzinfo=None)
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if granularity == DAY else ts
+
+
+def _add(deltas, ts, category, uploader_id, size, uploads=0, upload_bytes=0, downloads=0):
+    for granularity in (HOUR, DAY):
+        key = (granularity, floor(ts, granularity), category or '', uploader_id or 0, size_class(size))
+        counters = deltas[key]
+        counters[0] += uploads
+        counters[1] += upload_bytes
+        counters[2] += downloads
+
+
+def _new_deltas():
+    return defaultdict(lambda: [0, 0, 0])
+
+
+def apply(deltas) -> int:
+    """Add ``{key: [uploads, upload_bytes, downloads]}`` to the rollups (caller commits)."""
+    if not deltas:
+        return 0
+    rows = [dict(zip(_KEY + _COUNTERS, key + tuple(counters))) for key, counters in deltas.items()]
+    table = StatRollup.__table__
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_KEY),
+            set_={c: table.c[c] + stmt.excluded[c] for c in _COUNTERS})
+        db.session.execute(stmt, rows)
+        return len(rows)
+    for row in rows:
+        updated = db.session.execute(
+            table.update().where(*(table.c[k] == row[k] for k in _KEY))
+            .values({c: table.c[c] + row[c] for c in _COUNTERS})).rowcount
+        if not updated:
+            db.session.execute(table.insert(), row)
+    return len(rows)
+
+
+def record_upload(img: Image):
+    deltas = _new_deltas()
+    _add(deltas, img.created_at or datetime.now(UTC), img.category, img.uploader_id, img.size,
+         uploads=1, upload_bytes=img.size or 0)
+    apply(deltas)
+
+
+def record_uploads(rows):
+    """Count a batch of inserted images (``created_at``/``category``/``uploader_id``/``size`` dicts)."""
+    deltas = _new_deltas()
+    for r in rows:
+        _add(deltas, r['created_at'], r['category'], r['uploader_id'], r['size'],
+             uploads=1, upload_bytes=r['size'] or 0)
+    apply(deltas)
+
+
+def record_downloads(rows):
+    """Count a batch of download log rows (``image_id`` + ``timestamp`` dicts)."""
+    ids = {r['image_id'] for r in rows}
+    images = {i.id: i for i in db.session.query(Image.id, Image.category, Image.uploader_id, Image.size)
+              .filter(Image.id.in_(ids))}
+    deltas = _new_deltas()
+    for r in rows:
+        img = images.get(r['image_id'])
+        _add(deltas, r['timestamp'], img and img.category, img and img.uploader_id, img and img.size, downloads=1)
+    apply(deltas)
+
+
+def window_start(window: str, now: datetime | None = None) -> datetime:
+    granularity, buckets = WINDOWS[window]
+    step = timedelta(hours=1) if granularity == HOUR else timedelta(days=1)
+    return floor(now or datetime.now(UTC), granularity) - step * (buckets - 1)
+
+
+def summary(window: str = 'week', category: str | None = None, uploader_id: int | None = None) -> dict:
+    granularity, _ = WINDOWS[window]
+    since = window_start(window)
+
+    def grouped(*columns):
+        q = db.session.query(*columns, func.sum(StatRollup.uploads), func.sum(StatRollup.upload_bytes),
+                             func.sum(StatRollup.downloads)) \
+            .filter(StatRollup.granularity == granularity, StatRollup.bucket >= since)
+        if category is not None:
+            q = q.filter(StatRollup.category == category)
+        if uploader_id is not None:
+            q = q.filter(StatRollup.uploader_id == uploader_id)
+        return q.group_by(*columns).order_by(*columns).all() if columns else q.all()
+
+    def counts(row):
+        return {'uploads': int(row[-3] or 0), 'upload_bytes': int(row[-2] or 0), 'downloads': int(row[-1] or 0)}
+
+    histogram = {row[0]: int(row[1] or 0) for row in grouped(StatRollup.size_class)}
+    return {
+        'window': window,
+        'granularity': granularity,
+        'since': since.isoformat(),
+        **counts(grouped()[0]),
+        'by_category': [{'category': row[0] or None, **counts(row)} for row in grouped(StatRollup.category)],
+        'by_uploader': [{'uploader_id': row[0] or None, **counts(row)} for row in grouped(StatRollup.uploader_id)],
+        'size_histogram': [{'label': label, 'uploads': histogram.get(i, 0)} for i, label in enumerate(SIZE_LABELS)],
+        'series': [{'bucket': row[0].isoformat(), **counts(row)} for row in grouped(StatRollup.bucket)],
+    }
+
+
+def _batches(query, id_column, batch_size):
+    """Keyset-paginate a column query by ``id_column`` (which must be its first column)."""
+    last_id = 0
+    while True:
+        rows = query.filter(id_column > last_id).order_by(id_column).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def rebuild(batch_size: int = 5000) -> int:
+    """Recompute every rollup row from ``image`` and ``download_log``; returns rows written."""
+    deltas = _new_deltas()
+    images = db.session.query(Image.id, Image.created_at, Image.category, Image.uploader_id, Image.size)
+    for rows in _batches(images, Image.id, batch_size):
+        for r in rows:
+            if r.created_at:
+                _add(deltas, r.created_at, r.category, r.uploader_id, r.size, uploads=1, upload_bytes=r.size or 0)
+    downloads = db.session.query(DownloadLog.id, DownloadLog.timestamp, Image.category, Image.uploader_id, Image.size) \
+        .outerjoin(Image, Image.id == DownloadLog.image_id)
+    for rows in _batches(downloads, DownloadLog.id, batch_size):
+        for r in rows:
+            if r.timestamp:
+                _add(deltas, r.timestamp, r.category, r.uploader_id, r.size, downloads=1)
+    db.session.query(StatRollup).delete(synchronize_session=False)
+    written = apply(deltas)
+    db.session.commit()
+    return written
+
+
+def compact(keep_hours: int = 24 * 7) -> int:
+    """Delete hourly rows older than ``keep_hours`` (daily rows keep the totals)."""
+    cutoff = floor(datetime.now(UTC), HOUR) - timedelta(hours=keep_hours)
+    deleted = db.session.query(StatRollup) \
+        .filter(StatRollup.granularity == HOUR, StatRollup.bucket < cutoff) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+# export datasets: name -> (columns, keyset id column)
+EXPORTS = {
+    'rollups': ((StatRollup.id, StatRollup.granularity, StatRollup.bucket, StatRollup.category,
+                 StatRollup.uploader_id, StatRollup.size_class, StatRollup.uploads, StatRollup.upload_bytes,
+                 StatRollup.downloads), StatRollup.id),
+    'images': ((Image.id, Image.filename, Image.checksum, Image.size, Image.mime, Image.category,
+                Image.tags, Image.uploader_id, Image.created_at), Image.id),
+    # client IPs stay in the database
+    'downloads': ((DownloadLog.id, DownloadLog.image_id, DownloadLog.user_id, DownloadLog.timestamp), DownloadLog.id),
+}
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_rows(dataset: str, since: datetime | None = None, batch_size: int = 1000):
+    """Yield the header then each row of ``dataset`` as a tuple, one keyset batch in memory at a time."""
+    columns, id_column = EXPORTS[dataset]
+    query = db.session.query(*columns)
+    if since is not None:
+        time_column = {'rollups': StatRollup.bucket, 'images': Image.created_at,
+                       'downloads': DownloadLog.timestamp}[dataset]
+        query = query.filter(time_column >= since)
+    yield tuple(c.key for c in columns)
+    for rows in _batches(query, id_column, batch_size):
+        for row in rows:
+            yield tuple(_cell(v) for v in row)
+
+
+def stream_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() > 64 * 1024:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def stream_json(rows):
+    rows = iter(rows)
+    header = next(rows)
+    yield '['
+    for i, row in enumerate(rows):
+        # the app's JSON provider (orjson when installed); columns stay in export order
+        item = current_app.json.dumps(dict(zip(header, row)), ensure_ascii=False, sort_keys=False)
+        yield (',' if i else '') + item
+    yield ']'
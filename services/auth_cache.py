@@ -0,0 +1,135 @@
+"""Caches on the ``jwt_required`` hot path.
+
+* Verified JWT payloads, keyed by the SHA-256 of the token, so a token's
+  signature is checked once and not on every request. An entry never outlives
+  the token's own ``exp`` (nor ``JWT_CACHE_TTL``), and only successfully
+  verified tokens are cached.
+* User snapshots (id, username, role, created_at): per request in ``g`` and per
+  process for ``USER_CACHE_TTL`` seconds. ORM updates/deletes of a ``User``
+  evict it here immediately; other processes notice within the TTL.
+
+Both caches are bounded LRUs; size 0 disables them.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+
+from extensions import db
+from models import User
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries carry their own wall-clock deadline."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, key, value, expires_at: float):
+        if self.max_size <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _cache(name: str, size_key: str) -> TTLCache:
+    app = current_app._get_current_object()
+    cache = app.extensions.get(name)
+    if cache is None:
+        cache = app.extensions[name] = TTLCache(app.config.get(size_key, 10000))
+    return cache
+
+
+def get_token_cache() -> TTLCache:
+    return _cache('jwt_cache', 'JWT_CACHE_SIZE')
+
+
+def get_user_cache() -> TTLCache:
+    return _cache('user_cache', 'USER_CACHE_SIZE')
+
+
+def token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def cached_payload(token: str):
+    return get_token_cache().get(token_key(token))
+
+
+def remember_payload(token: str, payload: dict):
+    exp = payload.get('exp')
+    if exp is None:
+        return
+    ttl = current_app.config.get('JWT_CACHE_TTL', 300)
+    get_token_cache().put(token_key(token), payload, min(float(exp), time.time() + ttl))
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    username: str
+    role: str
+    created_at: datetime | None
+
+
+def load_user(user_id: int) -> CachedUser | None:
+    """User snapshot from the request cache, then the process cache, then the database."""
+    per_request = g.setdefault('_users', {})
+    if user_id in per_request:
+        return per_request[user_id]
+    cache = get_user_cache()
+    user = cache.get(user_id)
+    if user is None:
+        row = db.session.get(User, user_id)
+        if row is not None:
+            user = CachedUser(row.id, row.username, row.role, row.created_at)
+            cache.put(user_id, user, time.time() + current_app.config.get('USER_CACHE_TTL', 30))
+    per_request[user_id] = user
+    return user
+
+
+def invalidate_user(user_id: int):
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.pop(user_id)
+    g.get('_users', {}).pop(user_id, None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
@@ -0,0 +1,127 @@
+"""Catalog-wide reprocessing (``flask backfill <task>``).
+
+Image ids are streamed with keyset pagination (``WHERE id > :last ORDER BY id
+LIMIT :n``), so every batch costs the same no matter how deep into the table
+it is. Each batch is filtered down to images whose results are not current,
+computed as a whole on a process pool and persisted in one transaction. Up to
+``workers`` batches are in flight at once; results are applied in id order so
+the checkpoint (highest id fully processed) is always safe to resume from.
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+
+from flask import current_app
+
+from extensions import db
+from models import Image
+from services.jobs import TASKS, get_job_engine
+
+
+@dataclass
+class BackfillProgress:
+    task: str
+    last_id: int = 0
+    scanned: int = 0
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def checkpoint_path(task_name: str) -> str:
+    root = os.path.join(current_app.config['UPLOAD_FOLDER'], '.backfill')
+    os.makedirs(root, exist_ok=True)
+    return os.path.join(root, f'{task_name}.json')
+
+
+def load_checkpoint(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: str, progress: BackfillProgress):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(asdict(progress), f)
+    os.replace(tmp, path)
+
+
+def iter_id_batches(batch_size: int, after_id: int = 0, limit: int | None = None):
+    seen = 0
+    while limit is None or seen < limit:
+        size = batch_size if limit is None else min(batch_size, limit - seen)
+        ids = [i for (i,) in db.session.query(Image.id).filter(Image.id > after_id)
+               .order_by(Image.id).limit(size)]
+        if not ids:
+            return
+        yield ids
+        seen += len(ids)
+        after_id = ids[-1]
+
+
+def _done(value) -> Future:
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+
+def run_backfill(task_name: str, batch_size: int = 256, workers: int = 2, restart: bool = False,
+                 limit: int | None = None, on_batch=None) -> BackfillProgress:
+    get_job_engine()  # make sure task handlers are registered
+    spec = TASKS[task_name].backfill
+    if spec is None:
+        raise ValueError(f'task {task_name!r} has no batch form')
+
+    ckpt = checkpoint_path(task_name)
+    state = {} if restart else load_checkpoint(ckpt)
+    state.pop('task', None)
+    progress = BackfillProgress(task=task_name, **state)
+    elapsed_before = progress.elapsed
+    started = time.monotonic()
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    in_flight = deque()
+
+    def drain_one():
+        batch, todo_ids, fut = in_flight.popleft()
+        results = fut.result()
+        stored = spec.persist(todo_ids, results) if todo_ids else 0
+        progress.processed += stored
+        progress.failed += len(todo_ids) - stored
+        progress.skipped += len(batch) - len(todo_ids)
+        progress.scanned += len(batch)
+        progress.last_id = batch[-1]
+        progress.elapsed = elapsed_before + time.monotonic() - started
+        save_checkpoint(ckpt, progress)
+        if on_batch:
+            on_batch(progress)
+
+    try:
+        for batch in iter_id_batches(batch_size, progress.last_id, limit):
+            todo_ids, payloads = spec.prepare(batch)
+            if not payloads:
+                fut = _done([])
+            elif pool is None:
+                fut = _done(spec.compute(payloads))
+            else:
+                fut = pool.submit(spec.compute, payloads)
+            in_flight.append((batch, todo_ids, fut))
+            if len(in_flight) >= max(1, workers):
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return progress
@@ -0,0 +1,151 @@
+"""Content-addressed blob storage.
+
+Blobs are keyed by their SHA-256 and sharded two levels deep (``ab/cd/<hash>``)
+so no directory grows past 65536 entries. ``Image.path`` stores the blob key,
+not a filesystem path; resolve it through the configured backend. The
+``Blob`` table keeps a reference count so many Image rows can share one blob.
+
+Bytes are only deleted after the transaction that dropped the last reference
+commits, and only if the row still has no references then: a rolled-back
+delete keeps its file, and an upload that took a new reference in the
+meantime wins. The file is removed inside the transaction deleting the row;
+``add_blob`` takes its reference with an UPDATE, which waits for that
+transaction and then finds no row, so it stores the bytes again.
+"""
+import os
+import shutil
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Blob
+
+
+class BlobBackend:
+    """Minimal storage interface; implementations must be safe to call concurrently."""
+
+    def key_for(self, checksum: str) -> str:
+        return f"{checksum[:2]}/{checksum[2:4]}/{checksum}"
+
+    def put(self, checksum: str, src_path: str) -> str:
+        """Move the file at ``src_path`` into storage and return its key."""
+        raise NotImplementedError
+
+    def open(self, key: str):
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> str | None:
+        """Filesystem path for zero-copy serving, or None for remote backends."""
+        return None
+
+
+class LocalBlobBackend(BlobBackend):
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        # rows written before the blob store held absolute paths
+        if os.path.isabs(key):
+            return key
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, checksum: str, src_path: str) -> str:
+        key = self.key_for(checksum)
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.replace(src_path, dest)
+        except OSError:
+            # different filesystem: fall back to copy + unlink
+            shutil.move(src_path, dest)
+        return key
+
+    def open(self, key: str):
+        return open(self.local_path(key), 'rb')
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+BACKENDS = {
+    'local': lambda app: LocalBlobBackend(app.config.get('BLOB_ROOT') or app.config['UPLOAD_FOLDER']),
+}
+
+
+def get_blob_backend() -> BlobBackend:
+    app = current_app._get_current_object()
+    backend = app.extensions.get('blob_backend')
+    if backend is None:
+        backend = BACKENDS[app.config.get('BLOB_BACKEND', 'local')](app)
+        app.extensions['blob_backend'] = backend
+    return backend
+
+
+def local_path(key: str) -> str | None:
+    return get_blob_backend().local_path(key)
+
+
+def add_blob(checksum: str, size: int, src_path: str | None) -> str:
+    """Take a reference on the blob for ``checksum``.
+
+    If the blob is new, ``src_path`` is moved into storage; otherwise the
+    source file is removed and only the reference count is bumped. The caller
+    commits the session.
+    """
+    backend = get_blob_backend()
+    key = backend.key_for(checksum)
+    # bump first: the UPDATE waits on the row lock of a _delete_released_blobs in progress
+    bumped = db.session.query(Blob).filter(Blob.checksum == checksum).update({Blob.refcount: Blob.refcount + 1})
+    if not bumped or not backend.exists(key):
+        if src_path is not None:
+            backend.put(checksum, src_path)
+        if not bumped:
+            db.session.add(Blob(checksum=checksum, size=size, refcount=1))
+    elif src_path is not None and os.path.exists(src_path):
+        os.remove(src_path)
+    return key
+
+
+def release_blob(checksum: str):
+    """Drop one reference; the bytes are deleted after commit once nobody points at them."""
+    blob = db.session.query(Blob).filter(Blob.checksum == checksum).with_for_update().one_or_none()
+    if blob is None:
+        return
+    blob.refcount = Blob.refcount - 1
+    db.session.flush()
+    db.session.refresh(blob)
+    if blob.refcount <= 0:
+        db.session.info.setdefault('released_blobs', set()).add(checksum)
+
+
+@event.listens_for(Session, 'after_commit')
+def _delete_released_blobs(session):
+    checksums = session.info.pop('released_blobs', None)
+    if not checksums or not has_app_context():
+        return
+    backend = get_blob_backend()
+    for checksum in checksums:
+        # re-check: an add_blob committed since then keeps both row and bytes. The bytes go
+        # before this transaction commits, so an add_blob racing it waits and then re-creates both.
+        with db.engine.begin() as conn:
+            if conn.execute(delete(Blob).where(Blob.checksum == checksum, Blob.refcount <= 0)).rowcount:
+                backend.delete(backend.key_for(checksum))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_released_blobs(session):
+    session.info.pop('released_blobs', None)
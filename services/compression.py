@@ -0,0 +1,105 @@
+"""gzip / br compression of text and JSON responses.
+
+Large listings, search results and HTML pages shrink 5-10x, which is most of
+their transfer time on slow links. A response is compressed when the client
+sends ``Accept-Encoding`` with ``br`` (only if the optional Brotli package is
+installed) or ``gzip``, its mimetype is text-like and its body is at least
+``COMPRESS_MIN_BYTES``. Streamed bodies (analytics exports) are compressed
+chunk by chunk as they are produced. File downloads and thumbnails
+(``send_file``) are left alone.
+
+Compressed responses carry ``Vary: Accept-Encoding`` and a weak ETag, since
+the bytes differ from the identity encoding; views answering
+``If-None-Match`` themselves compare with ``contains_weak``.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+STREAM_FLUSH_BYTES = 64 * 1024
+
+
+def choose_encoding(accept_encodings) -> str | None:
+    """``br`` or ``gzip`` per the request's ``Accept-Encoding`` (br preferred on a tie), or None."""
+    br = accept_encodings.quality('br') if brotli is not None else 0
+    gz = accept_encodings.quality('gzip')
+    if br and br >= gz:
+        return 'br'
+    return 'gzip' if gz else None
+
+
+def compress(data: bytes, encoding: str, level: int = 1, br_quality: int = 4) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=br_quality)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding: str, level: int = 1, br_quality: int = 4):
+    """Compress an iterable of str/bytes chunks, yielding output about every ``STREAM_FLUSH_BYTES`` of input."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=br_quality)
+        push, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        push, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            out = push(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                out += flush()
+                pending = 0
+            if out:
+                yield out
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _compressible(response) -> bool:
+    return (200 <= response.status_code < 300 and response.status_code not in (204, 206)
+            and not response.direct_passthrough and 'Content-Encoding' not in response.headers
+            and (response.mimetype or '').startswith(COMPRESSIBLE))
+
+
+def init_compression(app):
+    """Register the after-request hook; call after ``init_metrics`` so metrics see the bytes sent."""
+    config = app.config
+
+    @app.after_request
+    def _compress_response(response):
+        min_bytes = config.get('COMPRESS_MIN_BYTES', 1024)
+        if min_bytes <= 0 or request.method == 'HEAD' or not _compressible(response):
+            return response
+        level = config.get('COMPRESS_LEVEL', 1)
+        br_quality = config.get('COMPRESS_BR_QUALITY', 4)
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level, br_quality)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_bytes:
+                return response
+            response.set_data(compress(data, encoding, level, br_quality))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
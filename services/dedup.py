@@ -0,0 +1,164 @@
+"""Near-duplicate detection with perceptual hashes.
+
+``Image.phash`` holds a 64-bit dHash (stored signed, as databases have no
+unsigned 64-bit type). Each process keeps a ``HashIndex`` over all hashes:
+rows added since the last look are pulled in by id before every query, local
+writes are applied immediately, and the whole index is reloaded every
+``PHASH_INDEX_RELOAD_SECONDS`` to pick up hashes backfilled into older rows.
+
+The catalog-wide cluster report is written by the ``duplicate_clusters`` job
+to ``UPLOAD_FOLDER/.dedup/clusters.json``.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, UTC
+
+from flask import current_app
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Image
+from services import metadata_cache
+from utils.imaging import RENDER_ERRORS, dhash
+
+_SIGN = 1 << 63
+
+
+def to_signed(code: int) -> int:
+    return code - (1 << 64) if code >= _SIGN else code
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def compute_phash(path: str) -> int | None:
+    """Signed dHash of the image at ``path``, or None if it cannot be decoded."""
+    try:
+        return to_signed(dhash(path))
+    except RENDER_ERRORS:
+        return None
+
+
+def compute_phashes(paths: list[str]) -> list[int | None]:
+    return [compute_phash(p) for p in paths]
+
+
+def current_ids(image_ids: list[int]) -> set[int]:
+    return {i for (i,) in db.session.query(Image.id).filter(Image.id.in_(image_ids), Image.phash.isnot(None))}
+
+
+def persist_phashes(pairs) -> int:
+    """Store ``[(image_id, signed_hash), ...]`` and add them to this process's index."""
+    pairs = [(i, h) for i, h in pairs if h is not None]
+    if pairs:
+        db.session.execute(Image.__table__.update().where(Image.id == bindparam('_id'))
+                           .values(phash=bindparam('_phash')),
+                           [{'_id': i, '_phash': h} for i, h in pairs])
+        db.session.commit()
+        metadata_cache.invalidate([i for i, _ in pairs])
+        index = get_hash_index()
+        for image_id, value in pairs:
+            index.add(image_id, value)
+    return len(pairs)
+
+
+class PhashIndex:
+    """``HashIndex`` kept in step with the ``image`` table."""
+
+    def __init__(self, app):
+        from hash_index import HashIndex  # numpy: imported with the first near-duplicate query
+
+        self.app = app
+        self.reload_seconds = app.config.get('PHASH_INDEX_RELOAD_SECONDS', 600)
+        self.index = HashIndex(segments=app.config.get('PHASH_INDEX_SEGMENTS', 4))
+        self._last_id = 0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _rows(self, after_id: int, batch_size: int = 50000):
+        while True:
+            rows = (db.session.query(Image.id, Image.phash)
+                    .filter(Image.id > after_id, Image.phash.isnot(None))
+                    .order_by(Image.id).limit(batch_size).all())
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_seconds
+            if force or stale:
+                ids, codes = [], []
+                for rows in self._rows(0):
+                    ids += [r[0] for r in rows]
+                    codes += [to_unsigned(r[1]) for r in rows]
+                self.index.build(ids, codes)
+                self._last_id = ids[-1] if ids else 0
+                self._loaded_at = time.monotonic()
+                return
+            for rows in self._rows(self._last_id):
+                for image_id, value in rows:
+                    self.index.add(image_id, to_unsigned(value))
+                self._last_id = rows[-1][0]
+
+    def add(self, image_id: int, value: int):
+        self.index.add(image_id, to_unsigned(value))
+
+    def remove(self, image_id: int):
+        self.index.remove(image_id)
+
+    def query(self, value: int, distance: int, exclude: int | None = None) -> list[tuple[int, int]]:
+        self.refresh()
+        return self.index.query(to_unsigned(value), distance, exclude=exclude)
+
+    def clusters(self, distance: int) -> list[list[int]]:
+        self.refresh(force=True)
+        return self.index.clusters(distance)
+
+
+def get_hash_index() -> PhashIndex:
+    app = current_app._get_current_object()
+    index = app.extensions.get('phash_index')
+    if index is None:
+        index = app.extensions['phash_index'] = PhashIndex(app)
+    return index
+
+
+def near_duplicates(value: int, distance: int, exclude: int | None = None, limit: int = 50):
+    """``[(image_id, distance), ...]`` of images whose hash is within ``distance`` bits."""
+    return get_hash_index().query(value, distance, exclude=exclude)[:limit]
+
+
+def report_path() -> str:
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], '.dedup', 'clusters.json')
+
+
+def write_cluster_report(distance: int) -> dict:
+    """Cluster every hashed image and save the report atomically."""
+    started = time.perf_counter()
+    clusters = get_hash_index().clusters(distance)
+    report = {
+        'generated_at': datetime.now(UTC).isoformat(),
+        'distance': distance,
+        'images': len(get_hash_index().index),
+        'seconds': round(time.perf_counter() - started, 3),
+        'clusters': clusters,
+    }
+    path = report_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(report, f)
+    os.replace(path + '.tmp', path)
+    return report
+
+
+def read_cluster_report() -> dict | None:
+    try:
+        with open(report_path()) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
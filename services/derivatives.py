@@ -0,0 +1,79 @@
+"""Thumbnail / preview renditions.
+
+Renditions are keyed by blob checksum and width and cached next to the blobs
+(``<THUMB_ROOT>/ab/cd/<checksum>_<w>.<ext>``), so Image rows sharing a blob
+share its thumbnails. New uploads queue the configured ``THUMB_SIZES`` on a
+process pool; ``/api/images/<id>/thumb`` renders any missing size on demand.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from services.blob_store import local_path
+from utils.imaging import RENDER_ERRORS, THUMB_EXT, render_thumbnail, render_thumbnails
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def thumb_root() -> str:
+    return current_app.config.get('THUMB_ROOT') or os.path.join(current_app.config['UPLOAD_FOLDER'], '.derivatives')
+
+
+def derivative_path(checksum: str, width: int) -> str:
+    return os.path.join(thumb_root(), checksum[:2], checksum[2:4], f'{checksum}_{width}.{THUMB_EXT}')
+
+
+def snap_width(requested: int | None) -> int:
+    """Round a requested width up to a configured size so the cache stays bounded."""
+    sizes = sorted(current_app.config['THUMB_SIZES'])
+    if not requested:
+        return sizes[0]
+    for size in sizes:
+        if size >= requested:
+            return size
+    return sizes[-1]
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def enqueue_derivatives(img):
+    """Queue all configured sizes for a freshly stored image.
+
+    With ``THUMB_WORKERS = 0`` renditions are produced inline instead.
+    """
+    src = local_path(img.path)
+    if not img.checksum or src is None:
+        return None
+    targets = [(derivative_path(img.checksum, w), w) for w in current_app.config['THUMB_SIZES']]
+    targets = [t for t in targets if not os.path.exists(t[0])]
+    if not targets:
+        return None
+    quality = current_app.config.get('THUMB_QUALITY', 80)
+    workers = current_app.config.get('THUMB_WORKERS', 2)
+    if workers <= 0:
+        return render_thumbnails(src, targets, quality)
+    return _get_executor(workers).submit(render_thumbnails, src, targets, quality)
+
+
+def get_or_render(img, width: int) -> str | None:
+    """Path of the cached rendition, rendering it now if it is missing."""
+    path = derivative_path(img.checksum, width)
+    if os.path.exists(path):
+        return path
+    src = local_path(img.path)
+    if src is None or not os.path.exists(src):
+        return None
+    try:
+        return render_thumbnail(src, path, width, current_app.config.get('THUMB_QUALITY', 80))
+    except RENDER_ERRORS:
+        current_app.logger.warning('cannot render thumbnail for image %s', img.id)
+        return None
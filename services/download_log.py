@@ -0,0 +1,114 @@
+"""Buffered DownloadLog writer.
+
+Downloads are recorded in memory and a background thread flushes them as one
+multi-row INSERT when the buffer reaches ``DOWNLOAD_LOG_BATCH_SIZE`` or every
+``DOWNLOAD_LOG_FLUSH_SECONDS`` (0: no thread, call ``flush``), so serving a
+file never waits on a commit. The same transaction adds the batch to the
+analytics rollups. Rows still buffered when the process exits are flushed by
+an atexit hook.
+
+The buffer holds up to ``DOWNLOAD_LOG_MAX_PENDING`` rows. A request that
+finds it full flushes on its own thread (backpressure while the flusher falls
+behind), and rows of a failed flush are kept for the next one, dropping the
+oldest (logged) past the cap.
+"""
+import atexit
+import threading
+import weakref
+from datetime import datetime, UTC
+
+from flask import current_app
+from sqlalchemy import insert
+
+from extensions import db
+from models import DownloadLog
+from services.analytics import record_downloads
+
+_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for writer in list(_writers):
+        writer.flush()
+
+
+class DownloadLogWriter:
+    def __init__(self, app, batch_size: int = 200, flush_seconds: float = 2.0, max_pending: int = 10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max(max_pending, batch_size)
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._batch_ready = threading.Event()
+        self._thread = None
+        _writers.add(self)
+
+    def record(self, image_id: int, user_id: int | None = None, ip: str | None = None):
+        row = {'image_id': image_id, 'user_id': user_id, 'ip': ip, 'timestamp': datetime.now(UTC)}
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows)
+        if pending >= self.max_pending:
+            self.flush()
+            return
+        if pending >= self.batch_size:
+            self._batch_ready.set()
+        self._ensure_thread()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                with self.app.app_context():
+                    db.session.execute(insert(DownloadLog), rows)
+                    record_downloads(rows)
+                    db.session.commit()
+            except Exception:
+                self.app.logger.exception('failed to flush %d download log rows', len(rows))
+                with self._lock:
+                    # keep the rows for the next attempt, oldest first
+                    self._rows[:0] = rows
+                    dropped = len(self._rows) - self.max_pending
+                    if dropped > 0:
+                        del self._rows[:dropped]
+                if dropped > 0:
+                    self.app.logger.warning('download log buffer full: dropped %d oldest rows', dropped)
+                return 0
+            return len(rows)
+
+    def _ensure_thread(self):
+        if self.flush_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='download-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._batch_ready.wait(self.flush_seconds)
+            self._batch_ready.clear()
+            self.flush()
+
+
+def get_download_log_writer() -> DownloadLogWriter:
+    app = current_app._get_current_object()
+    writer = app.extensions.get('download_log_writer')
+    if writer is None:
+        writer = DownloadLogWriter(app,
+                                   batch_size=app.config.get('DOWNLOAD_LOG_BATCH_SIZE', 200),
+                                   flush_seconds=app.config.get('DOWNLOAD_LOG_FLUSH_SECONDS', 2.0),
+                                   max_pending=app.config.get('DOWNLOAD_LOG_MAX_PENDING', 10000))
+        app.extensions['download_log_writer'] = writer
+    return writer
@@ -0,0 +1,102 @@
+"""Upload pipeline shared by the web and API upload endpoints.
+
+Every upload is streamed exactly once: the bytes coming off the request are
+written to a temp file in ``UPLOAD_FOLDER`` while SHA-256 and the byte count
+are updated, then the temp file is either moved into the blob store or dropped
+when the checksum is already stored.
+"""
+import os
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Embedding, Image, Job, OCRText
+from services import metadata_cache
+from services.analytics import record_upload
+from services.blob_store import add_blob, local_path, release_blob
+from services.dedup import compute_phash, get_hash_index
+from services.derivatives import enqueue_derivatives
+from services.image_metadata import apply_header
+from services.tags import remove_image_tags, set_image_tags
+from services.upload_spool import CHUNK_SIZE, HashingSpool, spool_stream  # noqa: F401  (re-exported)
+
+
+def store_upload(file_storage, filename: str, category=None, tags=None, uploader_id=None):
+    """Persist an uploaded file, deduplicating by SHA-256.
+
+    Returns ``(image, duplicate)``. When the same uploader already has this
+    checksum, ``duplicate`` is true and the existing Image row is returned.
+    Other uploaders get their own Image row sharing the stored blob.
+    """
+    spool = file_storage.stream
+    if not isinstance(spool, HashingSpool):
+        spool = spool_stream(spool, current_app.config['UPLOAD_FOLDER'], current_app.config.get('UPLOAD_MAX_BYTES'))
+    return store_spool(spool, filename, category=category, tags=tags, uploader_id=uploader_id)
+
+
+def store_spool(spool: HashingSpool, filename: str, category=None, tags=None, uploader_id=None):
+    """Dedup and persist an already hashed spool; see ``store_upload``."""
+    checksum = spool.hexdigest()
+    existing = Image.query.filter_by(checksum=checksum, uploader_id=uploader_id).first()
+    if existing:
+        spool.discard()
+        return existing, True
+
+    tmp_path = spool.detach()
+    try:
+        img = _insert_image(checksum, spool.size, tmp_path, filename, category, tags, uploader_id)
+    except IntegrityError:
+        # a concurrent upload of the same bytes committed its blob or image row first;
+        # our blob file (if moved) is identical to theirs, so only the rows are retried
+        db.session.rollback()
+        existing = Image.query.filter_by(checksum=checksum, uploader_id=uploader_id).first()
+        if existing:
+            return existing, True
+        img = _insert_image(checksum, spool.size, None, filename, category, tags, uploader_id)
+    if img.phash is not None:
+        get_hash_index().add(img.id, img.phash)
+    try:
+        enqueue_derivatives(img)
+    except Exception:
+        # thumbnails are best effort; /thumb renders on demand if this fails
+        current_app.logger.exception('failed to queue derivatives for image %s', img.id)
+    return img, False
+
+
+def _insert_image(checksum, size, tmp_path, filename, category, tags, uploader_id) -> Image:
+    try:
+        key = add_blob(checksum, size, tmp_path)
+    except BaseException:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    img = Image(filename=filename, path=key, checksum=checksum, size=size,
+                category=category, uploader_id=uploader_id)
+    src = local_path(key)
+    apply_header(img, src)
+    if current_app.config.get('PHASH_ON_UPLOAD', True):
+        img.phash = compute_phash(src) if src else None
+    db.session.add(img)
+    set_image_tags(img, tags)
+    db.session.flush()
+    record_upload(img)
+    db.session.commit()
+    return img
+
+
+def delete_image(img: Image):
+    """Remove an Image row, its derived rows and vector, and release its blob reference."""
+    import embedding_pipeline
+
+    checksum, image_id = img.checksum, img.id
+    embedding_pipeline.vector_store().remove([img.id])
+    for model in (Embedding, OCRText, Job):
+        db.session.query(model).filter(model.image_id == img.id).delete(synchronize_session=False)
+    remove_image_tags(img.id)
+    get_hash_index().remove(img.id)
+    db.session.delete(img)
+    if checksum:
+        release_blob(checksum)
+    db.session.commit()
+    metadata_cache.invalidate([image_id])
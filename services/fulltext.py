@@ -0,0 +1,128 @@
+"""Full-text search over OCR text, filenames and tags.
+
+SQLite uses the ``ocr_texts_fts`` FTS5 table (see models.py) ranked with
+BM25; PostgreSQL uses ``to_tsvector``/``websearch_to_tsquery`` against the GIN
+expression indexes, ranked with ``ts_rank_cd``. User input is never passed to
+MATCH verbatim: every term is quoted, so punctuation cannot produce FTS syntax
+errors, and a trailing ``*`` keeps prefix search.
+"""
+import html
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from extensions import db
+
+# BM25 column weights: filename, tags, OCR text
+WEIGHTS = (2.0, 4.0, 1.0)
+# private-use markers survive escaping and are swapped for <mark> afterwards
+_OPEN, _CLOSE = '\ue000', '\ue001'
+_TERM = re.compile(r'[^\s"]+')
+
+
+class FullTextUnavailable(Exception):
+    pass
+
+
+def build_match(q: str) -> str | None:
+    terms = []
+    for term in _TERM.findall(q or ''):
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+
+def _highlight(snippet: str | None) -> str:
+    return html.escape(snippet or '').replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def _dialect() -> str:
+    return db.engine.dialect.name
+
+
+def search(q: str, page: int = 1, page_size: int = 20, with_total: bool = True):
+    """Ranked matches as ``([(image_id, score, snippet_html), ...], total)``.
+
+    ``score`` is normalised into (0, 1], higher is better.
+    """
+    offset = (page - 1) * page_size
+    try:
+        if _dialect() == 'postgresql':
+            return _search_postgres(q, offset, page_size, with_total)
+        return _search_sqlite(q, offset, page_size, with_total)
+    except (OperationalError, ProgrammingError) as exc:
+        db.session.rollback()
+        raise FullTextUnavailable(str(exc.orig)) from exc
+
+
+def _search_sqlite(q, offset, limit, with_total):
+    match = build_match(q)
+    if match is None:
+        return [], 0
+    rows = db.session.execute(text(
+        "SELECT rowid, bm25(ocr_texts_fts, :wf, :wt, :wx) AS rank, "
+        "snippet(ocr_texts_fts, -1, :open, :close, '…', 16) AS snip "
+        "FROM ocr_texts_fts WHERE ocr_texts_fts MATCH :match "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"),
+        {'wf': WEIGHTS[0], 'wt': WEIGHTS[1], 'wx': WEIGHTS[2], 'open': _OPEN, 'close': _CLOSE,
+         'match': match, 'limit': limit, 'offset': offset}).all()
+    total = None
+    if with_total:
+        total = db.session.execute(text("SELECT count(*) FROM ocr_texts_fts WHERE ocr_texts_fts MATCH :match"),
+                                   {'match': match}).scalar()
+    # bm25() is negative, more negative = better
+    return [(r.rowid, -r.rank / (1.0 - r.rank), _highlight(r.snip)) for r in rows], total
+
+
+_PG_DOC = ("to_tsvector('simple', i.filename || ' ' || coalesce(i.tags, '')) || "
+           "to_tsvector('simple', coalesce(o.text, ''))")
+
+
+def _search_postgres(q, offset, limit, with_total):
+    if not (q or '').strip():
+        return [], 0
+    where = ("(to_tsvector('simple', i.filename || ' ' || coalesce(i.tags, '')) @@ query "
+             "OR to_tsvector('simple', coalesce(o.text, '')) @@ query)")
+    rows = db.session.execute(text(
+        f"SELECT i.id, ts_rank_cd({_PG_DOC}, query) AS rank, "
+        f"ts_headline('simple', coalesce(o.text, '') || ' ' || i.filename, query, "
+        f"'StartSel={_OPEN}, StopSel={_CLOSE}, MaxFragments=1, MaxWords=16, MinWords=4') AS snip "
+        f"FROM image i LEFT JOIN ocr_text o ON o.image_id = i.id, websearch_to_tsquery('simple', :q) query "
+        f"WHERE {where} ORDER BY rank DESC, i.id LIMIT :limit OFFSET :offset"),
+        {'q': q, 'limit': limit, 'offset': offset}).all()
+    total = None
+    if with_total:
+        total = db.session.execute(text(
+            f"SELECT count(*) FROM image i LEFT JOIN ocr_text o ON o.image_id = i.id, "
+            f"websearch_to_tsquery('simple', :q) query WHERE {where}"), {'q': q}).scalar()
+    return [(r.id, r.rank / (1.0 + r.rank), _highlight(r.snip)) for r in rows], total
+
+
+def matching_image_ids(q: str, columns: tuple[str, ...] = ('filename', 'tags')):
+    """Subquery of image ids whose filename/tags match ``q`` (for filtering listings)."""
+    match = build_match(q)
+    if match is None:
+        return None
+    if _dialect() == 'postgresql':
+        return text("SELECT id FROM image WHERE to_tsvector('simple', filename || ' ' || coalesce(tags, '')) "
+                    "@@ websearch_to_tsquery('simple', :q)").bindparams(q=q)
+    column_filter = '{' + ' '.join(columns) + '}'
+    return text("SELECT rowid FROM ocr_texts_fts WHERE ocr_texts_fts MATCH :match").bindparams(
+        match=f'{column_filter} : ({match})')
+
+
+def rebuild():
+    """Repopulate the SQLite index from image/ocr_text (after bulk loads or for pre-FTS databases)."""
+    if _dialect() != 'sqlite':
+        return 0
+    db.session.execute(text("DELETE FROM ocr_texts_fts"))
+    db.session.execute(text(
+        "INSERT INTO ocr_texts_fts(rowid, filename, tags, text) "
+        "SELECT i.id, i.filename, coalesce(i.tags, ''), coalesce(o.text, '') "
+        "FROM image i LEFT JOIN ocr_text o ON o.image_id = i.id"))
+    db.session.execute(text("INSERT INTO ocr_texts_fts(ocr_texts_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return db.session.execute(text("SELECT count(*) FROM ocr_texts_fts")).scalar()
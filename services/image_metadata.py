@@ -0,0 +1,55 @@
+"""Header metadata on ``Image``: width, height, format, mime, EXIF orientation and tags.
+
+``utils.imaging.read_header`` parses only the file header (no pixel decode),
+so it runs inline at upload. ``flask backfill metadata`` fills rows stored
+before the columns existed; rows count as done once ``mime`` is set, which
+every file gets (sniffed from magic bytes when Pillow cannot parse it).
+"""
+import json
+
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Image
+from services import metadata_cache
+from utils.imaging import read_header
+
+COLUMNS = ('width', 'height', 'format', 'mime', 'orientation')
+
+# listing filters on the ix_image_dimensions columns
+ORIENTATIONS = {
+    'landscape': Image.width > Image.height,
+    'portrait': Image.width < Image.height,
+    'square': Image.width == Image.height,
+}
+
+
+def _row(header: dict) -> dict:
+    row = {k: header[k] for k in COLUMNS}
+    row['exif_json'] = json.dumps(header['exif'], ensure_ascii=False) if header['exif'] else None
+    return row
+
+
+def apply_header(img: Image, src_path: str | None):
+    """Fill ``img``'s header columns from the file at ``src_path`` (None leaves them unset)."""
+    if src_path is None:
+        return
+    for key, value in _row(read_header(src_path)).items():
+        setattr(img, key, value)
+
+
+def current_ids(image_ids: list[int]) -> set[int]:
+    return {i for (i,) in db.session.query(Image.id).filter(Image.id.in_(image_ids), Image.mime.isnot(None))}
+
+
+def persist_headers(pairs) -> int:
+    """Store ``[(image_id, header), ...]`` with one executemany UPDATE."""
+    rows = [{'_id': image_id, **{f'_{k}': v for k, v in _row(header).items()}}
+            for image_id, header in pairs if header is not None]
+    if rows:
+        columns = COLUMNS + ('exif_json',)
+        db.session.execute(Image.__table__.update().where(Image.id == bindparam('_id'))
+                           .values({c: bindparam(f'_{c}') for c in columns}), rows)
+        db.session.commit()
+        metadata_cache.invalidate([r['_id'] for r in rows])
+    return len(rows)
@@ -0,0 +1,101 @@
+"""Image serialisation shared by the JSON endpoints (matches the Image schema in api_spec.yaml).
+
+``image_to_dict`` takes an ORM ``Image``. Listing and search pages instead
+select ``LIST_COLUMNS`` only and build the same dicts from the row tuples
+(``image_rows_to_dicts``): no ORM objects are hydrated or put in the identity
+map, and the two URLs are built once per page rather than per row.
+"""
+from flask import url_for
+
+from extensions import db
+from models import Image
+from services.fulltext import matching_image_ids
+from services.tags import ALL, tag_filter
+
+
+def split_tags(tags: str | None) -> list[str]:
+    return [t.strip() for t in (tags or '').split(',') if t.strip()]
+
+
+def image_to_dict(img) -> dict:
+    return {
+        'id': img.id,
+        'filename': img.filename,
+        'url': url_for('files.download', image_id=img.id),
+        'thumb_url': url_for('images.thumbnail', image_id=img.id),
+        'checksum': img.checksum,
+        'size': img.size,
+        'mime': img.mime,
+        'width': img.width,
+        'height': img.height,
+        'format': img.format,
+        'category': img.category,
+        'tags': split_tags(img.tags),
+        'created_at': img.created_at.isoformat() if img.created_at else None,
+    }
+
+
+LIST_COLUMNS = (Image.id, Image.filename, Image.checksum, Image.size, Image.mime, Image.width, Image.height,
+                Image.format, Image.category, Image.tags, Image.created_at)
+
+_ID_MARK = 2147483647  # placeholder id, swapped for '{}' in the URL patterns
+
+
+def _url_patterns() -> tuple[str, str]:
+    mark = str(_ID_MARK)
+    return (url_for('files.download', image_id=_ID_MARK).replace(mark, '{}'),
+            url_for('images.thumbnail', image_id=_ID_MARK).replace(mark, '{}'))
+
+
+def image_rows_to_dicts(rows) -> list[dict]:
+    """``image_to_dict`` for rows of ``LIST_COLUMNS`` (e.g. ``query.with_entities(*LIST_COLUMNS)``)."""
+    download, thumb = _url_patterns()
+    return [{
+        'id': id_,
+        'filename': filename,
+        'url': download.format(id_),
+        'thumb_url': thumb.format(id_),
+        'checksum': checksum,
+        'size': size,
+        'mime': mime,
+        'width': width,
+        'height': height,
+        'format': format_,
+        'category': category,
+        'tags': split_tags(tags),
+        'created_at': created_at.isoformat() if created_at else None,
+    } for id_, filename, checksum, size, mime, width, height, format_, category, tags, created_at in rows]
+
+
+def image_dicts_by_id(image_ids) -> dict[int, dict]:
+    """Projected dicts of the given images (missing ids are absent), in one query."""
+    rows = db.session.query(*LIST_COLUMNS).filter(Image.id.in_(list(image_ids)))
+    return {d['id']: d for d in image_rows_to_dicts(rows)}
+
+
+def image_query(category: str | None = None, uploader_id: int | None = None,
+                q: str | None = None, tags: str | None = None, tag_mode: str = ALL,
+                orientation: str | None = None, min_width: int | None = None, min_height: int | None = None):
+    """Image listing query with the equality filters the composite indexes cover."""
+    from services.image_metadata import ORIENTATIONS  # image_metadata -> metadata_cache -> this module
+
+    query = Image.query
+    if category:
+        query = query.filter(Image.category == category)
+    if uploader_id is not None:
+        query = query.filter(Image.uploader_id == uploader_id)
+    if q:
+        ids = matching_image_ids(q)
+        if ids is not None:
+            query = query.filter(Image.id.in_(ids))
+    if orientation:
+        query = query.filter(ORIENTATIONS[orientation])
+    if min_width:
+        query = query.filter(Image.width >= min_width)
+    if min_height:
+        query = query.filter(Image.height >= min_height)
+    if tags:
+        clause = tag_filter(split_tags(tags), tag_mode)
+        if clause is not None:
+            query = query.filter(clause)
+    return query
@@ -0,0 +1,297 @@
+"""Bulk import of a directory tree (``flask ingest <dir>``).
+
+The tree is walked with ``os.scandir`` in sorted order, so the walk is
+deterministic and the checkpoint is the last path fully handled in it. Batches of
+paths are hashed on a process pool (files of ``MMAP_MIN_BYTES`` and up are
+hashed through ``mmap``, without copying them into Python buffers) and their
+headers read (utils.imaging.read_header) in the same pass. Up to ``workers``
+batches are in flight; the main thread then, per batch and in walk order:
+
+* drops checksums already in ``image`` (and repeats within the batch)
+* copies or hardlinks the new files into blob storage (a thread pool)
+* inserts ``blob``, ``image`` and ``image_tag`` rows with executemany and
+  counts the uploads in the analytics rollups, in one transaction
+
+The checkpoint (``UPLOAD_FOLDER/.ingest/<hash of root>.json``) is written
+after each commit. Re-running after an interruption skips the paths that sort
+at or before it in walk order (``walk_key``), so adding or removing files in
+between neither skips unhandled paths nor re-hashes handled ones (files added
+before the checkpoint wait for ``--restart``); already stored checksums are
+skipped anyway. Thumbnails and perceptual hashes are left
+to ``flask backfill thumbnail`` / ``flask backfill phash``.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, UTC
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Blob, Image, ImageTag
+from services import analytics, tags as tag_service
+from services.backfill import load_checkpoint, save_checkpoint
+from services.blob_store import LocalBlobBackend, get_blob_backend
+from utils.imaging import read_header
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff', '.heic', '.heif'})
+MMAP_MIN_BYTES = 4 << 20
+READ_CHUNK = 1 << 20
+
+
+@dataclass
+class IngestProgress:
+    root: str
+    position: int = 0  # files of the sorted walk fully handled
+    last_path: str | None = None  # relative path of the last of them (the resume point)
+    ingested: int = 0
+    skipped: int = 0
+    failed: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.ingested / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_rate(self) -> float:
+        return self.bytes / self.elapsed / (1 << 20) if self.elapsed else 0.0
+
+
+def walk(root: str, extensions=IMAGE_EXTENSIONS):
+    """Yield file paths under ``root`` in a deterministic order (hidden entries skipped)."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted((e for e in it if not e.name.startswith('.')), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file() and (extensions is None or os.path.splitext(entry.name)[1].lower() in extensions):
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+
+def walk_key(relpath: str) -> tuple:
+    """Sort key matching ``walk`` order: a directory's files by name, then its subdirectories by name."""
+    *dirs, name = relpath.split(os.sep)
+    return tuple((1, d) for d in dirs) + ((0, name),)
+
+
+def sha256_file(path: str) -> tuple[str, int]:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        else:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+                h.update(chunk)
+    return h.hexdigest(), size
+
+
+def hash_files(paths: list[str]) -> list[dict | None]:
+    """Process-pool side: checksum, size, mtime and header per path; None for unreadable files."""
+    out = []
+    for path in paths:
+        try:
+            checksum, size = sha256_file(path)
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            out.append(None)
+            continue
+        out.append({'path': path, 'checksum': checksum, 'size': size, 'mtime': mtime, 'header': read_header(path)})
+    return out
+
+
+def checkpoint_path(root: str) -> str:
+    directory = os.path.join(current_app.config['UPLOAD_FOLDER'], '.ingest')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, hashlib.sha1(root.encode()).hexdigest()[:16] + '.json')
+
+
+def _place(backend: LocalBlobBackend, checksum: str, src: str, link: bool):
+    dest = backend.local_path(backend.key_for(checksum))
+    if os.path.exists(dest):
+        return
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if link:
+        try:
+            os.link(src, dest)
+            return
+        except FileExistsError:
+            return
+        except OSError:
+            pass  # other filesystem or no hardlink support: copy instead
+    tmp = f'{dest}.ingest-{os.getpid()}'
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class Ingester:
+    def __init__(self, root: str, category=None, category_from_dir: bool = False, tags: str | None = None,
+                 uploader_id: int | None = None, link: bool = False, use_mtime: bool = False, copy_threads: int = 4):
+        self.root = root
+        self.category = category
+        self.category_from_dir = category_from_dir
+        self.tags = tags
+        self.uploader_id = uploader_id
+        self.link = link
+        self.use_mtime = use_mtime
+        self.backend = get_blob_backend()
+        if not isinstance(self.backend, LocalBlobBackend):
+            raise ValueError('ingest writes blobs directly and needs the local blob backend')
+        self.copier = ThreadPoolExecutor(max_workers=max(1, copy_threads))
+        self.tag_ids = list(tag_service.tag_ids(tag_service.parse_tags(tags), create=True).values()) if tags else []
+        db.session.commit()
+
+    def _category(self, path: str):
+        if self.category_from_dir:
+            parts = os.path.relpath(path, self.root).split(os.sep)
+            return parts[0] if len(parts) > 1 else self.category
+        return self.category
+
+    def _new(self, files: list[dict]) -> list[dict]:
+        checksums = {f['checksum'] for f in files}
+        known = {c for (c,) in db.session.query(Image.checksum).filter(Image.checksum.in_(checksums))}
+        fresh, seen = [], set()
+        for f in files:
+            if f['checksum'] not in known and f['checksum'] not in seen:
+                seen.add(f['checksum'])
+                fresh.append(f)
+        return fresh
+
+    def _image_row(self, f: dict) -> dict:
+        header = f['header']
+        exif = header['exif']
+        return {
+            'filename': os.path.basename(f['path'])[:512],
+            'path': self.backend.key_for(f['checksum']),
+            'checksum': f['checksum'],
+            'uploader_id': self.uploader_id,
+            'size': f['size'],
+            'mime': header['mime'],
+            'width': header['width'],
+            'height': header['height'],
+            'format': header['format'],
+            'orientation': header['orientation'],
+            'exif_json': json.dumps(exif, ensure_ascii=False) if exif else None,
+            'category': self._category(f['path']),
+            'tags': self.tags,
+            'created_at': datetime.fromtimestamp(f['mtime'], UTC) if self.use_mtime else datetime.now(UTC),
+        }
+
+    def _write(self, files: list[dict]) -> list[dict]:
+        """Store the new files of one batch; returns the ones ingested."""
+        fresh = self._new(files)
+        if not fresh:
+            return []
+        list(self.copier.map(lambda f: _place(self.backend, f['checksum'], f['path'], self.link), fresh))
+        checksums = [f['checksum'] for f in fresh]
+        existing = {c for (c,) in db.session.query(Blob.checksum).filter(Blob.checksum.in_(checksums))}
+        now = datetime.now(UTC)
+        new_blobs = [{'checksum': f['checksum'], 'size': f['size'], 'refcount': 1, 'created_at': now}
+                     for f in fresh if f['checksum'] not in existing]
+        if new_blobs:
+            db.session.execute(insert(Blob), new_blobs)
+        if existing:
+            db.session.query(Blob).filter(Blob.checksum.in_(existing)) \
+                .update({Blob.refcount: Blob.refcount + 1}, synchronize_session=False)
+        rows = [self._image_row(f) for f in fresh]
+        ids = db.session.scalars(insert(Image).returning(Image.id, sort_by_parameter_order=True), rows).all()
+        if self.tag_ids:
+            db.session.execute(insert(ImageTag), [{'tag_id': t, 'image_id': i} for i in ids for t in self.tag_ids])
+        analytics.record_uploads(rows)
+        db.session.commit()
+        return fresh
+
+    def write(self, files: list[dict]) -> list[dict]:
+        try:
+            return self._write(files)
+        except IntegrityError:
+            # a concurrent upload stored one of these checksums first; the re-check skips it
+            db.session.rollback()
+            return self._write(files)
+
+    def close(self):
+        self.copier.shutdown()
+        tag_service.invalidate(self.tag_ids)
+
+
+def run_ingest(root: str, batch_size: int = 1000, workers: int = 4, restart: bool = False, limit: int | None = None,
+               extensions=IMAGE_EXTENSIONS, on_batch=None, **options) -> IngestProgress:
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise ValueError(f'{root} is not a directory')
+    ckpt = checkpoint_path(root)
+    state = {} if restart else load_checkpoint(ckpt)
+    state.pop('root', None)
+    progress = IngestProgress(root=root, **state)
+    elapsed_before = progress.elapsed
+    started = time.monotonic()
+    ingester = Ingester(root, copy_threads=max(1, workers), **options)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    in_flight = deque()
+
+    def drain_one():
+        paths, pending = in_flight.popleft()
+        hashed = pending.result() if pool is not None else pending
+        files = [f for f in hashed if f is not None]
+        stored = ingester.write(files)
+        progress.ingested += len(stored)
+        progress.skipped += len(files) - len(stored)
+        progress.failed += len(hashed) - len(files)
+        progress.bytes += sum(f['size'] for f in stored)
+        progress.position += len(paths)
+        progress.last_path = os.path.relpath(paths[-1], root)
+        progress.elapsed = elapsed_before + time.monotonic() - started
+        save_checkpoint(ckpt, progress)
+        if on_batch:
+            on_batch(progress)
+
+    def batches():
+        batch, seen = [], 0
+        resume_after = walk_key(progress.last_path) if progress.last_path else None
+        for path in walk(root, extensions):
+            if resume_after is not None:
+                if walk_key(os.path.relpath(path, root)) <= resume_after:
+                    continue
+                resume_after = None  # walk order is monotonic: everything after this is new
+            if limit is not None and seen >= limit:
+                break
+            batch.append(path)
+            seen += 1
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    try:
+        for paths in batches():
+            in_flight.append((paths, hash_files(paths) if pool is None else pool.submit(hash_files, paths)))
+            if len(in_flight) >= max(1, workers):
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        ingester.close()
+    return progress
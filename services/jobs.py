@@ -0,0 +1,308 @@
+"""In-process job engine backed by the ``job`` table.
+
+Jobs are persisted, so pending work survives restarts and no broker is
+needed. A dispatcher thread claims runnable rows with a conditional UPDATE
+(safe when several processes share the database), runs them on a thread pool
+and applies per-task concurrency limits. Failures are retried with exponential
+backoff until ``max_attempts``; handlers raise ``PermanentJobError`` to fail
+immediately. CPU-heavy handlers push their inner work to the shared process
+pool with ``run_in_process`` so request threads and the GIL stay free.
+
+There is one row per (image_id, task): re-triggering a pending, running or
+finished job returns it unchanged unless ``force`` is set.
+"""
+import threading
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Job
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help."""
+
+
+@dataclass
+class BackfillSpec:
+    """Batch form of a task used by ``flask backfill``.
+
+    ``prepare(ids)`` runs in the app and returns ``(ids, payloads)`` for the
+    images that are not current yet; ``compute(payloads)`` runs in a worker
+    process on the whole batch; ``persist(ids, results)`` writes the results
+    back in one transaction and returns how many were stored.
+    """
+    prepare: Callable[[list[int]], tuple[list[int], list]]
+    compute: Callable[[list], list]
+    persist: Callable[[list[int], list], int]
+
+
+@dataclass
+class TaskSpec:
+    name: str
+    fn: Callable[[int], object]
+    concurrency: int = 1
+    max_attempts: int = 3
+    backfill: BackfillSpec | None = None
+    per_image: bool = True  # False: catalog-wide job, enqueued with image_id None
+
+
+TASKS: dict[str, TaskSpec] = {}
+
+
+def task(name: str, concurrency: int = 1, max_attempts: int = 3, per_image: bool = True):
+    """Register ``fn(image_id)`` as the handler for ``name``."""
+    def decorator(fn):
+        TASKS[name] = TaskSpec(name, fn, concurrency, max_attempts, per_image=per_image)
+        return fn
+    return decorator
+
+
+def register_backfill(name: str, prepare, compute, persist):
+    TASKS[name].backfill = BackfillSpec(prepare, compute, persist)
+
+
+def _now() -> datetime:
+    return datetime.now(UTC)
+
+
+def enqueue(image_id: int | None, task_name: str, force: bool = False) -> Job:
+    spec = TASKS[task_name]
+    job = Job.query.filter_by(image_id=image_id, task=task_name).first()
+    if job is None:
+        job = Job(image_id=image_id, task=task_name, max_attempts=spec.max_attempts)
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another worker enqueued the same pair first
+            db.session.rollback()
+            job = Job.query.filter_by(image_id=image_id, task=task_name).one()
+    elif job.status == FAILED or (force and job.status != RUNNING):
+        job.status = PENDING
+        job.attempts = 0
+        job.last_error = None
+        job.run_after = _now()
+        db.session.commit()
+    get_job_engine().notify()
+    return job
+
+
+def enqueue_many(image_ids, task_name: str) -> int:
+    """Bulk enqueue, skipping pairs that already have a row; returns rows added."""
+    image_ids = list(image_ids)
+    if not image_ids:
+        return 0
+    existing = {i for (i,) in db.session.query(Job.image_id)
+                .filter(Job.task == task_name, Job.image_id.in_(image_ids))}
+    spec = TASKS[task_name]
+    now = _now()
+    rows = [{'image_id': i, 'task': task_name, 'status': PENDING, 'attempts': 0,
+             'max_attempts': spec.max_attempts, 'run_after': now, 'created_at': now, 'updated_at': now}
+            for i in image_ids if i not in existing]
+    if rows:
+        db.session.execute(Job.__table__.insert(), rows)
+        db.session.commit()
+        get_job_engine().notify()
+    return len(rows)
+
+
+def job_status(image_id: int) -> list[Job]:
+    return Job.query.filter_by(image_id=image_id).order_by(Job.task).all()
+
+
+def settled(found: list[Job]) -> bool:
+    """True when none of ``found`` can still change on its own."""
+    return all(job.status in (DONE, FAILED) for job in found)
+
+
+def run_in_process(fn, *args):
+    """Run ``fn(*args)`` on the job process pool (inline when it is disabled)."""
+    return get_job_engine().run_in_process(fn, *args)
+
+
+class JobEngine:
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', 4)
+        self.process_workers = app.config.get('JOB_PROCESS_WORKERS', 2)
+        self.poll_seconds = app.config.get('JOB_POLL_SECONDS', 2.0)
+        self.retry_base = app.config.get('JOB_RETRY_BASE_SECONDS', 5)
+        self.retry_max = app.config.get('JOB_RETRY_MAX_SECONDS', 600)
+        self.stale_seconds = app.config.get('JOB_STALE_SECONDS', 900)
+        self.concurrency_overrides = app.config.get('JOB_CONCURRENCY', {})
+        self._threads = None
+        self._processes = None
+        self._running = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher = None
+
+    @property
+    def started(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def limit(self, task_name: str) -> int:
+        return self.concurrency_overrides.get(task_name, TASKS[task_name].concurrency)
+
+    def start(self):
+        if self.workers <= 0 or self.started:
+            return
+        with self._lock:
+            if self.started:
+                return
+            self._stop.clear()
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self.recover_stale()
+            self._dispatcher = threading.Thread(target=self._loop, name='job-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher:
+            self._dispatcher.join(timeout=5)
+        if self._threads:
+            self._threads.shutdown(wait=wait)
+        if self._processes:
+            self._processes.shutdown(wait=wait)
+        self._dispatcher = self._threads = self._processes = None
+
+    def notify(self):
+        self._wake.set()
+
+    def run_in_process(self, fn, *args):
+        if self.process_workers <= 0:
+            return fn(*args)
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._processes.submit(fn, *args).result()
+
+    def recover_stale(self):
+        """Requeue jobs left ``running`` by a worker that died."""
+        cutoff = _now() - timedelta(seconds=self.stale_seconds)
+        with self.app.app_context():
+            db.session.query(Job).filter(Job.status == RUNNING, Job.updated_at < cutoff) \
+                .update({Job.status: PENDING, Job.run_after: _now()}, synchronize_session=False)
+            db.session.commit()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self._dispatch(self._submit)
+            except Exception:
+                self.app.logger.exception('job dispatcher error')
+                claimed = 0
+            if not claimed:
+                self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _submit(self, job_id: int, task_name: str):
+        self._threads.submit(self._execute, job_id, task_name)
+
+    def _dispatch(self, submit) -> int:
+        with self._lock:
+            capacity = {name: self.limit(name) - self._running[name] for name in TASKS}
+        capacity = {name: free for name, free in capacity.items() if free > 0}
+        if not capacity:
+            return 0
+        claimed = 0
+        with self.app.app_context():
+            candidates = (db.session.query(Job.id, Job.task)
+                          .filter(Job.status == PENDING, Job.run_after <= _now(), Job.task.in_(list(capacity)))
+                          .order_by(Job.id)
+                          .limit(sum(capacity.values()) * 4)
+                          .all())
+            for job_id, task_name in candidates:
+                if capacity.get(task_name, 0) <= 0:
+                    continue
+                if not self._claim(job_id):
+                    continue
+                capacity[task_name] -= 1
+                with self._lock:
+                    self._running[task_name] += 1
+                claimed += 1
+                submit(job_id, task_name)
+        return claimed
+
+    def _claim(self, job_id: int) -> bool:
+        result = db.session.execute(
+            Job.__table__.update()
+            .where(Job.id == job_id, Job.status == PENDING)
+            .values(status=RUNNING, attempts=Job.attempts + 1, updated_at=_now()))
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _execute(self, job_id: int, task_name: str):
+        try:
+            with self.app.app_context():
+                job = db.session.get(Job, job_id)
+                if job is None:
+                    # delete_image removed the job after it was claimed
+                    db.session.rollback()
+                    return
+                image_id = job.image_id
+                try:
+                    TASKS[task_name].fn(image_id)
+                except Exception as exc:
+                    db.session.rollback()
+                    job = db.session.get(Job, job_id)
+                    if job is None:
+                        return
+                    self._record_failure(job, exc)
+                else:
+                    # a plain UPDATE: the row may have been deleted while the handler ran
+                    db.session.execute(Job.__table__.update().where(Job.id == job_id)
+                                       .values(status=DONE, last_error=None, updated_at=_now()))
+                db.session.commit()
+        finally:
+            with self._lock:
+                self._running[task_name] -= 1
+            self._wake.set()
+
+    def _record_failure(self, job: Job, exc: Exception):
+        job.last_error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()[:2000]
+        if isinstance(exc, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = FAILED
+            self.app.logger.warning('job %s (%s, image %s) failed: %s', job.id, job.task, job.image_id, job.last_error)
+        else:
+            delay = min(self.retry_max, self.retry_base * 2 ** (job.attempts - 1))
+            job.status = PENDING
+            job.run_after = _now() + timedelta(seconds=delay)
+
+    def run_once(self) -> int:
+        """Run every currently runnable job in the calling thread; returns jobs run."""
+        total = 0
+        while True:
+            batch = []
+            self._dispatch(lambda job_id, task_name: batch.append((job_id, task_name)))
+            if not batch:
+                return total
+            for job_id, task_name in batch:
+                self._execute(job_id, task_name)
+            total += len(batch)
+
+
+def get_job_engine() -> JobEngine:
+    app = current_app._get_current_object()
+    engine = app.extensions.get('job_engine')
+    if engine is None:
+        # handlers register themselves on import
+        import services.tasks  # noqa: F401
+        engine = JobEngine(app)
+        app.extensions['job_engine'] = engine
+    # under TESTING jobs only run when the test calls run_once()
+    if app.config.get('JOB_AUTOSTART', True) and not app.testing:
+        engine.start()
+    return engine
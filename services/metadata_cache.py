@@ -0,0 +1,241 @@
+"""Read-through cache of image detail records (``/api/images/<id>``, ``/web/images/<id>``).
+
+A record is the ``image_to_dict`` payload plus the OCR text and embedding
+reference, and carries an ETag derived from its content, so detail requests
+can answer ``If-None-Match`` with a 304 and hot pages never touch the database.
+
+* Per process: a bounded LRU (``METADATA_CACHE_SIZE``, 0 = off) holding
+  records for ``METADATA_CACHE_TTL`` seconds.
+* Shared (optional): with ``METADATA_CACHE_PATH`` set, records also go to a
+  SQLite file (WAL) the workers of one host share, so one worker's database
+  read serves the others. The per-process copy is then only trusted for
+  ``METADATA_CACHE_LOCAL_TTL`` seconds, the longest an invalidation made by
+  another worker can go unnoticed here.
+
+New uploads get new ids, so only later writes need to drop records: the
+OCR/embedding/phash persisters (jobs, reprocess and backfill) and
+``delete_image`` call ``invalidate`` after committing, and ORM updates and
+deletes of ``Image`` rows are collected by mapper events and invalidated once
+their session commits, as a safety net.
+
+Records are public: EXIF is cut down to ``PUBLIC_EXIF`` (no GPS, serial
+numbers or owner names), and ``viewer_record`` shows ``uploader_id`` only to
+the uploader.
+
+Each id's last invalidation time is kept (per process, and in the shared
+file) for a TTL: a reader that started loading before it does not store its
+now-stale record.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import Embedding, Image, OCRText
+from services.auth_cache import TTLCache
+from services.image_service import image_to_dict
+
+# EXIF served with image details; everything else (GPSInfo, serial numbers, owner) stays in the database
+PUBLIC_EXIF = frozenset({'Make', 'Model', 'Orientation', 'DateTime', 'Software', 'XResolution', 'YResolution'})
+PUBLIC_EXIF_IFD = frozenset({'DateTimeOriginal', 'DateTimeDigitized', 'ExposureTime', 'FNumber', 'ExposureProgram',
+                             'ISOSpeedRatings', 'ExposureBiasValue', 'MeteringMode', 'Flash', 'FocalLength',
+                             'FocalLengthIn35mmFilm', 'WhiteBalance', 'LensMake', 'LensModel', 'ColorSpace'})
+
+
+class SharedTier:
+    """``image_meta`` table in a standalone SQLite file."""
+
+    _SCHEMA = ('CREATE TABLE IF NOT EXISTS image_meta (image_id INTEGER PRIMARY KEY, etag TEXT NOT NULL, '
+               'data TEXT NOT NULL, expires_at REAL NOT NULL)',
+               'CREATE TABLE IF NOT EXISTS image_meta_invalidated (image_id INTEGER PRIMARY KEY, at REAL NOT NULL)')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            for stmt in self._SCHEMA:
+                conn.execute(stmt)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, image_id: int):
+        row = self._connect().execute('SELECT etag, data FROM image_meta WHERE image_id = ? AND expires_at > ?',
+                                      (image_id, time.time())).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put(self, image_id: int, record: tuple, expires_at: float, loaded_at: float) -> bool:
+        """Store ``record`` unless the id was invalidated at or after ``loaded_at``; False if it was."""
+        with self._connect() as conn:
+            return conn.execute('INSERT OR REPLACE INTO image_meta SELECT ?, ?, ?, ? WHERE NOT EXISTS '
+                                '(SELECT 1 FROM image_meta_invalidated WHERE image_id = ? AND at >= ?)',
+                                (image_id, record[0], json.dumps(record[1]), expires_at, image_id,
+                                 loaded_at)).rowcount == 1
+
+    def delete(self, image_ids: list[int], at: float, keep: float):
+        with self._connect() as conn:
+            conn.executemany('DELETE FROM image_meta WHERE image_id = ?', [(i,) for i in image_ids])
+            conn.executemany('INSERT OR REPLACE INTO image_meta_invalidated VALUES (?, ?)',
+                             [(i, at) for i in image_ids])
+            conn.execute('DELETE FROM image_meta_invalidated WHERE at < ?', (at - keep,))
+
+
+class MetadataCache:
+    def __init__(self, size: int, ttl: float, shared: SharedTier | None = None, local_ttl: float = 5.0):
+        self.local = TTLCache(size)
+        self.ttl = ttl
+        self.shared = shared
+        self.local_ttl = min(ttl, local_ttl) if shared else ttl
+        self._invalidated = {}  # image_id -> last invalidation time, kept for ttl
+        self._pruned_at = time.time()
+        self._lock = threading.Lock()
+
+    def get(self, image_id: int):
+        record = self.local.get(image_id)
+        if record is None and self.shared is not None:
+            record = self.shared.get(image_id)
+            if record is not None:
+                self.local.put(image_id, record, time.time() + self.local_ttl)
+        return record
+
+    def put(self, image_id: int, record: tuple, loaded_at: float | None = None):
+        """Cache a record read from the database at ``loaded_at`` (``time.time()`` before the read).
+
+        Dropped if the id was invalidated since, so a slow reader cannot put
+        back what a writer has just invalidated.
+        """
+        now = time.time()
+        if loaded_at is None:
+            loaded_at = now
+        if self._invalidated.get(image_id, -1.0) >= loaded_at:
+            return
+        # another worker's invalidation is only visible in the shared file
+        if self.shared is not None and not self.shared.put(image_id, record, now + self.ttl, loaded_at):
+            return
+        with self._lock:
+            if self._invalidated.get(image_id, -1.0) < loaded_at:
+                self.local.put(image_id, record, now + self.local_ttl)
+
+    def invalidate(self, image_ids):
+        image_ids = list(image_ids)
+        now = time.time()
+        with self._lock:
+            for image_id in image_ids:
+                self._invalidated[image_id] = now
+                self.local.pop(image_id)
+            if now - self._pruned_at > self.ttl:
+                self._invalidated = {k: t for k, t in self._invalidated.items() if t >= now - self.ttl}
+                self._pruned_at = now
+        if self.shared is not None and image_ids:
+            self.shared.delete(image_ids, now, self.ttl)
+
+
+def get_metadata_cache() -> MetadataCache:
+    app = current_app._get_current_object()
+    cache = app.extensions.get('metadata_cache')
+    if cache is None:
+        path = app.config.get('METADATA_CACHE_PATH')
+        cache = MetadataCache(app.config.get('METADATA_CACHE_SIZE', 10000), app.config.get('METADATA_CACHE_TTL', 300),
+                              shared=SharedTier(path) if path else None,
+                              local_ttl=app.config.get('METADATA_CACHE_LOCAL_TTL', 5))
+        app.extensions['metadata_cache'] = cache
+    return cache
+
+
+def public_exif(exif: dict | None) -> dict | None:
+    if not exif:
+        return None
+    out = {k: v for k, v in exif.items() if k in PUBLIC_EXIF}
+    ifd = {k: v for k, v in (exif.get('Exif') or {}).items() if k in PUBLIC_EXIF_IFD}
+    if ifd:
+        out['Exif'] = ifd
+    return out or None
+
+
+def _load(image_id: int) -> dict | None:
+    img = db.session.get(Image, image_id)
+    if img is None:
+        return None
+    ocr = db.session.query(OCRText.text, OCRText.engine).filter(OCRText.image_id == image_id) \
+        .order_by(OCRText.id.desc()).first()
+    emb = db.session.query(Embedding.vector_ref, Embedding.model_name).filter(Embedding.image_id == image_id) \
+        .order_by(Embedding.id.desc()).first()
+    return {
+        **image_to_dict(img),
+        'uploader_id': img.uploader_id,
+        'orientation': img.orientation,
+        'exif': public_exif(json.loads(img.exif_json)) if img.exif_json else None,
+        'phash': f'{img.phash & (2 ** 64 - 1):016x}' if img.phash is not None else None,
+        'ocr_text': ocr.text if ocr else None,
+        'ocr_engine': ocr.engine if ocr else None,
+        'embedding_ref': emb.vector_ref if emb else None,
+        'embedding_model': emb.model_name if emb else None,
+    }
+
+
+def etag_for(data: dict) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def image_detail(image_id: int) -> tuple[str, dict] | None:
+    """``(etag, record)`` for an image, from the cache when possible; None if it does not exist."""
+    cache = get_metadata_cache()
+    record = cache.get(image_id)
+    if record is None:
+        loaded_at = time.time()
+        data = _load(image_id)
+        if data is None:
+            return None
+        record = (etag_for(data), data)
+        cache.put(image_id, record, loaded_at)
+    return record
+
+
+def viewer_record(record: tuple[str, dict], user_id: int | None) -> tuple[str, dict]:
+    """``record`` as ``user_id`` may see it: ``uploader_id`` only for the uploader (with its own ETag)."""
+    etag, data = record
+    data = dict(data)
+    uploader_id = data.pop('uploader_id', None)
+    if uploader_id is not None and uploader_id == user_id:
+        return f'{etag}-own', {**data, 'uploader_id': uploader_id}
+    return etag, data
+
+
+def invalidate(image_ids):
+    """Drop cached records; call after the change is committed."""
+    if has_app_context():
+        get_metadata_cache().invalidate(image_ids)
+
+
+@event.listens_for(Image, 'after_update')
+@event.listens_for(Image, 'after_delete')
+def _image_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_images', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed(session):
+    image_ids = session.info.pop('changed_images', None)
+    if image_ids:
+        invalidate(image_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed(session):
+    session.info.pop('changed_images', None)
@@ -0,0 +1,244 @@
+"""Per-request performance instrumentation and the Prometheus ``/metrics`` endpoint.
+
+Every request records, labelled by Flask endpoint (bounded cardinality, unlike
+raw paths):
+
+* ``http_request_duration_seconds``: latency histogram, also by method/status.
+  It covers the view and hooks but not streaming the body to the client.
+* ``http_request_db_queries`` / ``http_request_db_seconds``: SQL statements
+  per request and the time spent in them. These come from SQLAlchemy cursor
+  events, so an N+1 shows up as a fat tail in the query-count histogram.
+* ``http_request_bytes_total`` / ``http_response_bytes_total``: upload and
+  download volume.
+
+Requests slower than ``SLOW_REQUEST_MS`` are logged with their SQL, and
+repeated statements are counted first. When ``ACCESS_LOG`` is on, every
+request is written to ``LOG_DIR/access.log`` (JSON with ``LOG_FORMAT=json``).
+
+Set ``METRICS_ENABLED=0`` to drop the route (hooks still feed the logs) and
+``METRICS_TOKEN`` to require ``Authorization: Bearer <token>`` on it.
+
+Metrics live in process memory: with several workers each process serves its
+own ``/metrics``, so scrape every worker or aggregate by instance.
+"""
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from collections import Counter as Tally
+
+from flask import Response, current_app, g, request
+from sqlalchemy import event
+
+from extensions import db
+from logging_config import ACCESS_LOGGER
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_current = contextvars.ContextVar('request_sql', default=None)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets: tuple):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for values, (counts, total, n) in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, counts):
+                    le = _labels(self.labels + ('le',), values + (bound,))
+                    lines.append(f'{self.name}_bucket{le} {count}')
+                lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), values + ("+Inf",))} {n}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, values)} {total}')
+                lines.append(f'{self.name}_count{_labels(self.labels, values)} {n}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *label_values):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            lines += [f'{self.name}{_labels(self.labels, v)} {n}' for v, n in sorted(self._series.items())]
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.latency = Histogram('http_request_duration_seconds', 'Request latency (view + hooks).',
+                                 ('method', 'endpoint', 'status'), LATENCY_BUCKETS)
+        self.queries = Histogram('http_request_db_queries', 'SQL statements per request.',
+                                 ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.query_time = Histogram('http_request_db_seconds', 'Time in SQL per request.',
+                                    ('endpoint',), QUERY_TIME_BUCKETS)
+        self.request_bytes = Counter('http_request_bytes_total', 'Request body bytes received.', ('endpoint',))
+        self.response_bytes = Counter('http_response_bytes_total', 'Response body bytes sent (known lengths).',
+                                      ('endpoint',))
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def render(self, app) -> str:
+        lines = []
+        for metric in (self.latency, self.queries, self.query_time, self.request_bytes, self.response_bytes):
+            lines += metric.render()
+        lines += ['# HELP http_requests_in_flight Requests being handled.', '# TYPE http_requests_in_flight gauge',
+                  f'http_requests_in_flight {self.in_flight}']
+        hasher = app.extensions.get('password_hasher')
+        if hasher is not None:
+            stats = hasher.stats()
+            for key in ('pending', 'calls', 'rejected', 'timeouts'):
+                kind = 'gauge' if key == 'pending' else 'counter'
+                lines += [f'# TYPE password_hasher_{key} {kind}', f'password_hasher_{key} {stats[key]}']
+        return '\n'.join(lines) + '\n'
+
+
+class RequestSQL:
+    """Statements run on behalf of one request (also from threads it fans out to)."""
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            if len(self.statements) < self.keep:
+                self.statements.append((statement, seconds))
+
+
+def get_metrics() -> Metrics:
+    app = current_app._get_current_object()
+    metrics = app.extensions.get('metrics')
+    if metrics is None:
+        metrics = app.extensions['metrics'] = Metrics()
+    return metrics
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and conn.info.get('query_start'):
+        stats.add(statement, time.perf_counter() - conn.info['query_start'].pop())
+
+
+def _endpoint() -> str:
+    return request.endpoint or 'none'
+
+
+def _log_slow(app, stats: RequestSQL, seconds: float):
+    repeated = [(n, sql) for sql, n in Tally(s for s, _ in stats.statements).most_common() if n > 1]
+    lines = [f'slow request {request.method} {request.path} ({_endpoint()}): {seconds * 1000:.0f}ms, '
+             f'{stats.count} queries in {stats.seconds * 1000:.0f}ms']
+    lines += [f'  repeated x{n}: {sql}' for n, sql in repeated]
+    lines += [f'  {s * 1000:.1f}ms {sql}' for sql, s in stats.statements]
+    if stats.count > len(stats.statements):
+        lines.append(f'  ... {stats.count - len(stats.statements)} more')
+    app.logger.warning('\n'.join(lines))
+
+
+def init_metrics(app):
+    """Register request hooks, SQL listeners and the ``/metrics`` route."""
+    metrics = app.extensions['metrics'] = Metrics()
+    slow_seconds = app.config['SLOW_REQUEST_MS'] / 1000
+    keep = app.config['SLOW_REQUEST_MAX_STATEMENTS']
+    access_log = logging.getLogger(ACCESS_LOGGER) if app.config['ACCESS_LOG'] else None
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_start = time.perf_counter()
+        g._metrics_sql = RequestSQL(keep)
+        g._metrics_token = _current.set(g._metrics_sql)
+        with metrics._lock:
+            metrics.in_flight += 1
+
+    @app.after_request
+    def _record_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        stats = g._metrics_sql
+        endpoint = _endpoint()
+        metrics.latency.observe(seconds, request.method, endpoint, str(response.status_code))
+        metrics.queries.observe(stats.count, endpoint)
+        metrics.query_time.observe(stats.seconds, endpoint)
+        if request.content_length:
+            metrics.request_bytes.inc(request.content_length, endpoint)
+        if response.content_length:
+            metrics.response_bytes.inc(response.content_length, endpoint)
+        if slow_seconds and seconds >= slow_seconds:
+            _log_slow(app, stats, seconds)
+        if access_log is not None:
+            fields = {
+                'method': request.method, 'path': request.path, 'endpoint': endpoint,
+                'status': response.status_code, 'duration_ms': round(seconds * 1000, 2),
+                'db_queries': stats.count, 'db_ms': round(stats.seconds * 1000, 2),
+                'request_bytes': request.content_length or 0, 'response_bytes': response.content_length,
+                'remote_addr': request.remote_addr,
+            }
+            access_log.info('%(method)s %(path)s %(status)s %(duration_ms)sms db=%(db_queries)s/%(db_ms)sms',
+                            fields, extra=fields)
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        token = g.pop('_metrics_token', None)
+        if token is not None:
+            _current.reset(token)
+            with metrics._lock:
+                metrics.in_flight -= 1
+
+    def metrics_view():
+        token = app.config.get('METRICS_TOKEN')
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+        return Response(metrics.render(app), mimetype='text/plain; version=0.0.4')
+
+    if app.config['METRICS_ENABLED']:
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
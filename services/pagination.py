@@ -0,0 +1,126 @@
+"""Keyset (cursor) pagination shared by the JSON API and the web gallery.
+
+Pages are addressed by the sort key of their boundary row instead of an
+OFFSET, so the database seeks straight to the page through the composite
+index and page 5000 costs the same as page 1. Cursors are opaque, URL-safe
+tokens; clients pass ``next_cursor`` / ``prev_cursor`` back unchanged.
+
+Exact totals need a full count, so they are optional and cached per filter for
+``PAGINATION_COUNT_TTL`` seconds.
+"""
+import base64
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import DateTime, tuple_
+
+NEXT, PREV = 'n', 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class Page:
+    items: list
+    page_size: int
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    total: int | None = None
+
+    def meta(self) -> dict:
+        return {'page_size': self.page_size, 'next_cursor': self.next_cursor,
+                'prev_cursor': self.prev_cursor, 'total': self.total}
+
+
+def encode_cursor(values, direction: str = NEXT) -> str:
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    token = json.dumps({'k': raw, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(token).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str, keys) -> tuple[list, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        raw, direction = payload['k'], payload['d']
+        if direction not in (NEXT, PREV) or len(raw) != len(keys):
+            raise ValueError(direction)
+        values = [datetime.fromisoformat(v) if isinstance(k.type, DateTime) else v
+                  for k, v in zip(keys, raw)]
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor('invalid cursor') from exc
+    return values, direction
+
+
+def paginate(query, keys, cursor: str | None = None, page_size: int = 20,
+             descending: bool = True, with_total: bool = False) -> Page:
+    """Fetch one page of ``query`` ordered by ``keys`` (unique as a tuple, e.g. ``(created_at, id)``).
+
+    Raises ``InvalidCursor`` for a malformed or foreign cursor.
+    """
+    total = count_cached(query) if with_total else None
+    values, direction = decode_cursor(cursor, keys) if cursor else (None, NEXT)
+    backwards = direction == PREV
+    # walking backwards flips the comparison and the order; the rows are reversed afterwards
+    seek_desc = descending != backwards
+    if values is not None:
+        row, bound = tuple_(*keys), tuple_(*values)
+        query = query.filter(row < bound if seek_desc else row > bound)
+    order = [k.desc() if seek_desc else k.asc() for k in keys]
+    rows = query.order_by(*order).limit(page_size + 1).all()
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    page = Page(rows, page_size, total=total)
+    if rows:
+        first = [getattr(rows[0], k.key) for k in keys]
+        last = [getattr(rows[-1], k.key) for k in keys]
+        # the extra row tells whether more lies ahead; the page we came from lies behind
+        has_next = backwards or more
+        has_prev = more if backwards else values is not None
+        if has_next:
+            page.next_cursor = encode_cursor(last, NEXT)
+        if has_prev:
+            page.prev_cursor = encode_cursor(first, PREV)
+    return page
+
+
+class _CountCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+        value = compute()
+        with self._lock:
+            if len(self._entries) > 1024:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + self.ttl, value)
+        return value
+
+
+def count_cached(query) -> int:
+    """``query.count()``, memoised per SQL + parameters for ``PAGINATION_COUNT_TTL`` seconds."""
+    app = current_app._get_current_object()
+    ttl = app.config.get('PAGINATION_COUNT_TTL', 30)
+    if ttl <= 0:
+        return query.order_by(None).count()
+    cache = app.extensions.get('count_cache')
+    if cache is None:
+        cache = app.extensions['count_cache'] = _CountCache(ttl)
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    return cache.get(key, lambda: query.order_by(None).count())
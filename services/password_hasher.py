@@ -0,0 +1,176 @@
+"""Password hashing off the request thread.
+
+pbkdf2_sha256 costs ~100ms of CPU by design. Hashes and verifications run on
+a small process pool (``HASH_WORKERS``; 0 = inline) so a login burst queues
+there instead of pinning every worker thread. The queue is bounded:
+
+* more than ``HASH_MAX_PENDING`` calls in flight -> ``HasherOverloaded`` (429)
+* no result within ``HASH_TIMEOUT_SECONDS`` -> ``HasherTimeout`` (503)
+
+so overload turns into fast, retryable errors rather than an unbounded latency
+pile-up. Verification uses ``CryptContext.verify_and_update``: when the
+configured scheme or ``PASSWORD_ROUNDS`` changes, a successful login returns a
+replacement hash for the caller to store.
+"""
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+
+from flask import current_app
+from passlib.context import CryptContext
+
+# latency histogram bucket upper bounds, seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class HasherOverloaded(Exception):
+    """Too many hash calls already queued."""
+
+
+class HasherTimeout(Exception):
+    """The hash call did not finish in time."""
+
+
+def context_settings(config) -> tuple:
+    """Hashable CryptContext keyword arguments from the app config."""
+    settings = [('schemes', tuple(config.get('PASSWORD_SCHEMES', ('pbkdf2_sha256',)))), ('deprecated', 'auto')]
+    rounds = config.get('PASSWORD_ROUNDS')
+    if rounds:
+        # pin min = max = default so a changed setting marks older hashes for rehash
+        for key in ('default_rounds', 'min_rounds', 'max_rounds'):
+            settings.append((f'pbkdf2_sha256__{key}', int(rounds)))
+    return tuple(settings)
+
+
+@lru_cache(maxsize=8)
+def _context(settings: tuple) -> CryptContext:
+    return CryptContext(**{k: list(v) if k == 'schemes' else v for k, v in settings})
+
+
+# module-level so they can be pickled into the worker processes
+def _hash(settings: tuple, password: str) -> str:
+    return _context(settings).hash(password)
+
+
+def _verify(settings: tuple, password: str, password_hash: str) -> tuple[bool, str | None]:
+    try:
+        return _context(settings).verify_and_update(password, password_hash)
+    except ValueError:
+        # malformed or unknown hash format
+        return False, None
+
+
+class PasswordHasher:
+    def __init__(self, settings: tuple, workers: int = 2, max_pending: int = 32, timeout: float = 10.0):
+        self.settings = settings
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak = 0
+        self._calls = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._seconds = 0.0
+        self._buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, self.settings, password)
+
+    def verify(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        """``(ok, new_hash)``; ``new_hash`` is set when the stored hash should be replaced."""
+        return self._run(_verify, self.settings, password, password_hash)
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HasherOverloaded()
+            self._pending += 1
+            self._peak = max(self._peak, self._pending)
+            if self.workers > 0 and self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        start = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+                self._record(time.perf_counter() - start)
+        released = []
+
+        def release(_future=None):
+            with self._lock:
+                if not released:
+                    released.append(True)
+                    self._pending -= 1
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            release()
+            raise
+        # the slot is held until the work really finishes: a timed-out hash keeps
+        # running in the pool, and admitting more calls then would only grow its backlog
+        future.add_done_callback(release)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise HasherTimeout() from None
+        except BaseException:
+            release()
+            raise
+        finally:
+            self._record(time.perf_counter() - start)
+        release()  # done already; the callback may not have run yet
+        return result
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _record(self, seconds: float):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            self._calls += 1
+            self._seconds += seconds
+            self._buckets[bucket] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'peak_pending': self._peak,
+                'max_pending': self.max_pending,
+                'calls': self._calls,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'latency_seconds_sum': round(self._seconds, 6),
+                'latency_seconds_avg': round(self._seconds / self._calls, 6) if self._calls else None,
+                'latency_buckets': {('+Inf' if i == len(LATENCY_BUCKETS) else str(LATENCY_BUCKETS[i])): n
+                                    for i, n in enumerate(self._buckets)},
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    app = current_app._get_current_object()
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = PasswordHasher(context_settings(app.config),
+                                workers=app.config.get('HASH_WORKERS', 2),
+                                max_pending=app.config.get('HASH_MAX_PENDING', 32),
+                                timeout=app.config.get('HASH_TIMEOUT_SECONDS', 10.0))
+        app.extensions['password_hasher'] = hasher
+    return hasher
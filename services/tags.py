@@ -0,0 +1,202 @@
+"""Normalised tag index: ``tag`` names plus ``image_tag`` posting lists.
+
+``Image.tags`` keeps the comma-separated string as the user typed it (it is
+what the API returns and what the full-text index sees); ``image_tag`` is the
+index used for filtering. Multi-tag AND filters are INTERSECTs of per-tag
+primary-key range scans and OR filters a single ``tag_id IN (...)`` scan, so
+neither touches the image table until the page is fetched.
+
+Optionally the posting lists of hot tags are kept in memory as sorted int64
+arrays (``TAG_CACHE_SIZE`` > 0): selective intersections of large tags are then
+computed with numpy (imported when the cache is first filled) and handed to
+the query as an id list.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from flask import current_app
+from sqlalchemy import false, intersect, select
+
+from extensions import db
+from models import Image, ImageTag, Tag
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ALL, ANY = 'all', 'any'
+
+
+def normalize(name: str) -> str:
+    return name.strip().lower()[:128]
+
+
+def parse_tags(tags: str | None) -> list[str]:
+    """Normalised, de-duplicated tag names from a comma-separated string, in input order."""
+    seen = {}
+    for part in (tags or '').split(','):
+        name = normalize(part)
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def _insert_ignore(table):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(table).on_conflict_do_nothing()
+
+
+def tag_ids(names, create: bool = False) -> dict[str, int]:
+    """Map tag names to ids; with ``create`` missing names are inserted first."""
+    names = list(names)
+    if not names:
+        return {}
+    found = dict(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(names)))
+    missing = [n for n in names if n not in found]
+    if create and missing:
+        stmt = _insert_ignore(Tag.__table__)
+        if stmt is not None:
+            db.session.execute(stmt, [{'name': n} for n in missing])
+        else:
+            db.session.add_all(Tag(name=n) for n in missing)
+            db.session.flush()
+        found.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)))
+    return found
+
+
+def set_image_tags(img: Image, tags: str | None):
+    """Replace the posting rows of ``img`` (flushed, not committed)."""
+    img.tags = tags
+    if img.id is None:
+        db.session.flush()
+    old = {t for (t,) in db.session.query(ImageTag.tag_id).filter(ImageTag.image_id == img.id)}
+    new = set(tag_ids(parse_tags(tags), create=True).values())
+    if old - new:
+        db.session.query(ImageTag).filter(ImageTag.image_id == img.id, ImageTag.tag_id.in_(old - new)) \
+            .delete(synchronize_session=False)
+    if new - old:
+        db.session.execute(ImageTag.__table__.insert(), [{'tag_id': t, 'image_id': img.id} for t in new - old])
+    invalidate(old ^ new)
+
+
+def remove_image_tags(image_id: int):
+    old = [t for (t,) in db.session.query(ImageTag.tag_id).filter(ImageTag.image_id == image_id)]
+    db.session.query(ImageTag).filter(ImageTag.image_id == image_id).delete(synchronize_session=False)
+    invalidate(old)
+
+
+def tag_filter(names, mode: str = ALL):
+    """WHERE clause restricting ``Image`` to the given tags (``mode`` all = AND, any = OR)."""
+    names = [n for n in (normalize(n) for n in names) if n]
+    if not names:
+        return None
+    ids = tag_ids(names)
+    if mode == ALL and len(ids) < len(set(names)):
+        return false()
+    if not ids:
+        return false()
+    cached = get_posting_cache().lookup(list(ids.values()), mode)
+    if cached is not None:
+        return Image.id.in_(cached.tolist())
+    if mode == ANY or len(ids) == 1:
+        return Image.id.in_(select(ImageTag.image_id).where(ImageTag.tag_id.in_(list(ids.values()))))
+    return Image.id.in_(intersect(*(select(ImageTag.image_id).where(ImageTag.tag_id == t)
+                                    for t in ids.values())))
+
+
+def migrate_tags(batch_size: int = 1000, on_batch=None) -> int:
+    """Split ``Image.tags`` into ``image_tag`` for every image; idempotent. Returns images tagged."""
+    tagged, last_id = 0, 0
+    while True:
+        rows = (db.session.query(Image.id, Image.tags).filter(Image.id > last_id)
+                .order_by(Image.id).limit(batch_size).all())
+        if not rows:
+            return tagged
+        last_id = rows[-1].id
+        parsed = {r.id: parse_tags(r.tags) for r in rows}
+        ids = tag_ids({n for names in parsed.values() for n in names}, create=True)
+        db.session.query(ImageTag).filter(ImageTag.image_id.in_(list(parsed))).delete(synchronize_session=False)
+        links = [{'tag_id': ids[n], 'image_id': image_id} for image_id, names in parsed.items() for n in names]
+        if links:
+            db.session.execute(ImageTag.__table__.insert(), links)
+        db.session.commit()
+        invalidate(ids.values())
+        tagged += sum(1 for names in parsed.values() if names)
+        if on_batch:
+            on_batch(last_id, tagged)
+
+
+class PostingCache:
+    """LRU of sorted image-id arrays per tag id, each valid for ``ttl`` seconds."""
+
+    def __init__(self, max_tags: int = 0, ttl: float = 60, max_ids: int = 2000):
+        self.max_tags = max_tags
+        self.ttl = ttl
+        self.max_ids = max_ids
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _postings(self, tag_id: int) -> 'np.ndarray':
+        import numpy as np
+
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(tag_id)
+            if hit and hit[0] > now:
+                self._entries.move_to_end(tag_id)
+                return hit[1]
+        rows = db.session.execute(select(ImageTag.image_id).where(ImageTag.tag_id == tag_id)
+                                  .order_by(ImageTag.image_id)).scalars()
+        ids = np.fromiter(rows, dtype=np.int64)
+        with self._lock:
+            self._entries[tag_id] = (now + self.ttl, ids)
+            self._entries.move_to_end(tag_id)
+            while len(self._entries) > self.max_tags:
+                self._entries.popitem(last=False)
+        return ids
+
+    def lookup(self, tag_ids: list[int], mode: str = ALL) -> 'np.ndarray | None':
+        """Matching image ids, or None when disabled or the result is too large to inline."""
+        if self.max_tags <= 0 or len(tag_ids) > self.max_tags:
+            return None
+        import numpy as np
+
+        lists = sorted((self._postings(t) for t in tag_ids), key=len)
+        if mode == ALL:
+            result = lists[0]
+            for other in lists[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, other, assume_unique=True)
+        else:
+            result = lists[0]
+            for other in lists[1:]:
+                result = np.union1d(result, other)
+        return result if len(result) <= self.max_ids else None
+
+    def invalidate(self, tag_ids):
+        with self._lock:
+            for t in tag_ids:
+                self._entries.pop(t, None)
+
+
+def get_posting_cache() -> PostingCache:
+    app = current_app._get_current_object()
+    cache = app.extensions.get('tag_postings')
+    if cache is None:
+        cache = PostingCache(app.config.get('TAG_CACHE_SIZE', 0), app.config.get('TAG_CACHE_TTL', 60),
+                             app.config.get('TAG_CACHE_MAX_IN', 2000))
+        app.extensions['tag_postings'] = cache
+    return cache
+
+
+def invalidate(tag_ids):
+    if tag_ids:
+        get_posting_cache().invalidate(tag_ids)
@@ -0,0 +1,154 @@
+"""Job handlers for /api/process/trigger and the backfill command.
+
+Each handler resolves the image's blob, pushes the CPU-bound part to the job
+process pool via ``run_in_process`` and persists the result from the worker
+thread (which owns an app context and DB session). The batch forms at the
+bottom are what ``flask backfill`` feeds whole id batches through.
+"""
+import os
+
+from flask import current_app
+
+from extensions import db
+from models import Image
+from services import dedup, image_metadata
+from services.blob_store import local_path
+from services.derivatives import derivative_path, enqueue_derivatives
+from services.jobs import PermanentJobError, register_backfill, run_in_process, task
+from utils.imaging import RENDER_ERRORS, read_header, read_headers, render_thumbnails
+
+import embedding_pipeline
+import ocr_pipeline
+
+
+def _source_path(image_id: int) -> str:
+    img = db.session.get(Image, image_id)
+    if img is None:
+        raise PermanentJobError(f'image {image_id} not found')
+    path = local_path(img.path)
+    if path is None or not os.path.exists(path):
+        raise PermanentJobError(f'blob for image {image_id} is missing')
+    return path
+
+
+@task('embedding', concurrency=1)
+def embedding_task(image_id: int):
+    path = _source_path(image_id)
+    try:
+        vector = run_in_process(embedding_pipeline.compute_embedding, path)
+    except RENDER_ERRORS as exc:
+        raise PermanentJobError(f'cannot decode image: {exc}') from exc
+    embedding_pipeline.persist_embedding(image_id, vector)
+
+
+@task('ocr', concurrency=2)
+def ocr_task(image_id: int):
+    path = _source_path(image_id)
+    try:
+        text = run_in_process(ocr_pipeline.run_ocr, path)
+    except ocr_pipeline.OCRUnavailable as exc:
+        raise PermanentJobError(str(exc)) from exc
+    except RENDER_ERRORS as exc:
+        raise PermanentJobError(f'cannot decode image: {exc}') from exc
+    ocr_pipeline.persist_ocr(image_id, text)
+
+
+@task('thumbnail', concurrency=2)
+def thumbnail_task(image_id: int):
+    img = db.session.get(Image, image_id)
+    if img is None:
+        raise PermanentJobError(f'image {image_id} not found')
+    result = enqueue_derivatives(img)
+    if hasattr(result, 'result'):
+        result.result()
+
+
+@task('phash', concurrency=2)
+def phash_task(image_id: int):
+    path = _source_path(image_id)
+    value = run_in_process(dedup.compute_phash, path)
+    if value is None:
+        raise PermanentJobError('cannot decode image')
+    dedup.persist_phashes([(image_id, value)])
+
+
+@task('metadata', concurrency=2)
+def metadata_task(image_id: int):
+    path = _source_path(image_id)
+    image_metadata.persist_headers([(image_id, run_in_process(read_header, path))])
+
+
+@task('duplicate_clusters', max_attempts=1, per_image=False)
+def duplicate_clusters_task(image_id: None = None):
+    dedup.write_cluster_report(current_app.config.get('PHASH_CLUSTER_DISTANCE', 4))
+
+
+def _resolve_paths(image_ids: list[int]) -> dict[int, str]:
+    paths = {}
+    for image_id, key in db.session.query(Image.id, Image.path).filter(Image.id.in_(image_ids)):
+        path = local_path(key)
+        if path is not None and os.path.exists(path):
+            paths[image_id] = path
+    return paths
+
+
+def _prepare_with(current_ids):
+    def prepare(image_ids):
+        done = current_ids(image_ids)
+        todo = [i for i in image_ids if i not in done]
+        paths = _resolve_paths(todo)
+        ids = [i for i in todo if i in paths]
+        return ids, [paths[i] for i in ids]
+    return prepare
+
+
+def _persist_embeddings(image_ids, vectors):
+    pairs = [(i, v) for i, v in zip(image_ids, vectors) if v is not None]
+    embedding_pipeline.persist_embeddings(pairs)
+    return len(pairs)
+
+
+def _persist_ocr(image_ids, texts):
+    pairs = [(i, t) for i, t in zip(image_ids, texts) if t is not None]
+    ocr_pipeline.persist_ocr_batch(pairs)
+    return len(pairs)
+
+
+def _persist_phashes(image_ids, values):
+    return dedup.persist_phashes(zip(image_ids, values))
+
+
+def _persist_headers(image_ids, headers):
+    return image_metadata.persist_headers(zip(image_ids, headers))
+
+
+def _prepare_thumbnails(image_ids):
+    ids, payloads = [], []
+    rows = db.session.query(Image.id, Image.path, Image.checksum).filter(Image.id.in_(image_ids))
+    for image_id, key, checksum in rows:
+        src = local_path(key)
+        if not checksum or src is None or not os.path.exists(src):
+            continue
+        targets = [(derivative_path(checksum, w), w) for w in current_app.config['THUMB_SIZES']]
+        targets = [t for t in targets if not os.path.exists(t[0])]
+        if targets:
+            ids.append(image_id)
+            payloads.append((src, targets))
+    return ids, payloads
+
+
+def _render_thumbnail_batch(payloads):
+    return [render_thumbnails(src, targets) for src, targets in payloads]
+
+
+def _count_rendered(image_ids, results):
+    return sum(1 for r in results if r)
+
+
+register_backfill('embedding', _prepare_with(embedding_pipeline.current_ids),
+                  embedding_pipeline.compute_embeddings, _persist_embeddings)
+register_backfill('ocr', _prepare_with(ocr_pipeline.current_ids),
+                  ocr_pipeline.run_ocr_batch, _persist_ocr)
+register_backfill('phash', _prepare_with(dedup.current_ids), dedup.compute_phashes, _persist_phashes)
+register_backfill('metadata', _prepare_with(image_metadata.current_ids), read_headers, _persist_headers)
+register_backfill('thumbnail', _prepare_thumbnails, _render_thumbnail_batch, _count_rendered)
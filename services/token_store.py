@@ -0,0 +1,296 @@
+"""Refresh-token stores.
+
+A refresh token is usable while its ``jti`` is in the store; logout removes it.
+The store is selected with ``TOKEN_STORE``:
+
+* ``database`` (default) keeps one ``refresh_token`` row per jti in the main
+  database, so every worker and every host sees the same tokens and they
+  survive restarts. Lookups and revocations are primary-key operations.
+* ``sqlite`` keeps the same table in a separate SQLite file
+  (``TOKEN_STORE_PATH``) in WAL mode, for single-host multi-worker setups whose
+  main database should not take auth writes.
+* ``memory`` is per process and only meant for tests and one-worker dev runs.
+
+The shared stores sit behind a small LRU of recent answers: a revoked or
+unknown jti stays revoked, so negative answers are cached until the token
+would expire anyway, while positive answers are trusted for
+``TOKEN_CACHE_TTL`` seconds (the longest a logout on another worker can go
+unnoticed here). A daemon thread deletes expired rows every
+``TOKEN_SWEEP_SECONDS``.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, UTC
+
+from flask import current_app
+
+from extensions import db
+from models import RefreshToken
+
+log = logging.getLogger(__name__)
+
+
+def _utc(ts: datetime) -> datetime:
+    """Naive UTC, the form DateTime columns hand back."""
+    return ts.astimezone(UTC).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class TokenStore:
+    """Interface; implementations must be safe to call from several threads."""
+
+    def add(self, jti: str, user_id: int, expires_at: datetime):
+        raise NotImplementedError
+
+    def is_active(self, jti: str) -> bool:
+        raise NotImplementedError
+
+    def revoke(self, jti: str) -> bool:
+        """Remove ``jti``; returns whether it was active."""
+        raise NotImplementedError
+
+    def revoke_user(self, user_id: int) -> int:
+        """Remove every token of ``user_id``; returns how many were removed."""
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Delete expired tokens; returns how many were removed."""
+        raise NotImplementedError
+
+
+class MemoryTokenStore(TokenStore):
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti, user_id, expires_at):
+        with self._lock:
+            self._tokens[jti] = (user_id, _utc(expires_at))
+
+    def is_active(self, jti):
+        entry = self._tokens.get(jti)
+        return entry is not None and entry[1] > _utcnow()
+
+    def revoke(self, jti):
+        with self._lock:
+            return self._tokens.pop(jti, None) is not None
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            doomed = [jti for jti, (uid, _) in self._tokens.items() if uid == user_id]
+            for jti in doomed:
+                del self._tokens[jti]
+        return len(doomed)
+
+    def sweep(self):
+        now = _utcnow()
+        with self._lock:
+            doomed = [jti for jti, (_, exp) in self._tokens.items() if exp <= now]
+            for jti in doomed:
+                del self._tokens[jti]
+        return len(doomed)
+
+
+class CachedTokenStore(TokenStore):
+    """LRU answer cache and expiry sweeper around a shared backend (``_insert`` / ``_lookup`` / ...)."""
+
+    def __init__(self, cache_size: int = 4096, cache_ttl: float = 5.0, sweep_seconds: float = 3600):
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.sweep_seconds = sweep_seconds
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _remember(self, jti, active, expires_at):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[jti] = (active, expires_at, time.monotonic())
+            self._cache.move_to_end(jti)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def add(self, jti, user_id, expires_at):
+        expires_at = _utc(expires_at)
+        self._insert(jti, user_id, expires_at)
+        self._remember(jti, True, expires_at)
+        self._ensure_sweeper()
+
+    def is_active(self, jti):
+        now = _utcnow()
+        with self._lock:
+            hit = self._cache.get(jti)
+            if hit is not None:
+                self._cache.move_to_end(jti)
+        if hit is not None:
+            active, expires_at, cached_at = hit
+            if not active:
+                return False
+            if time.monotonic() - cached_at < self.cache_ttl:
+                return expires_at > now
+        expires_at = self._lookup(jti)
+        active = expires_at is not None and expires_at > now
+        self._remember(jti, active, expires_at)
+        return active
+
+    def revoke(self, jti):
+        removed = self._delete(jti)
+        self._remember(jti, False, None)
+        return removed
+
+    def revoke_user(self, user_id):
+        jtis = self._delete_user(user_id)
+        for jti in jtis:
+            self._remember(jti, False, None)
+        return len(jtis)
+
+    def sweep(self):
+        return self._delete_expired(_utcnow())
+
+    def _ensure_sweeper(self):
+        if self.sweep_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run_sweeper, name='token-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run_sweeper(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self.sweep()
+            except Exception:
+                # the next round retries; a failed sweep only delays cleanup
+                log.exception('refresh token sweep failed')
+
+    def _insert(self, jti, user_id, expires_at):
+        raise NotImplementedError
+
+    def _lookup(self, jti) -> datetime | None:
+        raise NotImplementedError
+
+    def _delete(self, jti) -> bool:
+        raise NotImplementedError
+
+    def _delete_user(self, user_id) -> list[str]:
+        raise NotImplementedError
+
+    def _delete_expired(self, now) -> int:
+        raise NotImplementedError
+
+
+class DatabaseTokenStore(CachedTokenStore):
+    """``refresh_token`` table in the application database."""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(**kwargs)
+        self.app = app
+
+    def _insert(self, jti, user_id, expires_at):
+        db.session.add(RefreshToken(jti=jti, user_id=user_id, expires_at=expires_at))
+        db.session.commit()
+
+    def _lookup(self, jti):
+        return db.session.query(RefreshToken.expires_at).filter(RefreshToken.jti == jti).scalar()
+
+    def _delete(self, jti):
+        removed = db.session.query(RefreshToken).filter(RefreshToken.jti == jti).delete(synchronize_session=False)
+        db.session.commit()
+        return bool(removed)
+
+    def _delete_user(self, user_id):
+        jtis = [j for (j,) in db.session.query(RefreshToken.jti).filter(RefreshToken.user_id == user_id)]
+        if jtis:
+            db.session.query(RefreshToken).filter(RefreshToken.jti.in_(jtis)).delete(synchronize_session=False)
+            db.session.commit()
+        return jtis
+
+    def _delete_expired(self, now):
+        # the sweeper thread has no app context of its own
+        with self.app.app_context():
+            removed = db.session.query(RefreshToken).filter(RefreshToken.expires_at <= now) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+        return removed
+
+
+class SQLiteTokenStore(CachedTokenStore):
+    """Standalone SQLite file (WAL) shared by the workers of one host."""
+
+    _SCHEMA = ("CREATE TABLE IF NOT EXISTS refresh_token (jti TEXT PRIMARY KEY, user_id INTEGER NOT NULL, "
+               "expires_at TEXT NOT NULL)",
+               "CREATE INDEX IF NOT EXISTS ix_refresh_token_user_id ON refresh_token (user_id)",
+               "CREATE INDEX IF NOT EXISTS ix_refresh_token_expires_at ON refresh_token (expires_at)")
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            for stmt in self._SCHEMA:
+                conn.execute(stmt)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, jti, user_id, expires_at):
+        with self._connect() as conn:
+            conn.execute('INSERT INTO refresh_token VALUES (?, ?, ?)', (jti, user_id, expires_at.isoformat()))
+
+    def _lookup(self, jti):
+        row = self._connect().execute('SELECT expires_at FROM refresh_token WHERE jti = ?', (jti,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def _delete(self, jti):
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM refresh_token WHERE jti = ?', (jti,)).rowcount > 0
+
+    def _delete_user(self, user_id):
+        with self._connect() as conn:
+            jtis = [j for (j,) in conn.execute('SELECT jti FROM refresh_token WHERE user_id = ?', (user_id,))]
+            conn.execute('DELETE FROM refresh_token WHERE user_id = ?', (user_id,))
+        return jtis
+
+    def _delete_expired(self, now):
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM refresh_token WHERE expires_at <= ?', (now.isoformat(),)).rowcount
+
+
+def _cache_options(app) -> dict:
+    return {'cache_size': app.config.get('TOKEN_CACHE_SIZE', 4096),
+            'cache_ttl': app.config.get('TOKEN_CACHE_TTL', 5),
+            'sweep_seconds': app.config.get('TOKEN_SWEEP_SECONDS', 3600)}
+
+
+BACKENDS = {
+    'database': lambda app: DatabaseTokenStore(app, **_cache_options(app)),
+    'sqlite': lambda app: SQLiteTokenStore(
+        app.config.get('TOKEN_STORE_PATH') or os.path.join(app.instance_path, 'tokens.db'), **_cache_options(app)),
+    'memory': lambda app: MemoryTokenStore(),
+}
+
+
+def get_token_store() -> TokenStore:
+    app = current_app._get_current_object()
+    store = app.extensions.get('token_store')
+    if store is None:
+        store = BACKENDS[app.config.get('TOKEN_STORE', 'database')](app)
+        app.extensions['token_store'] = store
+    return store
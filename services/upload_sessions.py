@@ -0,0 +1,138 @@
+"""Resumable chunked uploads.
+
+A session records the declared size/chunk size/checksum in ``UploadSession``.
+Chunks are written as ``<index>.part`` files under
+``UPLOAD_FOLDER/.sessions/<upload_id>/``; each PUT lands in a private temp file
+and is renamed into place, so retries and parallel PUTs of the same index are
+harmless. The set of received chunks is read from the directory, not the DB,
+so chunk uploads never contend on a database write.
+"""
+import math
+import os
+import shutil
+import tempfile
+import uuid
+
+from flask import current_app
+
+from extensions import db
+from models import UploadSession
+from services.file_service import CHUNK_SIZE, HashingSpool, store_spool
+
+
+class UploadSessionError(Exception):
+    def __init__(self, code: int, message: str, status: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+def _session_dir(upload_id: str) -> str:
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], '.sessions', upload_id)
+
+
+def _part_path(upload_id: str, index: int) -> str:
+    return os.path.join(_session_dir(upload_id), f'{index}.part')
+
+
+def total_chunks(session: UploadSession) -> int:
+    return max(1, math.ceil(session.size / session.chunk_size))
+
+
+def expected_chunk_size(session: UploadSession, index: int) -> int:
+    if index < total_chunks(session) - 1:
+        return session.chunk_size
+    return session.size - session.chunk_size * (total_chunks(session) - 1)
+
+
+def create_session(filename: str, size: int, chunk_size: int | None = None, checksum: str | None = None,
+                   category=None, tags=None, uploader_id=None) -> UploadSession:
+    max_bytes = current_app.config.get('UPLOAD_MAX_BYTES')
+    if size <= 0:
+        raise UploadSessionError(1002, 'size must be positive')
+    if max_bytes and size > max_bytes:
+        raise UploadSessionError(1002, 'file too large', status=413)
+    chunk_size = chunk_size or current_app.config['UPLOAD_CHUNK_SIZE']
+    if chunk_size <= 0 or chunk_size > current_app.config['UPLOAD_MAX_CHUNK_SIZE']:
+        raise UploadSessionError(1002, 'invalid chunk_size')
+    if checksum is not None and (len(checksum) != 64 or any(c not in '0123456789abcdef' for c in checksum.lower())):
+        raise UploadSessionError(1002, 'checksum must be a sha256 hex digest')
+
+    session = UploadSession(id=uuid.uuid4().hex, filename=filename, size=size, chunk_size=chunk_size,
+                            checksum=checksum.lower() if checksum else None,
+                            category=category, tags=tags, uploader_id=uploader_id)
+    db.session.add(session)
+    db.session.commit()
+    os.makedirs(_session_dir(session.id), exist_ok=True)
+    return session
+
+
+def get_session(upload_id: str) -> UploadSession:
+    session = db.session.get(UploadSession, upload_id)
+    if session is None:
+        raise UploadSessionError(3001, 'upload session not found', status=404)
+    return session
+
+
+def received_chunks(session: UploadSession) -> list[int]:
+    try:
+        names = os.listdir(_session_dir(session.id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(n[:-5]) for n in names if n.endswith('.part') and n[:-5].isdigit())
+
+
+def write_chunk(session: UploadSession, index: int, stream) -> int:
+    """Stream one chunk from ``stream`` into place; returns the bytes written."""
+    if index < 0 or index >= total_chunks(session):
+        raise UploadSessionError(1002, 'chunk index out of range')
+    expected = expected_chunk_size(session, index)
+    directory = _session_dir(session.id)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{index}-', dir=directory)
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                written += len(chunk)
+                if written > expected:
+                    raise UploadSessionError(1002, 'chunk larger than expected')
+                out.write(chunk)
+        if written != expected:
+            raise UploadSessionError(1002, f'chunk {index} must be {expected} bytes, got {written}')
+        os.replace(tmp_path, _part_path(session.id, index))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def complete_session(session: UploadSession):
+    """Assemble chunks, verify the checksum and store through the upload dedup path."""
+    missing = sorted(set(range(total_chunks(session))) - set(received_chunks(session)))
+    if missing:
+        raise UploadSessionError(3005, 'upload incomplete', status=409)
+
+    spool = HashingSpool(current_app.config['UPLOAD_FOLDER'])
+    try:
+        for index in range(total_chunks(session)):
+            with open(_part_path(session.id, index), 'rb') as part:
+                shutil.copyfileobj(part, spool, CHUNK_SIZE)
+        if session.checksum and spool.hexdigest() != session.checksum:
+            raise UploadSessionError(3004, 'checksum mismatch', status=422)
+    except BaseException:
+        spool.discard()
+        raise
+
+    img, duplicate = store_spool(spool, session.filename, category=session.category,
+                                 tags=session.tags, uploader_id=session.uploader_id)
+    abort_session(session)
+    return img, duplicate
+
+
+def abort_session(session: UploadSession):
+    shutil.rmtree(_session_dir(session.id), ignore_errors=True)
+    db.session.delete(session)
+    db.session.commit()
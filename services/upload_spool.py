@@ -0,0 +1,85 @@
+"""Request-side upload spooling: bytes are hashed and counted while they are written to disk.
+
+Kept free of model and service imports because ``create_app`` installs
+``UploadRequest`` as the request class of every app.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingSpool:
+    """Writable temp file that hashes and counts bytes as they are written."""
+
+    def __init__(self, directory: str, max_size: int | None = None):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix='.upload-', suffix='.part', dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self.max_size = max_size
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            raise RequestEntityTooLarge()
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def detach(self) -> str:
+        """Close the spool and hand ownership of the temp file to the caller."""
+        self._file.flush()
+        self._file.close()
+        path, self.path = self.path, None
+        return path
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        # read/seek/close etc. are delegated so FileStorage can treat this as its stream
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request class that spools multipart file parts straight into a HashingSpool.
+
+    Werkzeug calls ``_get_file_stream`` while parsing the form, so the digest
+    and size are already known when the view runs and no second read is needed.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = HashingSpool(current_app.config['UPLOAD_FOLDER'], current_app.config.get('UPLOAD_MAX_BYTES'))
+        self._upload_spools = getattr(self, '_upload_spools', [])
+        self._upload_spools.append(spool)
+        return spool
+
+    def close(self):
+        super().close()
+        # anything not committed by the view is a leftover temp file
+        for spool in getattr(self, '_upload_spools', []):
+            spool.discard()
+
+
+def spool_stream(stream, directory: str, max_size: int | None = None) -> HashingSpool:
+    """Copy an arbitrary readable stream into a HashingSpool in one pass."""
+    spool = HashingSpool(directory, max_size)
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            spool.write(chunk)
+    except BaseException:
+        spool.discard()
+        raise
+    return spool
@@ -0,0 +1,78 @@
+"""Import-time profile of app startup (``flask importtime``).
+
+Runs ``create_app()`` in a fresh interpreter under ``python -X importtime``
+and aggregates the report, so the modules a worker pays for at boot can be
+spotted (and kept out of the boot path) before they land.
+"""
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STARTUP_CODE = 'from app import create_app; create_app()'
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> list[ImportRecord]:
+    """Records from ``-X importtime`` output (``import time: self | cumulative | name``)."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append(ImportRecord(name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def profile_startup(code: str = STARTUP_CODE, env: dict | None = None) -> tuple[list[ImportRecord], float]:
+    """``(records, wall seconds)`` for running ``code`` in a new interpreter from the project root."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True,
+                          text=True, env={**os.environ, **(env or {})})
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'startup failed')
+    return parse_importtime(proc.stderr), elapsed
+
+
+def by_package(records: list[ImportRecord]) -> list[tuple[str, int]]:
+    """Self time summed per top-level package, largest first."""
+    totals = defaultdict(int)
+    for r in records:
+        totals[r.module.split('.')[0]] += r.self_us
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def by_module(records: list[ImportRecord]) -> list[tuple[str, int]]:
+    """Cumulative time of each module (including what it imported first), largest first."""
+    return sorted(((r.module, r.cumulative_us) for r in records), key=lambda kv: kv[1], reverse=True)
+
+
+def import_chain(records: list[ImportRecord], module: str) -> list[str] | None:
+    """Who pulled ``module`` in at startup: ``[top-level import, ..., module]``, or None if it was not imported.
+
+    A module's importer is the next record one level shallower, since the
+    report lists children before their parent.
+    """
+    for i, r in enumerate(records):
+        if r.module == module:
+            chain, depth = [module], r.depth
+            for parent in records[i + 1:]:
+                if parent.depth < depth:
+                    chain.append(parent.module)
+                    depth = parent.depth
+            return chain[::-1]
+    return None
@@ -0,0 +1,114 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+        "DOWNLOAD_LOG_FLUSH_SECONDS": 0,
+    })
+    app.config.update(TESTING=True)
+    with app.app_context():
+        from app import db
+        db.create_all()
+    yield app
+
+
+@pytest.fixture()
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+
+def _upload(client, data, name='a.bin', **form):
+    form['file'] = (io.BytesIO(data), name)
+    return client.post('/api/files/upload', data=form, content_type='multipart/form-data').get_json()['data']
+
+
+def test_summary_reads_incremental_rollups(client, app):
+    from app import db
+    from models import StatRollup
+    from services import analytics
+    from services.download_log import get_download_log_writer
+
+    small = _upload(client, os.urandom(1000), category='docs')
+    _upload(client, os.urandom(2000), category='docs')
+    _upload(client, os.urandom(200 * 1024), category='photos')
+    client.get(f"/api/files/{small['id']}/download")
+    client.get(f"/api/files/{small['id']}/download")
+    with app.app_context():
+        get_download_log_writer().flush()
+        # one hourly + one daily row per (category, uploader, size class)
+        assert StatRollup.query.count() == 4
+
+    for window in ('day', 'week', 'month'):
+        data = client.get(f'/api/analytics/summary?window={window}').get_json()['data']
+        assert data['uploads'] == 3
+        assert data['upload_bytes'] == 3000 + 200 * 1024
+        assert data['downloads'] == 2
+    by_category = {row['category']: row for row in data['by_category']}
+    assert by_category['docs']['uploads'] == 2 and by_category['docs']['downloads'] == 2
+    assert [b['uploads'] for b in data['size_histogram']] == [2, 1, 0, 0, 0]
+    assert client.get('/api/analytics/summary?window=year').status_code == 400
+
+    before = client.get('/api/analytics/summary?category=docs').get_json()['data']
+    with app.app_context():
+        db.session.query(StatRollup).delete()
+        db.session.commit()
+        assert analytics.rebuild() == 4
+    assert client.get('/api/analytics/summary?category=docs').get_json()['data'] == before
+
+
+def _admin_headers(client):
+    client.post('/api/auth/register', json={'username': 'root', 'password': 'pw', 'role': 'admin'})
+    access = client.post('/api/auth/login', json={'username': 'root', 'password': 'pw'}).get_json()['data']['access_token']
+    return {'Authorization': f'Bearer {access}'}
+
+
+def test_export_streams_csv_and_json(client, app):
+    for i in range(3):
+        _upload(client, os.urandom(100 + i), name=f'{i}.bin', tags='x,y')
+    assert client.get('/api/analytics/export?dataset=images').status_code == 401
+    client.environ_base.update(HTTP_AUTHORIZATION=_admin_headers(client)['Authorization'])
+
+    r = client.get('/api/analytics/export?dataset=images&format=csv')
+    assert r.status_code == 200
+    assert r.is_streamed
+    assert r.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+    assert rows[0][:2] == ['id', 'filename']
+    assert [row[1] for row in rows[1:]] == ['0.bin', '1.bin', '2.bin']
+
+    r = client.get('/api/analytics/export?format=json&window=day')
+    rollups = json.loads(r.get_data(as_text=True))
+    assert sum(row['uploads'] for row in rollups if row['granularity'] == 'day') == 3
+
+    # streamed exports are compressed chunk by chunk
+    r = client.get('/api/analytics/export?dataset=images&format=json', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in r.headers
+    assert [row['filename'] for row in json.loads(gzip.decompress(r.get_data()))] == ['0.bin', '1.bin', '2.bin']
+
+    client.get(f"/api/files/{rows[1][0]}/download")
+    with app.app_context():
+        from services.download_log import get_download_log_writer
+        get_download_log_writer().flush()
+    r = client.get('/api/analytics/export?dataset=downloads&format=json')
+    downloads = json.loads(r.get_data(as_text=True))
+    assert len(downloads) == 1 and 'ip' not in downloads[0]
+
+    assert client.get('/api/analytics/export?format=xml').status_code == 400
+    assert client.get('/api/analytics/export?dataset=users').status_code == 400
@@ -0,0 +1,151 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+from PIL import Image as PILImage
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from asgi import create_asgi_app  # noqa: E402
+
+
+@pytest.fixture()
+def bridge(tmp_path):
+    bridge = create_asgi_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'asgi.db'}",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+        "JOB_PROCESS_WORKERS": 0,
+        "JOB_AUTOSTART": False,
+        "ASGI_THREADS": 2,
+        "ASGI_BODY_MEMORY_BYTES": 1024,
+        "ASGI_MAX_BODY_BYTES": 1024 * 1024,
+        "ASGI_CHUNK_BYTES": 4096,
+        "PROCESS_STATUS_POLL_SECONDS": 0.05,
+    })
+    bridge.flask_app.config.update(TESTING=True)
+    with bridge.flask_app.app_context():
+        from app import db
+        db.create_all()
+    yield bridge
+    bridge.executor.shutdown()
+
+
+def _request(bridge, method, path, query=b'', body=b'', headers=(), piece=1000):
+    """Run one request through the bridge, delivering the body in ``piece``-byte messages."""
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)] or [b'']
+    messages = [{'type': 'http.request', 'body': p, 'more_body': i < len(pieces) - 1} for i, p in enumerate(pieces)]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'root_path': '',
+             'headers': [(k.encode(), v.encode()) for k, v in headers], 'http_version': '1.1',
+             'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)}
+    asyncio.run(bridge(scope, receive, send))
+    start = sent[0]
+    bodies = [m['body'] for m in sent[1:]]
+    return start['status'], dict((k.decode(), v.decode()) for k, v in start['headers']), bodies
+
+
+def _multipart(payload: bytes, filename: str):
+    boundary = 'asgitestboundary'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n').encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    return body, [('content-type', f'multipart/form-data; boundary={boundary}'), ('content-length', str(len(body)))]
+
+
+def _png(seed: int) -> bytes:
+    buf = io.BytesIO()
+    PILImage.effect_noise((96, 96), 40 + seed).convert('RGB').save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def test_upload_and_download_stream_through_bridge(bridge):
+    payload = _png(1)
+    body, headers = _multipart(payload, 'noise.png')
+    status, _, chunks = _request(bridge, 'POST', '/api/files/upload', body=body, headers=headers)
+    assert status == 201
+    image_id = json.loads(b''.join(chunks))['data']['id']
+
+    status, resp_headers, chunks = _request(bridge, 'GET', f'/api/files/{image_id}/download')
+    assert status == 200
+    assert b''.join(chunks) == payload
+    assert int(resp_headers['content-length']) == len(payload)
+    # sent in ASGI_CHUNK_BYTES pieces rather than one buffered body
+    pieces = [c for c in chunks if c]
+    assert len(pieces) > 1 and all(len(c) >= 4096 for c in pieces[:-1])
+
+    status, _, chunks = _request(bridge, 'GET', f'/api/files/{image_id}/download',
+                                 headers=[('range', 'bytes=10-19')])
+    assert status == 206 and b''.join(chunks) == payload[10:20]
+
+
+def test_oversized_body_is_rejected_before_flask(bridge):
+    status, _, chunks = _request(bridge, 'PUT', '/api/files/uploads/x/chunks/0', body=b'x' * (1024 * 1024 + 1),
+                                 piece=64 * 1024)
+    assert status == 413
+    assert json.loads(b''.join(chunks))['error']['code'] == 1002
+
+
+def test_status_long_poll_returns_when_jobs_settle(bridge):
+    from services import jobs
+    app = bridge.flask_app
+    body, headers = _multipart(_png(2), 'noise.png')
+    _, _, chunks = _request(bridge, 'POST', '/api/files/upload', body=body, headers=headers)
+    image_id = json.loads(b''.join(chunks))['data']['id']
+    with app.app_context():
+        jobs.get_job_engine()
+        jobs.enqueue(image_id, 'phash', force=True)
+
+    started = time.monotonic()
+    status, _, chunks = _request(bridge, 'GET', '/api/process/status', query=f'image_id={image_id}&wait=0.3'.encode())
+    data = json.loads(b''.join(chunks))['data']
+    assert status == 200 and data['settled'] is False
+    assert 0.3 <= time.monotonic() - started < 2
+
+    def finish():
+        time.sleep(0.2)
+        with app.app_context():
+            jobs.get_job_engine().run_once()
+
+    worker = threading.Thread(target=finish)
+    worker.start()
+    started = time.monotonic()
+    status, _, chunks = _request(bridge, 'GET', '/api/process/status', query=f'image_id={image_id}&wait=10'.encode())
+    worker.join()
+    data = json.loads(b''.join(chunks))['data']
+    assert data['settled'] is True and data['tasks'][0]['status'] == 'done'
+    assert time.monotonic() - started < 5
+
+
+def test_status_long_poll_with_gzip(bridge):
+    from services import jobs
+    app = bridge.flask_app
+    app.config['COMPRESS_MIN_BYTES'] = 1  # compress even the small status body
+    body, headers = _multipart(_png(3), 'noise.png')
+    _, _, chunks = _request(bridge, 'POST', '/api/files/upload', body=body, headers=headers)
+    image_id = json.loads(b''.join(chunks))['data']['id']
+    with app.app_context():
+        jobs.get_job_engine()
+        jobs.enqueue(image_id, 'phash', force=True)
+
+    status, resp_headers, chunks = _request(bridge, 'GET', '/api/process/status',
+                                            query=f'image_id={image_id}&wait=0.2'.encode(),
+                                            headers=[('accept-encoding', 'gzip')])
+    assert status == 200 and resp_headers['content-encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(b''.join(chunks)))['data']['settled'] is False
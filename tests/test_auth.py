@@ -59,3 +59,135 @@ def test_invalid_login(client):
     client.post('/api/auth/register', json={"username": "bob", "password": "pw"})
     bad = client.post('/api/auth/login', json={"username": "bob", "password": "wrong"})
     assert bad.status_code == 401
+
+
+@pytest.mark.parametrize('backend', ['database', 'sqlite'])
+def test_refresh_tokens_shared_between_workers(tmp_path, backend):
+    from datetime import datetime, timedelta, UTC
+    from app import db
+    from services.token_store import get_token_store
+
+    def worker():
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+                          "TOKEN_STORE": backend, "TOKEN_STORE_PATH": str(tmp_path / 'tokens.db'),
+                          "TOKEN_CACHE_TTL": 0, "TOKEN_SWEEP_SECONDS": 0})
+        app.config.update(TESTING=True)
+        with app.app_context():
+            db.create_all()
+        return app
+
+    a, b = worker(), worker()
+    ca, cb = a.test_client(), b.test_client()
+    ca.post('/api/auth/register', json={"username": "carol", "password": "pw"})
+    refresh = ca.post('/api/auth/login', json={"username": "carol", "password": "pw"}).get_json()["data"]["refresh_token"]
+
+    # issued by worker a, accepted by worker b, revoked on b, rejected by a
+    assert cb.post('/api/auth/refresh', json={"refresh_token": refresh}).status_code == 200
+    assert ca.post('/api/auth/refresh', json={"refresh_token": refresh}).status_code == 200
+    assert cb.post('/api/auth/logout', json={"refresh_token": refresh}).status_code == 200
+    assert ca.post('/api/auth/refresh', json={"refresh_token": refresh}).status_code == 401
+
+    with a.app_context():
+        store = get_token_store()
+        now = datetime.now(UTC)
+        store.add('expired', 1, now - timedelta(seconds=1))
+        store.add('live', 1, now + timedelta(days=1))
+        assert not store.is_active('expired')
+        assert store.sweep() == 1
+        assert store.is_active('live')
+        assert store.revoke_user(1) == 1
+        assert not store.is_active('live')
+
+
+def test_verified_tokens_and_users_are_cached(monkeypatch):
+    import jwt as pyjwt
+    from app import db
+    from models import User
+    from utils.auth import jwt_required
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    app.config.update(TESTING=True)
+
+    @app.route('/admin-only')
+    @jwt_required(role='admin')
+    def admin_only():
+        return 'ok'
+
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+    client.post('/api/auth/register', json={"username": "root", "password": "pw", "role": "admin"})
+    access = client.post('/api/auth/login', json={"username": "root", "password": "pw"}).get_json()["data"]["access_token"]
+    headers = {"Authorization": f"Bearer {access}"}
+    assert client.get('/admin-only', headers=headers).status_code == 200
+
+    calls = []
+    real_decode = pyjwt.decode
+    monkeypatch.setattr(pyjwt, 'decode', lambda *a, **kw: calls.append(1) or real_decode(*a, **kw))
+    for _ in range(3):
+        assert client.get('/api/users/me', headers=headers).get_json()["data"]["role"] == "admin"
+    assert calls == []
+
+    # a role change evicts the cached user at once, even though the token still says admin
+    with app.app_context():
+        db.session.query(User).filter_by(username="root").one().role = "user"
+        db.session.commit()
+    assert client.get('/admin-only', headers=headers).status_code == 403
+    assert client.get('/api/users/me', headers=headers).get_json()["data"]["role"] == "user"
+    assert client.get('/api/users/me', headers={"Authorization": "Bearer nope"}).status_code == 401
+
+
+def test_password_hashing_offloaded_with_rehash_and_backpressure():
+    from app import db
+    from models import User
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "HASH_WORKERS": 1, "PASSWORD_ROUNDS": 1000})
+    app.config.update(TESTING=True)
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+    client.post('/api/auth/register', json={"username": "dana", "password": "pw", "role": "admin"})
+
+    def stored_hash():
+        with app.app_context():
+            return User.query.filter_by(username="dana").one().password_hash
+
+    assert '$1000$' in stored_hash()
+
+    # new cost setting: the next successful login transparently upgrades the hash
+    app.config['PASSWORD_ROUNDS'] = 2000
+    app.extensions.pop('password_hasher').shutdown()
+    r = client.post('/api/auth/login', json={"username": "dana", "password": "pw"})
+    assert r.status_code == 200
+    assert '$2000$' in stored_hash()
+    assert client.post('/api/auth/login', json={"username": "dana", "password": "bad"}).status_code == 401
+
+    access = r.get_json()["data"]["access_token"]
+    stats = client.get('/api/auth/metrics', headers={"Authorization": f"Bearer {access}"}).get_json()["data"]["password_hasher"]
+    assert stats["calls"] == 2 and stats["pending"] == 0 and stats["rejected"] == 0
+    assert sum(stats["latency_buckets"].values()) == 2
+
+    # a full queue is refused immediately instead of piling up
+    app.extensions['password_hasher'].max_pending = 0
+    r = client.post('/api/auth/login', json={"username": "dana", "password": "pw"})
+    assert r.status_code == 429
+    assert r.headers['Retry-After'] == '1'
+    assert r.get_json()["error"]["code"] == 2007
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes():
+    from services.password_hasher import HasherOverloaded, HasherTimeout, PasswordHasher, context_settings
+
+    hasher = PasswordHasher(context_settings({'PASSWORD_ROUNDS': 400000}), workers=1, max_pending=1, timeout=0.001)
+    try:
+        with pytest.raises(HasherTimeout):
+            hasher.hash('pw')
+        # the hash is still running in the pool, so the slot is not free yet
+        with pytest.raises(HasherOverloaded):
+            hasher.hash('pw')
+        deadline = time.monotonic() + 30
+        while hasher.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert hasher.stats()['pending'] == 0
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,99 @@
+import io
+import os
+import sys
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app, db  # noqa: E402
+from config import Config  # noqa: E402
+from db_config import engine_options  # noqa: E402
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+        "PHASH_ON_UPLOAD": False,
+    })
+    app.config.update(TESTING=True)
+    yield app
+
+
+def test_sqlite_connections_are_tuned(app):
+    with app.app_context():
+        db.create_all()
+        pragma = lambda name: db.session.execute(text(f'PRAGMA {name}')).scalar()  # noqa: E731
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 5000
+        assert pragma('cache_size') == -65536
+        assert db.engine.pool.size() == app.config['DB_POOL_SIZE']
+
+
+def test_server_engine_options():
+    config = {k: getattr(Config, k) for k in dir(Config) if k.isupper()}
+    config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://u:p@db/imagedrive'
+    options = engine_options(config)
+    assert options['pool_pre_ping'] is True
+    assert options['pool_recycle'] == 1800 and options['pool_size'] == 10
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 3}
+    assert engine_options(config)['pool_size'] == 3
+    config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    assert 'pool_size' not in engine_options({**config, 'SQLALCHEMY_ENGINE_OPTIONS': {}})
+
+
+def test_migrations_match_models(app):
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+    from flask_migrate import upgrade
+    from db_config import include_name, init_migrations
+
+    # serving apps skip Flask-Migrate; `flask db` attaches it on first use
+    assert 'migrate' not in app.extensions
+    init_migrations(app, db)
+    with app.app_context():
+        upgrade()
+        with db.engine.connect() as conn:
+            context = MigrationContext.configure(conn, opts={'include_name': include_name})
+            assert compare_metadata(context, db.metadata) == []
+        names = {r[0] for r in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+        assert 'image_fts_ai' in names
+
+
+def test_checksum_unique_per_uploader_and_concurrent_uploads(app):
+    from models import Blob, Image
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Image(filename='a', path='k', checksum='c' * 64),
+                            Image(filename='b', path='k', checksum='c' * 64)])
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    payload = os.urandom(64 * 1024)
+    statuses = []
+
+    def upload():
+        client = app.test_client()
+        r = client.post('/api/files/upload', data={'file': (io.BytesIO(payload), 'same.bin')},
+                        content_type='multipart/form-data')
+        statuses.append(r.status_code)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(statuses) == [200] * 7 + [201]
+    with app.app_context():
+        assert Image.query.count() == 1
+        assert Blob.query.one().refcount == 1
@@ -0,0 +1,416 @@
+import hashlib
+import io
+import os
+import sys
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+    })
+    app.config.update(TESTING=True)
+    with app.app_context():
+        from app import db
+        db.create_all()
+    yield app
+
+
+@pytest.fixture()
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+
+def _upload(client, data, name='cat.png'):
+    return client.post('/api/files/upload', data={'file': (io.BytesIO(data), name)},
+                       content_type='multipart/form-data')
+
+
+def test_upload_hashes_and_dedups(client, app):
+    payload = os.urandom(200 * 1024)
+    r = _upload(client, payload)
+    assert r.status_code == 201
+    data = r.get_json()['data']
+    assert data['checksum'] == hashlib.sha256(payload).hexdigest()
+    assert data['size'] == len(payload)
+    assert data['duplicate'] is False
+
+    r2 = _upload(client, payload, name='other.png')
+    assert r2.status_code == 200
+    data2 = r2.get_json()['data']
+    assert data2['duplicate'] is True
+    assert data2['id'] == data['id']
+
+    # only the sharded blob remains, no leftover temp parts
+    checksum = data['checksum']
+    assert data['path'] == f"{checksum[:2]}/{checksum[2:4]}/{checksum}"
+    leftovers = [os.path.relpath(os.path.join(d, n), app.config['UPLOAD_FOLDER'])
+                 for d, _, names in os.walk(app.config['UPLOAD_FOLDER']) for n in names
+                 if not d.startswith(os.path.join(app.config['UPLOAD_FOLDER'], '.derivatives'))]
+    assert leftovers == [os.path.join(checksum[:2], checksum[2:4], checksum)]
+
+
+def test_upload_size_limit(client, app):
+    app.config['UPLOAD_MAX_BYTES'] = 1024
+    r = _upload(client, b'x' * 4096)
+    assert r.status_code == 413
+
+
+def test_web_upload_redirects_to_existing(client):
+    payload = b'same-bytes'
+    r = client.post('/web/upload', data={'file': (io.BytesIO(payload), 'a.jpg')},
+                    content_type='multipart/form-data')
+    assert r.status_code == 302
+    first = r.headers['Location']
+    r2 = client.post('/web/upload', data={'file': (io.BytesIO(payload), 'b.jpg')},
+                     content_type='multipart/form-data')
+    assert r2.headers['Location'] == first
+
+
+def test_blob_refcount_shared_across_uploaders(app):
+    from werkzeug.datastructures import FileStorage
+    from app import db
+    from models import Blob
+    from services.blob_store import local_path
+    from services.file_service import store_upload, delete_image
+
+    payload = b'shared-bytes' * 100
+    with app.test_request_context():
+        a, dup_a = store_upload(FileStorage(io.BytesIO(payload)), 'a.jpg', uploader_id=1)
+        b, dup_b = store_upload(FileStorage(io.BytesIO(payload)), 'b.jpg', uploader_id=2)
+        assert not dup_a and not dup_b
+        assert a.id != b.id and a.path == b.path
+        assert db.session.get(Blob, a.checksum).refcount == 2
+
+        path = local_path(a.path)
+        delete_image(a)
+        assert os.path.exists(path)
+        assert db.session.get(Blob, b.checksum).refcount == 1
+        delete_image(b)
+        assert not os.path.exists(path)
+        assert db.session.get(Blob, b.checksum) is None
+
+
+def test_blob_bytes_survive_rollback_and_rereference(app):
+    from werkzeug.datastructures import FileStorage
+    from app import db
+    from models import Blob
+    from services.blob_store import add_blob, local_path, release_blob
+    from services.file_service import store_upload
+
+    with app.test_request_context():
+        img, _ = store_upload(FileStorage(io.BytesIO(b'kept-bytes' * 100)), 'a.jpg', uploader_id=1)
+        path = local_path(img.path)
+
+        # the last reference is dropped but the transaction rolls back
+        release_blob(img.checksum)
+        assert os.path.exists(path)
+        db.session.rollback()
+        assert os.path.exists(path)
+        assert db.session.get(Blob, img.checksum).refcount == 1
+
+        # a new reference taken before commit keeps row and bytes
+        release_blob(img.checksum)
+        add_blob(img.checksum, img.size, None)
+        db.session.commit()
+        assert os.path.exists(path)
+        assert db.session.get(Blob, img.checksum).refcount == 1
+
+
+def test_blob_readded_while_release_deletes_bytes(tmp_path):
+    import threading
+    from werkzeug.datastructures import FileStorage
+    from app import db
+    from models import Blob, Image
+    from services.blob_store import add_blob, get_blob_backend, local_path
+    from services.file_service import delete_image, store_upload
+
+    # a file database: the releasing and re-adding transactions need their own connections
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'blobs.db'}",
+                      "UPLOAD_FOLDER": str(tmp_path / "uploads"), "THUMB_WORKERS": 0})
+    app.config.update(TESTING=True)
+    payload = b'raced-bytes' * 100
+    with app.app_context():
+        db.create_all()
+        img, _ = store_upload(FileStorage(io.BytesIO(payload)), 'a.jpg', uploader_id=1)
+        image_id, checksum, path = img.id, img.checksum, local_path(img.path)
+        backend = get_blob_backend()
+
+    deleting, resume = threading.Event(), threading.Event()
+    real_delete = backend.delete
+
+    def slow_delete(key):
+        deleting.set()
+        resume.wait(5)
+        real_delete(key)
+
+    backend.delete = slow_delete
+
+    def release():
+        with app.app_context():
+            delete_image(db.session.get(Image, image_id))
+
+    def readd():
+        src = tmp_path / 'again.jpg'
+        src.write_bytes(payload)
+        with app.app_context():
+            add_blob(checksum, len(payload), str(src))
+            db.session.commit()
+
+    releaser = threading.Thread(target=release)
+    releaser.start()
+    assert deleting.wait(5)
+    adder = threading.Thread(target=readd)
+    adder.start()
+    adder.join(0.3)  # lets the re-add run as far as it can while the bytes are being deleted
+    resume.set()
+    releaser.join(10)
+    adder.join(10)
+
+    with app.app_context():
+        assert db.session.get(Blob, checksum).refcount == 1
+    assert os.path.isfile(path)
+
+
+def _bearer(client, username):
+    client.post('/api/auth/register', json={'username': username, 'password': 'pw'})
+    access = client.post('/api/auth/login', json={'username': username, 'password': 'pw'}).get_json()['data']['access_token']
+    return {'Authorization': f'Bearer {access}'}
+
+
+def test_same_bytes_from_two_users_are_separate_images(client, app):
+    from app import db
+    from models import Image, UploadSession
+    alice, bob = _bearer(client, 'alice'), _bearer(client, 'bob')
+    payload = os.urandom(4096)
+
+    def upload(headers):
+        return client.post('/api/files/upload', data={'file': (io.BytesIO(payload), 'same.bin')},
+                           content_type='multipart/form-data', headers=headers)
+
+    a, b = upload(alice), upload(bob)
+    assert a.status_code == b.status_code == 201
+    assert a.get_json()['data']['id'] != b.get_json()['data']['id']
+    again = upload(alice)
+    assert again.status_code == 200 and again.get_json()['data']['id'] == a.get_json()['data']['id']
+
+    r = client.post('/api/files/uploads', json={'filename': 'big.bin', 'size': 10}, headers=bob)
+    with app.app_context():
+        uploaders = {i.uploader_id for i in Image.query.all()}
+        assert len(uploaders) == 2 and None not in uploaders
+        session = db.session.get(UploadSession, r.get_json()['data']['upload_id'])
+        assert session.uploader_id == db.session.get(Image, b.get_json()['data']['id']).uploader_id
+
+
+def test_chunked_upload_session(client, app):
+    payload = os.urandom(10 * 1024 + 123)
+    checksum = hashlib.sha256(payload).hexdigest()
+    r = client.post('/api/files/uploads', json={
+        'filename': 'big.tif', 'size': len(payload), 'chunk_size': 4096, 'checksum': checksum})
+    assert r.status_code == 201
+    session = r.get_json()['data']
+    upload_id = session['upload_id']
+    assert session['total_chunks'] == 3
+    assert session['missing_chunks'] == [0, 1, 2]
+
+    chunks = [payload[i:i + 4096] for i in range(0, len(payload), 4096)]
+    # out of order, with a retried chunk
+    for index in (2, 0, 0):
+        r = client.put(f'/api/files/uploads/{upload_id}/chunks/{index}', data=chunks[index],
+                       content_type='application/octet-stream')
+        assert r.status_code == 200
+    r = client.get(f'/api/files/uploads/{upload_id}')
+    assert r.get_json()['data']['missing_chunks'] == [1]
+
+    r = client.post(f'/api/files/uploads/{upload_id}/complete')
+    assert r.status_code == 409
+
+    bad = client.put(f'/api/files/uploads/{upload_id}/chunks/1', data=b'short',
+                     content_type='application/octet-stream')
+    assert bad.status_code == 400
+    client.put(f'/api/files/uploads/{upload_id}/chunks/1', data=chunks[1],
+               content_type='application/octet-stream')
+    r = client.post(f'/api/files/uploads/{upload_id}/complete')
+    assert r.status_code == 201
+    data = r.get_json()['data']
+    assert data['checksum'] == checksum and data['size'] == len(payload)
+    assert client.get(f'/api/files/uploads/{upload_id}').status_code == 404
+
+    # the same bytes through the multipart endpoint dedup against the assembled upload
+    r = _upload(client, payload)
+    assert r.get_json()['data']['id'] == data['id']
+
+
+def test_chunked_upload_checksum_mismatch(client):
+    r = client.post('/api/files/uploads', json={'filename': 'x.jpg', 'size': 3, 'checksum': '0' * 64})
+    upload_id = r.get_json()['data']['upload_id']
+    client.put(f'/api/files/uploads/{upload_id}/chunks/0', data=b'abc', content_type='application/octet-stream')
+    r = client.post(f'/api/files/uploads/{upload_id}/complete')
+    assert r.status_code == 422
+    assert r.get_json()['error']['code'] == 3004
+
+
+def test_download_range_etag_and_batched_log(client, app):
+    from app import db
+    from models import DownloadLog
+    from services.download_log import get_download_log_writer
+
+    app.config['DOWNLOAD_LOG_FLUSH_SECONDS'] = 0  # flush explicitly below
+    payload = os.urandom(5000)
+    image = _upload(client, payload).get_json()['data']
+    url = f"/api/files/{image['id']}/download"
+
+    r = client.get(url)
+    assert r.status_code == 200
+    assert r.data == payload
+    assert r.headers['ETag'] == f'"{image["checksum"]}"'
+
+    r = client.get(url, headers={'Range': 'bytes=100-199'})
+    assert r.status_code == 206
+    assert r.data == payload[100:200]
+
+    r = client.get(url, headers={'Range': 'bytes=0-99'})
+    assert r.status_code == 206
+
+    r = client.get(url, headers={'If-None-Match': f'"{image["checksum"]}"'})
+    assert r.status_code == 304
+    assert r.data == b''
+
+    assert client.get('/api/files/9999/download').status_code == 404
+
+    with app.app_context():
+        writer = get_download_log_writer()
+        # full download + range from byte 0; the resumed range and the 304 are not counted
+        assert writer.pending() == 2
+        assert DownloadLog.query.count() == 0
+        assert writer.flush() == 2
+        assert db.session.query(DownloadLog).filter_by(image_id=image['id']).count() == 2
+
+
+def test_download_log_requeue_is_capped(app, monkeypatch):
+    from services import download_log
+
+    def unavailable(rows):
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(download_log, 'record_downloads', unavailable)
+    writer = download_log.DownloadLogWriter(app, batch_size=2, flush_seconds=0, max_pending=3)
+    assert writer in download_log._writers
+    for image_id in range(1, 6):
+        writer.record(image_id)
+    # every flush fails; past max_pending the oldest re-queued rows are dropped
+    assert writer.pending() == 3
+    assert [r['image_id'] for r in writer._rows] == [3, 4, 5]
+
+
+def test_download_log_full_batch_flushed_off_the_request_thread(app, monkeypatch):
+    import threading
+    import time
+    from services import download_log
+
+    flushed_on = []
+    real_record = download_log.record_downloads
+
+    def record_downloads(rows):
+        flushed_on.append(threading.current_thread().name)
+        real_record(rows)
+
+    monkeypatch.setattr(download_log, 'record_downloads', record_downloads)
+    writer = download_log.DownloadLogWriter(app, batch_size=2, flush_seconds=60)
+    writer.record(1)
+    writer.record(2)
+    deadline = time.monotonic() + 5
+    while writer.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.pending() == 0
+    assert flushed_on == ['download-log-flusher']
+
+
+def _png(color, size=(6, 4)):
+    from PIL import Image as PILImage
+    buf = io.BytesIO()
+    PILImage.new('RGB', size, color).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def test_ingest_tree_skips_known_and_resumes(app, tmp_path):
+    from app import db
+    from models import Blob, Image, ImageTag
+    from services.ingest import checkpoint_path, run_ingest
+
+    src = tmp_path / 'photos'
+    (src / 'cats').mkdir(parents=True)
+    (src / 'dogs').mkdir()
+    (src / 'cats' / 'a.png').write_bytes(_png('red'))
+    (src / 'cats' / 'b.png').write_bytes(_png('blue', (3, 9)))
+    (src / 'dogs' / 'c.png').write_bytes(_png('red'))  # same bytes as a.png
+    (src / 'dogs' / 'notes.txt').write_text('not an image')
+    (src / '.hidden.png').write_bytes(_png('green'))
+
+    with app.app_context():
+        progress = run_ingest(str(src), batch_size=2, workers=0, limit=2, category_from_dir=True, tags='bulk')
+        assert (progress.position, progress.ingested) == (2, 2)
+
+        progress = run_ingest(str(src), batch_size=2, workers=0, category_from_dir=True, tags='bulk')
+        assert (progress.position, progress.ingested, progress.skipped) == (3, 2, 1)
+
+        images = Image.query.order_by(Image.id).all()
+        assert [(i.filename, i.category, i.width, i.height, i.mime) for i in images] == [
+            ('a.png', 'cats', 6, 4, 'image/png'), ('b.png', 'cats', 3, 9, 'image/png')]
+        assert db.session.query(Blob).count() == 2
+        assert db.session.query(ImageTag).count() == 2
+        for img in images:
+            assert os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], img.path))
+
+        # nothing new: a restart walks everything again and skips it all
+        progress = run_ingest(str(src), workers=0, restart=True)
+        assert (progress.ingested, progress.skipped) == (0, 3)
+        assert os.path.isfile(checkpoint_path(os.path.abspath(str(src))))
+
+
+def test_ingest_resumes_after_last_path_when_tree_changes(app, tmp_path):
+    from models import Image
+    from services.ingest import run_ingest
+
+    src = tmp_path / 'photos'
+    (src / 'cats').mkdir(parents=True)
+    (src / 'dogs').mkdir()
+    (src / 'cats' / 'b.png').write_bytes(_png('red'))
+    (src / 'cats' / 'c.png').write_bytes(_png('blue', (3, 9)))
+    (src / 'dogs' / 'd.png').write_bytes(_png('green'))
+
+    with app.app_context():
+        progress = run_ingest(str(src), batch_size=1, workers=0, limit=2)
+        assert (progress.last_path, progress.ingested) == (os.path.join('cats', 'c.png'), 2)
+
+        # a file sorting before the checkpoint must not shift the resume point
+        (src / 'cats' / 'a.png').write_bytes(_png('white'))
+        progress = run_ingest(str(src), batch_size=1, workers=0)
+        assert (progress.position, progress.ingested, progress.skipped) == (3, 3, 0)
+        assert Image.query.order_by(Image.id.desc()).first().filename == 'd.png'
+
+        progress = run_ingest(str(src), workers=0, restart=True)
+        assert (progress.ingested, progress.skipped) == (1, 3)
+
+
+def test_ingest_command(app, tmp_path):
+    src = tmp_path / 'in'
+    src.mkdir()
+    for n in range(5):
+        (src / f'{n}.png').write_bytes(_png((n, n, n)))
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['ingest', str(src), '--workers', '2', '--batch-size', '2', '--link'])
+    assert result.exit_code == 0, result.output
+    assert 'done: 5 ingested, 0 already stored' in result.output
+    result = runner.invoke(args=['ingest', str(src), '--uploader', 'nobody'])
+    assert result.exit_code != 0
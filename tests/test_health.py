@@ -1,5 +1,9 @@
+import json
+import logging
 import os
 import sys
+import time
+
 import pytest
 
 # Ensure project root is on path when tests run via conda run
@@ -22,4 +26,118 @@ def test_root_health(client):
     resp = client.get('/')
     assert resp.status_code == 200
     data = resp.get_json()
-    assert data.get('status') == 'ok'
\ No newline at end of file
+    assert data.get('status') == 'ok'
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "LOG_DIR": str(tmp_path / "logs"),
+        "THUMB_WORKERS": 0,
+        "ACCESS_LOG": True,
+        "LOG_FORMAT": "json",
+        "SLOW_REQUEST_MS": 5,
+    })
+    app.config.update(TESTING=True)
+    from app import db
+    from models import Image
+
+    def n_plus_one():
+        time.sleep(0.01)
+        for image in Image.query.all():
+            Image.query.filter_by(id=image.id).first()
+        return {'ok': True}
+
+    app.add_url_rule('/_n_plus_one', 'n_plus_one', n_plus_one)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Image(filename=f'{i}.png', path='x', checksum=str(i)) for i in range(3)])
+        db.session.commit()
+    yield app
+
+
+def test_metrics_endpoint_counts_requests_and_queries(app):
+    client = app.test_client()
+    client.get('/')
+    client.get('/_n_plus_one')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",endpoint="index",status="200"} 1' in body
+    assert 'http_request_db_queries_sum{endpoint="n_plus_one"} 4' in body
+    assert 'http_request_db_queries_sum{endpoint="index"} 0' in body
+
+
+def test_metrics_token(app):
+    app.config['METRICS_TOKEN'] = 's3cret'
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_slow_request_logs_sql_and_access_log_is_json(app, caplog):
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING):
+        client.get('/_n_plus_one')
+    slow = [r.getMessage() for r in caplog.records if r.getMessage().startswith('slow request')]
+    assert slow and '4 queries' in slow[0] and 'repeated x3' in slow[0]
+
+    with open(os.path.join(app.config['LOG_DIR'], 'access.log')) as fh:
+        entry = json.loads(fh.readlines()[-1])
+    assert entry['endpoint'] == 'n_plus_one' and entry['status'] == 200 and entry['db_queries'] == 4
+
+
+def test_blueprint_subset_and_lazy_imports(tmp_path):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "UPLOAD_FOLDER": str(tmp_path),
+                      "BLUEPRINTS": "auth,users", "TESTING": True})
+    assert set(app.blueprints) == {'auth', 'users'}
+    assert app.test_client().get('/web/').status_code == 404
+    with pytest.raises(ValueError, match='gallery'):
+        create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "BLUEPRINTS": "auth,gallery"})
+
+    from startup_profile import import_chain, profile_startup
+    records, _ = profile_startup(env={'UPLOAD_FOLDER': str(tmp_path / 'uploads'), 'LOG_DIR': str(tmp_path / 'logs'),
+                                      'DATABASE_URL': 'sqlite://', 'BLUEPRINTS': ''})
+    modules = {r.module for r in records}
+    assert {'app', 'blueprints.web', 'services.file_service'} <= modules
+    # migrations, vector search and numpy load on first use, not at boot
+    assert not modules & {'alembic', 'flask_migrate', 'numpy', 'embedding_pipeline', 'hash_index'}
+    assert import_chain(records, 'services.file_service')[-1] == 'services.file_service'
+
+
+def test_parse_importtime():
+    from startup_profile import by_package, import_chain, parse_importtime
+    records = parse_importtime(
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       100 |        100 |     numpy.core\n'
+        'import time:        50 |        150 |   numpy\n'
+        'import time:        10 |        160 | services.tags\n')
+    assert [(r.module, r.depth) for r in records] == [('numpy.core', 2), ('numpy', 1), ('services.tags', 0)]
+    assert by_package(records) == [('numpy', 150), ('services', 10)]
+    assert import_chain(records, 'numpy.core') == ['services.tags', 'numpy', 'numpy.core']
+    assert import_chain(records, 'PIL') is None
+
+
+def test_orjson_provider_matches_stdlib(tmp_path):
+    from datetime import datetime, UTC
+    from flask.json.provider import DefaultJSONProvider
+    from utils.json_provider import OrjsonProvider
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "UPLOAD_FOLDER": str(tmp_path)})
+    assert isinstance(app.json, OrjsonProvider)
+    std = DefaultJSONProvider(app)
+    payloads = [{'b': [1, 2.5, None, True], 'a': {'when': datetime(2024, 5, 1, 12, 0, tzinfo=UTC)}, 'text': 'café'},
+                {3: 'int key', 1: 'another'}, {'big': 2 ** 70}]
+    with app.app_context():
+        for payload in payloads:
+            assert app.json.loads(app.json.dumps(payload)) == std.loads(std.dumps(payload))
+            assert app.json.loads(app.json.response(payload).get_data()) == std.loads(std.dumps(payload))
+        assert app.json.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+        assert app.json.dumps({'b': 1, 'a': 2}, sort_keys=False) == '{"b":1,"a":2}'
+        assert app.json.dumps([1], indent=2) == std.dumps([1], indent=2)
+        with pytest.raises(TypeError):
+            app.json.dumps({'x': object()})
+
+    std_app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "JSON_PROVIDER": "std"})
+    assert type(std_app.json) is DefaultJSONProvider
+    with pytest.raises(ValueError):
+        create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "JSON_PROVIDER": "ujson"})
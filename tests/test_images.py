@@ -0,0 +1,328 @@
+import io
+import json
+import os
+import sys
+import time
+import pytest
+from PIL import Image as PILImage
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+    })
+    app.config.update(TESTING=True)
+    with app.app_context():
+        from app import db
+        db.create_all()
+    yield app
+
+
+@pytest.fixture()
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+
+def _jpeg(size=(2000, 1500), color=(200, 30, 30)):
+    buf = io.BytesIO()
+    PILImage.new('RGB', size, color).save(buf, 'JPEG', quality=90)
+    return buf.getvalue()
+
+
+def _upload(client, data, name='photo.jpg', **form):
+    form['file'] = (io.BytesIO(data), name)
+    r = client.post('/api/files/upload', data=form, content_type='multipart/form-data')
+    return r.get_json()['data']
+
+
+def test_thumbnails_rendered_on_upload(client, app):
+    from services.derivatives import derivative_path
+    image = _upload(client, _jpeg())
+    with app.app_context():
+        for width in app.config['THUMB_SIZES']:
+            assert os.path.exists(derivative_path(image['checksum'], width))
+
+    r = client.get(f"/api/images/{image['id']}/thumb?w=200")
+    assert r.status_code == 200
+    thumb = PILImage.open(io.BytesIO(r.data))
+    assert max(thumb.size) == 256
+    assert thumb.size == (256, 192)
+
+    r2 = client.get(f"/api/images/{image['id']}/thumb?w=200", headers={'If-None-Match': r.headers['ETag']})
+    assert r2.status_code == 304
+
+
+def test_thumbnail_on_demand_and_unsupported(client, app):
+    from services.derivatives import derivative_path
+    image = _upload(client, _jpeg(size=(600, 800)))
+    with app.app_context():
+        path = derivative_path(image['checksum'], 1024)
+        os.remove(path)
+    r = client.get(f"/api/images/{image['id']}/thumb?w=5000")
+    assert r.status_code == 200
+    # never upscaled beyond the original
+    assert PILImage.open(io.BytesIO(r.data)).size == (600, 800)
+    assert os.path.exists(path)
+
+    not_image = _upload(client, b'plain text', name='notes.txt')
+    assert client.get(f"/api/images/{not_image['id']}/thumb").status_code == 415
+    assert client.get('/api/images/999/thumb').status_code == 404
+
+
+def test_list_images_cursor_pagination(client, app):
+    from datetime import datetime, timedelta
+    from app import db
+    from models import Image
+    base = datetime(2024, 1, 1)
+    with app.app_context():
+        # pairs share a timestamp so the id tiebreaker matters
+        db.session.add_all([Image(filename=f'{i}.jpg', path='x', checksum=f'{i:064x}',
+                                  category='cats' if i % 3 == 0 else 'dogs',
+                                  created_at=base + timedelta(minutes=i // 2)) for i in range(25)])
+        db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        url = '/api/images?page_size=10&with_total=1' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()['data']
+        assert data['meta']['total'] == 25
+        seen.extend(item['id'] for item in data['items'])
+        cursor = data['meta']['next_cursor']
+        if cursor is None:
+            break
+    assert seen == list(range(25, 0, -1))
+
+    # walking back from the last page returns the previous page unchanged
+    back = client.get(f"/api/images?page_size=10&cursor={data['meta']['prev_cursor']}").get_json()['data']
+    assert [item['id'] for item in back['items']] == list(range(15, 5, -1))
+    assert back['meta']['total'] is None
+
+    oldest = client.get('/api/images?category=cats&sort=created_at&page_size=3').get_json()['data']
+    assert [item['id'] for item in oldest['items']] == [1, 4, 7]
+    assert oldest['meta']['prev_cursor'] is None
+
+    assert client.get('/api/images?cursor=garbage').status_code == 400
+    assert client.get('/web/?page_size=10&cursor=garbage').status_code == 302
+    r = client.get(f"/web/?page_size=10&cursor={data['meta']['prev_cursor']}")
+    assert r.status_code == 200 and '15.jpg' not in r.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('cache_size', [0, 8])
+def test_tag_filters_and_migration(client, app, cache_size):
+    from app import db
+    from models import Image, ImageTag
+    from services.tags import migrate_tags
+    app.config['TAG_CACHE_SIZE'] = cache_size
+    dog = _upload(client, _jpeg(color=(1, 2, 3)), tags='Dog, outdoor')
+    cat = _upload(client, _jpeg(color=(4, 5, 6)), tags='cat,outdoor', category='pets')
+    _upload(client, _jpeg(color=(7, 8, 9)), tags='dog')
+    with app.app_context():
+        # a row from before the tag table existed
+        db.session.add(Image(filename='old.jpg', path='x', tags=' indoor ,dog,DOG'))
+        db.session.commit()
+
+    def ids(query):
+        return sorted(item['id'] for item in client.get('/api/images?' + query).get_json()['data']['items'])
+
+    assert ids('tags=dog,outdoor') == [dog['id']]
+    assert ids('tags=outdoor&category=pets') == [cat['id']]
+    assert len(ids('tags=dog,cat&tag_mode=any')) == 3
+    assert ids('tags=dog,unknown') == []
+    assert ids('tags=indoor') == []
+    assert client.get('/api/images?tags=dog&tag_mode=some').status_code == 400
+
+    with app.app_context():
+        assert migrate_tags(batch_size=2) == 4
+        assert migrate_tags() == 4  # idempotent
+        assert ImageTag.query.count() == 7
+    assert len(ids('tags=dog')) == 3
+    assert len(ids('tags=dog,indoor')) == 1
+
+    with app.app_context():
+        from services.file_service import delete_image
+        delete_image(db.session.get(Image, dog['id']))
+    assert len(ids('tags=dog')) == 2
+
+
+def test_image_detail_cached_with_etag_and_invalidated(client, app):
+    image = _upload(client, _jpeg(size=(64, 48)), category='travel', tags='a,b')
+    r = client.get(f"/api/images/{image['id']}")
+    data = r.get_json()['data']
+    assert r.status_code == 200 and data['category'] == 'travel' and data['tags'] == ['a', 'b']
+    assert data['ocr_text'] is None
+    etag = r.headers['ETag']
+    assert client.get(f"/api/images/{image['id']}", headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/images/999').get_json()['error']['code'] == 3001
+
+    from app import db
+    from models import Image
+    import ocr_pipeline
+    with app.app_context():
+        # cached: the row is not read again
+        db.session.execute(Image.__table__.update().values(filename='changed-behind-cache.jpg'))
+        db.session.commit()
+    assert client.get(f"/api/images/{image['id']}").get_json()['data']['filename'] == 'photo.jpg'
+    with app.app_context():
+        ocr_pipeline.persist_ocr(image['id'], 'hello world')
+    r = client.get(f"/api/images/{image['id']}", headers={'If-None-Match': etag})
+    assert r.status_code == 200 and r.headers['ETag'] != etag
+    assert r.get_json()['data']['ocr_text'] == 'hello world'
+
+    page = client.get(f"/web/images/{image['id']}")
+    assert page.status_code == 200 and 'hello world' in page.get_data(as_text=True)
+    assert client.get(f"/web/images/{image['id']}", headers={'If-None-Match': page.headers['ETag']}).status_code == 304
+
+    from services.file_service import delete_image
+    with app.app_context():
+        delete_image(db.session.get(Image, image['id']))
+    assert client.get(f"/api/images/{image['id']}").status_code == 404
+    assert client.get(f"/web/images/{image['id']}").status_code == 404
+
+
+def test_image_detail_hides_location_and_uploader(client, app):
+    client.post('/api/auth/register', json={'username': 'owner', 'password': 'pw'})
+    token = client.post('/api/auth/login', json={'username': 'owner', 'password': 'pw'}).get_json()['data']['access_token']
+    owner = {'Authorization': f'Bearer {token}'}
+    exif = PILImage.Exif()
+    exif[0x010f] = 'Canon'
+    exif[0x8769] = {0x9003: '2024:01:01 10:00:00', 0xa431: 'SN-12345'}  # DateTimeOriginal, BodySerialNumber
+    exif[0x8825] = {1: 'N', 2: (52.0, 31.0, 12.0)}  # GPSLatitudeRef, GPSLatitude
+    buf = io.BytesIO()
+    PILImage.new('RGB', (40, 30)).save(buf, 'JPEG', exif=exif)
+    r = client.post('/api/files/upload', data={'file': (io.BytesIO(buf.getvalue()), 'geo.jpg')},
+                    content_type='multipart/form-data', headers=owner)
+    image_id = r.get_json()['data']['id']
+
+    public = client.get(f'/api/images/{image_id}')
+    data = public.get_json()['data']
+    assert data['exif'] == {'Make': 'Canon', 'Exif': {'DateTimeOriginal': '2024:01:01 10:00:00'}}
+    assert 'uploader_id' not in data
+    own = client.get(f'/api/images/{image_id}', headers=owner)
+    assert own.get_json()['data']['uploader_id'] is not None
+    assert own.headers['ETag'] != public.headers['ETag'] and 'Authorization' in own.headers['Vary']
+
+
+def test_image_update_invalidates_detail_after_commit(client, app):
+    from app import db
+    from models import Image
+    from services.metadata_cache import get_metadata_cache
+    image_id = _upload(client, _jpeg(size=(64, 48)))['id']
+    client.get(f'/api/images/{image_id}')
+    with app.app_context():
+        cache = get_metadata_cache()
+        img = db.session.get(Image, image_id)
+        img.filename = 'renamed.jpg'
+        db.session.flush()
+        assert cache.get(image_id) is not None  # not yet committed: readers may still load the old row
+        db.session.rollback()
+        assert cache.get(image_id) is not None
+        db.session.get(Image, image_id).filename = 'renamed.jpg'
+        db.session.commit()
+        assert cache.get(image_id) is None
+    assert client.get(f'/api/images/{image_id}').get_json()['data']['filename'] == 'renamed.jpg'
+
+
+def test_image_detail_shared_tier(app, tmp_path):
+    from services.metadata_cache import MetadataCache, SharedTier
+    shared = SharedTier(str(tmp_path / 'meta.db'))
+    a = MetadataCache(100, 300, shared=shared, local_ttl=5)
+    b = MetadataCache(100, 300, shared=SharedTier(str(tmp_path / 'meta.db')))
+    a.put(1, ('etag', {'id': 1}))
+    assert b.get(1) == ('etag', {'id': 1})
+    b.invalidate([1])
+    assert shared.get(1) is None and a.local.get(1) is not None  # a's copy lives out its local TTL
+
+
+def test_image_detail_skips_put_after_invalidate(app, tmp_path):
+    from services.metadata_cache import MetadataCache, SharedTier
+    a = MetadataCache(100, 300, shared=SharedTier(str(tmp_path / 'meta.db')))
+    b = MetadataCache(100, 300, shared=SharedTier(str(tmp_path / 'meta.db')))
+    loaded_at = time.time()
+    # a writer commits and invalidates while the reader is still loading
+    b.invalidate([1])
+    a.put(1, ('stale', {'id': 1}), loaded_at)
+    assert a.get(1) is None and b.get(1) is None
+    local = MetadataCache(100, 300)
+    loaded_at = time.time()
+    local.invalidate([1])
+    local.put(1, ('stale', {'id': 1}), loaded_at)
+    assert local.get(1) is None
+    time.sleep(0.01)
+    a.put(1, ('fresh', {'id': 1}), time.time())
+    assert b.get(1) == ('fresh', {'id': 1})
+
+
+def test_header_metadata_at_upload_and_backfill(client, app):
+    from PIL import Image as PILImage
+    buf = io.BytesIO()
+    exif = PILImage.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees: displayed as portrait
+    exif[0x010f] = 'Canon'
+    PILImage.new('RGB', (400, 300), (10, 20, 30)).save(buf, 'JPEG', exif=exif)
+    portrait = _upload(client, buf.getvalue(), name='rotated.jpg')
+    landscape = _upload(client, _jpeg(size=(300, 100)))
+    other = _upload(client, b'%PDF-1.4 not an image', name='doc.pdf')
+
+    detail = client.get(f"/api/images/{portrait['id']}").get_json()['data']
+    assert (detail['width'], detail['height'], detail['format']) == (300, 400, 'JPEG')
+    assert detail['mime'] == 'image/jpeg' and detail['orientation'] == 6 and detail['exif']['Make'] == 'Canon'
+    assert client.get(f"/api/images/{other['id']}").get_json()['data']['mime'] == 'application/pdf'
+
+    ids = lambda qs: [i['id'] for i in client.get(f'/api/images?{qs}').get_json()['data']['items']]  # noqa: E731
+    assert ids('orientation=portrait') == [portrait['id']]
+    assert ids('orientation=landscape&min_width=200') == [landscape['id']]
+    assert client.get('/api/images?orientation=sideways').status_code == 400
+
+    from app import db
+    from models import Image
+    from services.backfill import run_backfill
+    from services.jobs import get_job_engine
+    with app.app_context():
+        get_job_engine()
+        db.session.execute(Image.__table__.update().values(width=None, height=None, format=None, mime=None))
+        db.session.commit()
+        progress = run_backfill('metadata', batch_size=2, workers=0, restart=True)
+        assert progress.processed == 3
+        row = db.session.get(Image, landscape['id'])
+        assert (row.width, row.height, row.mime) == (300, 100, 'image/jpeg')
+
+
+def test_list_projection_matches_image_to_dict_and_compresses(client, app):
+    import gzip
+    for i in range(30):
+        _upload(client, _jpeg(size=(8 + i, 8)), name=f'{i}.jpg', category='c', tags='x, y')
+
+    from app import db
+    from models import Image
+    from services.image_service import LIST_COLUMNS, image_dicts_by_id, image_rows_to_dicts, image_to_dict
+    with app.test_request_context():
+        images = Image.query.order_by(Image.id).all()
+        rows = db.session.query(*LIST_COLUMNS).order_by(Image.id).all()
+        assert image_rows_to_dicts(rows) == [image_to_dict(img) for img in images]
+        assert image_dicts_by_id([images[3].id, 999]) == {images[3].id: image_to_dict(images[3])}
+
+    plain = client.get('/api/images?page_size=30')
+    assert 'Content-Encoding' not in plain.headers and plain.headers['Vary'] == 'Accept-Encoding'
+    r = client.get('/api/images?page_size=30', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert int(r.headers['Content-Length']) < len(plain.get_data()) // 3
+    assert json.loads(gzip.decompress(r.get_data())) == plain.get_json()
+    small = client.get('/api/images?page_size=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers  # under COMPRESS_MIN_BYTES
+
+    # the compressed detail carries a weak ETag that still revalidates
+    app.config['COMPRESS_MIN_BYTES'] = 1
+    detail = client.get(f"/api/images/{images[0].id}", headers={'Accept-Encoding': 'gzip'})
+    assert detail.headers['ETag'].startswith('W/')
+    assert client.get(f"/api/images/{images[0].id}", headers={'Accept-Encoding': 'gzip',
+                      'If-None-Match': detail.headers['ETag']}).status_code == 304
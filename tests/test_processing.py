@@ -0,0 +1,163 @@
+import io
+import os
+import sys
+import pytest
+from PIL import Image as PILImage
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+        "JOB_PROCESS_WORKERS": 0,
+        "JOB_RETRY_BASE_SECONDS": 0,
+    })
+    app.config.update(TESTING=True)
+    with app.app_context():
+        from app import db
+        db.create_all()
+    yield app
+
+
+@pytest.fixture()
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+
+def _upload_jpeg(client, color=(10, 120, 200)):
+    buf = io.BytesIO()
+    PILImage.new('RGB', (320, 240), color).save(buf, 'JPEG')
+    r = client.post('/api/files/upload', data={'file': (io.BytesIO(buf.getvalue()), 'p.jpg')},
+                    content_type='multipart/form-data')
+    return r.get_json()['data']['id']
+
+
+def _status(client, image_id):
+    tasks = client.get(f'/api/process/status?image_id={image_id}').get_json()['data']['tasks']
+    return {t['name']: t for t in tasks}
+
+
+def test_trigger_runs_embedding_and_dedups(client, app):
+    from models import Embedding
+    from services.jobs import get_job_engine
+    image_id = _upload_jpeg(client)
+    r = client.post('/api/process/trigger', json={'image_id': image_id, 'tasks': ['embedding']})
+    assert r.status_code == 202
+    assert _status(client, image_id)['embedding']['status'] == 'pending'
+
+    with app.app_context():
+        assert get_job_engine().run_once() == 1
+        emb = Embedding.query.filter_by(image_id=image_id).one()
+        assert emb.dim == 128 and emb.model_name
+
+    assert _status(client, image_id)['embedding']['status'] == 'done'
+    # finished work is not queued again unless forced
+    client.post('/api/process/trigger', json={'image_id': image_id, 'tasks': ['embedding']})
+    with app.app_context():
+        assert get_job_engine().run_once() == 0
+    client.post('/api/process/trigger', json={'image_id': image_id, 'tasks': ['embedding'], 'force': True})
+    with app.app_context():
+        assert get_job_engine().run_once() == 1
+
+
+def test_retry_with_backoff_then_fail(client, app):
+    from services import jobs
+    calls = []
+
+    @jobs.task('flaky', max_attempts=2)
+    def flaky(image_id):
+        calls.append(image_id)
+        raise RuntimeError('boom')
+
+    try:
+        image_id = _upload_jpeg(client)
+        client.post('/api/process/trigger', json={'image_id': image_id, 'tasks': ['flaky']})
+        with app.app_context():
+            engine = jobs.get_job_engine()
+            assert engine.run_once() == 2  # first attempt + immediate retry (0s backoff)
+        status = _status(client, image_id)['flaky']
+        assert status['status'] == 'failed'
+        assert status['attempts'] == 2
+        assert 'boom' in status['last_error']
+        assert len(calls) == 2
+    finally:
+        jobs.TASKS.pop('flaky', None)
+
+
+def test_job_deleted_with_its_image_while_running(client, app):
+    from app import db
+    from models import Image, Job
+    from services import jobs
+    from services.file_service import delete_image
+
+    @jobs.task('vanish')
+    def vanish(image_id):
+        delete_image(db.session.get(Image, image_id))
+        if image_id == doomed:
+            raise RuntimeError('image is gone')
+
+    try:
+        ok, doomed, claimed = _upload_jpeg(client), _upload_jpeg(client, (200, 10, 10)), _upload_jpeg(client, (0, 0, 0))
+        for image_id in (ok, doomed):
+            client.post('/api/process/trigger', json={'image_id': image_id, 'tasks': ['vanish']})
+        with app.app_context():
+            assert jobs.get_job_engine().run_once() == 2
+            assert Job.query.filter_by(task='vanish').count() == 0
+
+            # claimed, then deleted before the handler starts
+            job = jobs.enqueue(claimed, 'vanish')
+            db.session.commit()
+            engine = jobs.get_job_engine()
+            assert engine._claim(job.id)
+            db.session.query(Job).filter(Job.id == job.id).delete()
+            db.session.commit()
+            engine._running['vanish'] += 1
+            engine._execute(job.id, 'vanish')
+            assert db.session.get(Image, claimed) is not None
+    finally:
+        jobs.TASKS.pop('vanish', None)
+
+
+def test_trigger_validation(client):
+    assert client.post('/api/process/trigger', json={}).status_code == 400
+    r = client.post('/api/process/trigger', json={'image_id': 1, 'tasks': ['nope']})
+    assert r.get_json()['error']['code'] == 1002
+    for tasks in ([{'name': 'ocr'}], [['ocr']], 'ocr'):
+        r = client.post('/api/process/trigger', json={'image_id': 1, 'tasks': tasks})
+        assert r.status_code == 400 and r.get_json()['error']['code'] == 1002
+    assert client.post('/api/process/trigger', json={'image_id': 42, 'tasks': ['ocr']}).status_code == 404
+    assert client.get('/api/process/status').status_code == 400
+
+
+def test_backfill_command_skips_current_and_resumes(client, app):
+    from models import Embedding
+    ids = [_upload_jpeg(client, color=(i * 20, 50, 90)) for i in range(5)]
+    with app.app_context():
+        from embedding_pipeline import compute_embedding, persist_embedding
+        from services.blob_store import local_path
+        from models import Image
+        from app import db
+        # one image is already current and must be skipped
+        persist_embedding(ids[0], compute_embedding(local_path(db.session.get(Image, ids[0]).path)))
+
+    runner = app.test_cli_runner()
+    r = runner.invoke(args=['backfill', 'embedding', '--batch-size', '2', '--workers', '0', '--limit', '3'])
+    assert r.exit_code == 0, r.output
+    assert 'img/s' in r.output
+    r = runner.invoke(args=['backfill', 'embedding', '--batch-size', '2', '--workers', '0'])
+    assert r.exit_code == 0, r.output
+    assert 'done: 4 processed, 1 already current' in r.output
+    with app.app_context():
+        assert Embedding.query.count() == 5
+    # nothing left to do after a restart from the first id
+    r = runner.invoke(args=['backfill', 'embedding', '--workers', '0', '--restart'])
+    assert 'done: 0 processed, 5 already current' in r.output
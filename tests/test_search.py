@@ -0,0 +1,249 @@
+import io
+import os
+import sys
+import numpy as np
+import pytest
+from PIL import Image as PILImage
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app import create_app  # noqa: E402
+from vector_store import VectorStore  # noqa: E402
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "THUMB_WORKERS": 0,
+        "JOB_PROCESS_WORKERS": 0,
+    })
+    app.config.update(TESTING=True)
+    with app.app_context():
+        from app import db
+        db.create_all()
+    yield app
+
+
+@pytest.fixture()
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+
+def _unit(rng, n, dim):
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_vector_store_exact_topk_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    x = _unit(rng, 500, 16)
+    store = VectorStore(str(tmp_path / 'vs'), 16)
+    store.add(np.arange(300) + 1000, x[:300])
+    store.add(np.arange(300, 500) + 1000, x[300:])
+    q = x[7]
+    expected = np.argsort(-(x @ q))[:5] + 1000
+    assert [i for i, _ in store.search(q, 5)] == list(expected)
+    assert store.search(q, 1, exclude={1007})[0][0] == expected[1]
+
+    # tombstones hide rows, re-adding an id replaces its vector
+    store.remove([1007])
+    assert 1007 not in [i for i, _ in store.search(q, 5)]
+    store.add([1007], x[8][None, :])
+    assert store.search(x[8], 2)[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert len(store) == 500
+
+    # a second handle (another worker) sees appended rows through the shared files
+    other = VectorStore(str(tmp_path / 'vs'), 16)
+    assert np.allclose(other.get(1007), x[8])
+    assert store.compact() == 500
+    assert [i for i, _ in other.search(x[3], 3)] == [i for i, _ in store.search(x[3], 3)]
+
+
+def test_vector_store_recovers_from_half_written_append(tmp_path):
+    rng = np.random.default_rng(3)
+    vecs = rng.standard_normal((4, 8)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    store = VectorStore(str(tmp_path), dim=8)
+    store.add([1, 2], vecs[:2])
+    # a writer crashed after vectors.bin and deleted.bin, before ids.bin
+    with open(tmp_path / 'vectors.bin', 'ab') as f:
+        f.write(rng.standard_normal((5, 8)).astype(np.float32).tobytes())
+    with open(tmp_path / 'deleted.bin', 'ab') as f:
+        f.write(bytes(5))
+
+    store = VectorStore(str(tmp_path), dim=8)
+    assert len(store) == 2
+    store.add([3, 4], vecs[2:])
+    assert os.path.getsize(tmp_path / 'vectors.bin') == 4 * 8 * 4
+    for image_id, vec in zip([1, 2, 3, 4], vecs):
+        assert np.allclose(store.get(image_id), vec)
+        assert store.search(vec, k=1)[0][0] == image_id
+
+
+def test_vector_store_ivf_recall_and_float16(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = _unit(rng, 20, 32)
+    x = centers[rng.integers(0, 20, 4000)] + 0.05 * rng.standard_normal((4000, 32)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    store = VectorStore(str(tmp_path / 'ivf'), 32, dtype='float16', nprobe=4)
+    store.add(np.arange(4000), x)
+    assert store.build_ivf(nlist=20) == 20
+    store.add([9999], x[0][None, :])  # appended after the build: must still be found
+    hits = 0
+    for qi in range(0, 4000, 200):
+        exact = {i for i, _ in store.search(x[qi], 10, mode='exact')}
+        approx = {i for i, _ in store.search(x[qi], 10, mode='ivf')}
+        hits += len(exact & approx)
+    assert hits / 200 >= 0.9
+    assert 9999 in {i for i, _ in store.search(x[0], 3, mode='ivf')}
+
+
+def _upload(client, color):
+    buf = io.BytesIO()
+    PILImage.new('RGB', (64, 64), color).save(buf, 'PNG')
+    r = client.post('/api/files/upload', data={'file': (io.BytesIO(buf.getvalue()), 'c.png')},
+                    content_type='multipart/form-data')
+    return r.get_json()['data']['id']
+
+
+def test_similar_endpoint(client, app):
+    ids = [_upload(client, c) for c in [(250, 10, 10), (240, 20, 15), (10, 10, 250)]]
+    r = client.get(f'/api/search/similar?image_id={ids[0]}')
+    assert r.status_code == 409
+    assert r.get_json()['error']['code'] == 5001
+
+    client.post('/api/process/trigger', json={'image_id': ids[0], 'tasks': ['embedding']})
+    with app.app_context():
+        from services.jobs import enqueue_many, get_job_engine
+        enqueue_many(ids, 'embedding')
+        get_job_engine().run_once()
+
+    r = client.get(f'/api/search/similar?image_id={ids[0]}&k=2')
+    results = r.get_json()['data']['results']
+    assert [x['image']['id'] for x in results] == [ids[1], ids[2]]
+    assert 0 <= results[1]['score'] <= results[0]['score'] <= 1
+    r = client.get(f'/api/search/similar?embedding_ref=vs:color-layout-v1:{ids[0]}&k=1')
+    assert r.get_json()['data']['results'][0]['image']['id'] == ids[1]
+    assert client.get('/api/search/text?q=red').status_code == 404
+
+    # fan-out: every source for the given inputs, unavailable ones reported per source
+    r = client.get(f'/api/search/all?q=c.png&image_id={ids[0]}&k=1')
+    data = r.get_json()['data']
+    assert data['results']['similar'][0]['image']['id'] == ids[1]
+    assert data['errors'] == {}
+    assert set(data['results']) == {'ocr', 'similar', 'duplicates'}
+    assert client.get('/api/search/all').get_json()['error']['code'] == 1001
+
+
+def test_ocr_fulltext_search_ranked_and_synced(client, app):
+    from app import db
+    from models import Image, OCRText
+    with app.app_context():
+        a = Image(filename='receipt_march.jpg', path='x', tags='finance,receipt')
+        b = Image(filename='holiday.jpg', path='y', tags='beach')
+        c = Image(filename='notes.png', path='z')
+        db.session.add_all([a, b, c])
+        db.session.commit()
+        db.session.add_all([
+            OCRText(image_id=b.id, text='Total amount due: 42 EUR <script>'),
+            OCRText(image_id=c.id, text='meeting notes, invoice total pending'),
+        ])
+        db.session.commit()
+        ids = (a.id, b.id, c.id)
+
+    r = client.get('/api/search/ocr?q=total')
+    data = r.get_json()['data']
+    assert {x['image']['id'] for x in data['results']} == {ids[1], ids[2]}
+    assert data['meta']['total'] == 2
+    snippet = next(x['snippet'] for x in data['results'] if x['image']['id'] == ids[1])
+    assert '<mark>Total</mark>' in snippet and '&lt;script&gt;' in snippet
+
+    # tags outrank body text; filename/tag changes are synced by triggers
+    r = client.get('/api/search/ocr?q=receipt')
+    assert r.get_json()['data']['results'][0]['image']['id'] == ids[0]
+    r = client.get('/api/search/ocr?q=tot*&page=2&page_size=1')
+    assert len(r.get_json()['data']['results']) == 1
+    assert client.get('/api/search/ocr?q="unbalanced').status_code == 200
+
+    with app.app_context():
+        db.session.delete(db.session.get(OCRText, 1))
+        db.session.get(Image, ids[2]).tags = 'total'
+        db.session.commit()
+    r = client.get('/api/search/ocr?q=total')
+    assert [x['image']['id'] for x in r.get_json()['data']['results']] == [ids[2]]
+
+    # the gallery filename filter goes through the same index
+    r = client.get('/web/?q=holiday')
+    assert b'holiday.jpg' in r.data and b'notes.png' not in r.data
+
+
+def test_hash_index_matches_brute_force():
+    from hash_index import HashIndex
+    rng = np.random.default_rng(1)
+    codes = rng.integers(0, 2**63, 3000, dtype=np.uint64) * np.uint64(2) + rng.integers(0, 2, 3000, dtype=np.uint64)
+    # plant near copies of the first ten codes
+    flips = [np.uint64(1 << int(b)) for b in rng.integers(0, 64, 10)]
+    codes[10:20] = codes[:10] ^ np.array(flips, dtype=np.uint64)
+    index = HashIndex(merge_threshold=100)
+    index.build(range(2000), codes[:2000])
+    for i in range(2000, 3000):
+        index.add(i, int(codes[i]))
+    index.remove(5)
+    for q in (0, 3, 17, 2500):
+        for k in (2, 6, 9):
+            dist = np.bitwise_count(codes ^ codes[q])
+            expected = sorted((int(d), i) for i, d in enumerate(dist.tolist()) if d <= k and i not in (q, 5))
+            assert [(d, i) for i, d in index.query(int(codes[q]), k, exclude=q)] == expected
+    assert [0, 10] in index.clusters(1)
+
+
+def _pattern(seed, size=(256, 192)):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return PILImage.fromarray(small).resize(size, PILImage.BILINEAR)
+
+
+def _upload_image(client, img, fmt, name):
+    buf = io.BytesIO()
+    img.save(buf, fmt, quality=70) if fmt == 'JPEG' else img.save(buf, fmt)
+    r = client.post('/api/files/upload', data={'file': (io.BytesIO(buf.getvalue()), name)},
+                    content_type='multipart/form-data')
+    return r.get_json()['data']
+
+
+def test_near_duplicates_survive_resize_and_recompression(client, app):
+    original = _upload_image(client, _pattern(1), 'PNG', 'a.png')
+    other = _upload_image(client, _pattern(2), 'PNG', 'b.png')
+    copy = _upload_image(client, _pattern(1).resize((120, 90)), 'JPEG', 'a_small.jpg')
+    assert original['near_duplicates'] == []
+    assert [x['id'] for x in copy['near_duplicates']] == [original['id']]
+
+    r = client.get(f"/api/search/duplicates?image_id={original['id']}")
+    results = r.get_json()['data']['results']
+    assert [x['image']['id'] for x in results] == [copy['id']]
+    assert results[0]['distance'] <= 4
+    assert client.get('/api/search/duplicates/clusters').status_code == 404
+
+    r = client.post('/api/process/trigger', json={'tasks': ['duplicate_clusters']})
+    assert r.status_code == 202
+    assert client.post('/api/process/trigger', json={'tasks': ['phash']}).get_json()['error']['code'] == 1001
+    with app.app_context():
+        from services.jobs import get_job_engine
+        get_job_engine().run_once()
+    report = client.get('/api/search/duplicates/clusters').get_json()['data']
+    assert report['clusters'] == [[original['id'], copy['id']]]
+    assert report['images'] == 3
+
+    with app.app_context():
+        from app import db
+        from models import Image
+        from services.file_service import delete_image
+        delete_image(db.session.get(Image, copy['id']))
+    r = client.get(f"/api/search/duplicates?image_id={original['id']}")
+    assert r.get_json()['data']['results'] == []
+    assert other['id'] not in (original['id'], copy['id'])
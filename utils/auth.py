@@ -3,25 +3,32 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 
 import jwt
-from passlib.context import CryptContext
 from flask import current_app, request
 from functools import wraps
 
-from app import db
+from extensions import db
 from models import User
+from services.auth_cache import cached_payload, load_user, remember_payload
+from services.password_hasher import get_password_hasher
+from services.token_store import get_token_store
 from utils.response import error
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
-_refresh_token_store: Dict[str, Dict[str, Any]] = {}
-
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_password_hasher().hash(password)
 
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
+    return get_password_hasher().verify(password, password_hash)[0]
+
+
+def verify_password_and_update(user: User, password: str) -> bool:
+    """Check ``password`` and, if the hash settings changed since it was stored, store a fresh hash."""
+    ok, new_hash = get_password_hasher().verify(password, user.password_hash)
+    if ok and new_hash:
+        user.password_hash = new_hash
+        db.session.commit()
+    return ok
 
 
 def _now() -> datetime:
@@ -43,32 +50,56 @@ def create_access_token(user_id: int, role: str) -> str:
 
 def create_refresh_token(user_id: int, role: str) -> str:
     exp_days = current_app.config.get("JWT_REFRESH_EXPIRES_DAYS", 7)
-    jti = os.urandom(8).hex()
+    jti = os.urandom(16).hex()
+    expires = _now() + timedelta(days=exp_days)
     payload = {
         "sub": str(user_id),
         "role": role,
         "type": "refresh",
         "jti": jti,
         "nonce": os.urandom(4).hex(),
-        "exp": _now() + timedelta(days=exp_days),
+        "exp": expires,
         "iat": _now(),
     }
     token = jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm=current_app.config["JWT_ALGORITHM"])
-    _refresh_token_store[jti] = {"user_id": user_id, "expires": _now() + timedelta(days=exp_days)}
+    get_token_store().add(jti, user_id, expires)
     return token
 
 
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    payload = cached_payload(token)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=[current_app.config["JWT_ALGORITHM"]])
+        payload = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=[current_app.config["JWT_ALGORITHM"]])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    remember_payload(token, payload)
+    return payload
+
+
+def is_refresh_token_active(jti: Optional[str]) -> bool:
+    return bool(jti) and get_token_store().is_active(jti)
 
 
 def revoke_refresh_token(jti: str):
-    _refresh_token_store.pop(jti, None)
+    get_token_store().revoke(jti)
+
+
+def optional_user_id() -> Optional[int]:
+    """User id from a valid access token if one was sent, else None (anonymous)."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    payload = decode_token(auth_header.split(" ", 1)[1])
+    if not payload or payload.get("type") != "access":
+        return None
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
 
 
 def jwt_required(role: Optional[str] = None):
@@ -82,13 +113,19 @@ def jwt_required(role: Optional[str] = None):
             payload = decode_token(token)
             if not payload or payload.get("type") != "access":
                 return error(2002, "invalid or expired access token", status=401)
-            if role and payload.get("role") != role:
-                return error(2003, "insufficient role", status=403)
             try:
                 request.user_id = int(payload.get("sub"))  # attach to request context
             except (TypeError, ValueError):
                 return error(2002, "invalid token subject", status=401)
             request.user_role = payload.get("role")
+            if role:
+                # check the current role, not the one baked into the token at login
+                user = load_user(request.user_id)
+                if user is None:
+                    return error(2002, "invalid token subject", status=401)
+                request.user_role = user.role
+            if role and request.user_role != role:
+                return error(2003, "insufficient role", status=403)
             return fn(*args, **kwargs)
         return wrapper
     return decorator
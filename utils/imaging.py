@@ -0,0 +1,143 @@
+"""Pillow helpers that are safe to run in worker processes (no Flask imports)."""
+import os
+import tempfile
+
+import filetype
+from PIL import ExifTags, Image, ImageOps, features
+
+THUMB_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+THUMB_EXT = {'WEBP': 'webp', 'JPEG': 'jpg'}[THUMB_FORMAT]
+THUMB_MIME = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}[THUMB_FORMAT]
+# what Pillow raises for unreadable, truncated or oversized inputs
+RENDER_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+
+def render_thumbnail(src_path: str, dest_path: str, size: int, quality: int = 80) -> str:
+    """Write a rendition whose longest edge is at most ``size`` pixels.
+
+    Large JPEGs are downscaled in the DCT domain with ``draft()`` and then by
+    integer ``reduce()`` before the final Lanczos resize, so a 40MP photo is
+    never fully decoded.
+    """
+    with Image.open(src_path) as im:
+        w, h = im.size
+        scale = min(1.0, size / max(w, h))
+        target = (max(1, round(w * scale)), max(1, round(h * scale)))
+        # JPEG only: decoder picks the largest 1/2, 1/4, 1/8 scale still >= target
+        im.draft('RGB', target)
+        factor = min(im.width // (target[0] * 2), im.height // (target[1] * 2))
+        if factor > 1:
+            im = im.reduce(factor)
+        if im.size != target:
+            im = im.resize(target, Image.LANCZOS)
+        im = ImageOps.exif_transpose(im)
+        has_alpha = im.mode in ('RGBA', 'LA') or (im.mode == 'P' and 'transparency' in im.info)
+        im = im.convert('RGBA' if has_alpha and THUMB_FORMAT == 'WEBP' else 'RGB')
+
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.thumb-', dir=os.path.dirname(dest_path))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                im.save(out, THUMB_FORMAT, quality=quality)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return dest_path
+
+
+def render_thumbnails(src_path: str, targets: list[tuple[str, int]], quality: int = 80) -> list[str]:
+    """Render several sizes for one source; failures (e.g. not an image) are skipped."""
+    done = []
+    for dest_path, size in targets:
+        if os.path.exists(dest_path):
+            continue
+        try:
+            done.append(render_thumbnail(src_path, dest_path, size, quality))
+        except RENDER_ERRORS:
+            continue
+    return done
+
+
+def dhash(src_path: str, size: int = 8) -> int:
+    """64-bit difference hash (for ``size`` 8) as an unsigned int.
+
+    The image is reduced to ``(size + 1) x size`` grayscale and each bit says
+    whether a pixel is brighter than its right neighbour, so resized,
+    recompressed or slightly recoloured copies hash to the same or nearby
+    values. Decoding goes through ``draft()`` like the thumbnails.
+    """
+    import numpy as np
+
+    with Image.open(src_path) as im:
+        im.draft('L', (size * 8, size * 8))
+        im = ImageOps.exif_transpose(im).convert('L').resize((size + 1, size), Image.BOX)
+        pixels = np.asarray(im, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+# EXIF orientations 5-8 rotate by 90 degrees, so the displayed image is height x width
+_TRANSPOSED = (5, 6, 7, 8)
+_EXIF_IFDS = {0x8769: 'Exif', 0x8825: 'GPSInfo'}
+_EXIF_MAX_VALUE = 256
+
+
+def _exif_value(value):
+    if isinstance(value, bytes):
+        return None  # MakerNote, thumbnails, UserComment blobs: large and not human readable
+    if isinstance(value, str):
+        return value.strip('\x00 ')[:_EXIF_MAX_VALUE]
+    if isinstance(value, tuple):
+        return [_exif_value(v) for v in value]
+    if isinstance(value, int):
+        return value
+    try:
+        return float(value)  # IFDRational
+    except (TypeError, ValueError, ZeroDivisionError):
+        return str(value)[:_EXIF_MAX_VALUE]
+
+
+def _exif_dict(exif) -> dict:
+    out = {}
+    for tag, value in exif.items():
+        if tag in _EXIF_IFDS:
+            continue
+        value = _exif_value(value)
+        if value is not None:
+            out[ExifTags.TAGS.get(tag, str(tag))] = value
+    for tag, name in _EXIF_IFDS.items():
+        tags = ExifTags.GPSTAGS if name == 'GPSInfo' else ExifTags.TAGS
+        ifd = {tags.get(k, str(k)): v for k, v in ((k, _exif_value(v)) for k, v in exif.get_ifd(tag).items())
+               if v is not None}
+        if ifd:
+            out[name] = ifd
+    return out
+
+
+def read_header(src_path: str) -> dict:
+    """Dimensions, format, orientation and EXIF from the file header, without decoding pixels.
+
+    ``Image.open`` only parses headers until ``load()``; ``getexif()`` reads the
+    EXIF segment. Width and height are as displayed (EXIF rotation applied).
+    Files Pillow cannot parse still get a MIME type sniffed from magic bytes.
+    """
+    try:
+        with Image.open(src_path) as im:
+            width, height = im.size
+            exif = im.getexif()
+            orientation = exif.get(ExifTags.Base.Orientation)
+            if orientation in _TRANSPOSED:
+                width, height = height, width
+            return {'width': width, 'height': height, 'format': im.format,
+                    'mime': im.get_format_mimetype() or Image.MIME.get(im.format),
+                    'orientation': orientation, 'exif': _exif_dict(exif) or None}
+    except RENDER_ERRORS:
+        kind = filetype.guess(src_path)
+        return {'width': None, 'height': None, 'format': None,
+                'mime': kind.mime if kind else 'application/octet-stream', 'orientation': None, 'exif': None}
+
+
+def read_headers(paths: list[str]) -> list[dict]:
+    return [read_header(p) for p in paths]
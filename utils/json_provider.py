@@ -0,0 +1,65 @@
+"""JSON provider backed by orjson when it is installed (``JSON_PROVIDER``).
+
+orjson encodes straight to UTF-8 bytes several times faster than the stdlib
+encoder, which matters for listing and search pages of hundreds of images.
+Output matches ``DefaultJSONProvider`` except that non-ASCII text is sent as
+UTF-8 instead of ``\\uXXXX`` escapes (the same JSON once decoded):
+
+* dict keys are sorted when ``sort_keys`` is set, as by default
+* ``datetime``/``date`` still go through Flask's ``default`` (HTTP dates)
+* debug mode / ``compact = False`` responses and calls with ``json.dumps``
+  options orjson has no equivalent for (``indent``, ``cls``...) use the
+  stdlib encoder, as do values orjson rejects (e.g. integers above 64 bits)
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: DefaultJSONProvider is used instead
+    orjson = None
+
+# dumps() keywords orjson covers; with any other the stdlib encoder runs
+_ORJSON_KWARGS = {'ensure_ascii', 'sort_keys', 'separators'}
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def _options(self, sort_keys: bool) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+        return options | orjson.OPT_SORT_KEYS if sort_keys else options
+
+    def _dumpb(self, obj, sort_keys: bool) -> bytes | None:
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(sort_keys))
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not kwargs.keys() <= _ORJSON_KWARGS or kwargs.get('separators', (',', ':')) != (',', ':'):
+            return super().dumps(obj, **kwargs)
+        data = self._dumpb(obj, kwargs.get('sort_keys', self.sort_keys))
+        return data.decode() if data is not None else super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = self._dumpb(obj, self.sort_keys)
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the provider chosen by ``JSON_PROVIDER``: auto (orjson if installed), orjson or std."""
+    choice = app.config.get('JSON_PROVIDER', 'auto')
+    if choice not in ('auto', 'orjson', 'std'):
+        raise ValueError(f'JSON_PROVIDER must be auto, orjson or std, not {choice!r}')
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+    if choice != 'std' and orjson is not None:
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,336 @@
+"""Local vector index backing /search/similar.
+
+On-disk layout (one directory per embedding model)::
+
+    meta.json       {"dim": 128, "dtype": "float32"}
+    vectors.bin     row-major (n, dim) matrix, appended in place
+    ids.bin         int64 image id per row
+    deleted.bin     uint8 tombstone flag per row
+    ivf_*.npy       optional inverted-file index (see ``build_ivf``)
+
+All files are memory-mapped read-only by searchers, so every worker on a host
+shares one copy through the page cache instead of loading vectors into its own
+heap. Writers append under an advisory file lock; ``ids.bin`` is written last,
+so its length is the committed row count, and the next append first truncates
+whatever a crashed writer left past it in the other files. Updating an id
+tombstones its old row and appends a new one; ``compact`` rewrites the files
+without dead rows.
+
+Search is exact by default: blocks of rows are scored with one matrix product
+per block and reduced with ``argpartition``. Above ``ann_threshold`` live rows
+an IVF index, if built, limits scoring to the ``nprobe`` closest clusters plus
+the rows appended since the index was built. Vectors are expected to be
+L2-normalised, so scores are cosine similarities.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+BLOCK_ROWS = 65536
+
+
+class VectorStore:
+    def __init__(self, root: str, dim: int, dtype: str = 'float32', ann_threshold: int = 1_000_000, nprobe: int = 16):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        meta_path = os.path.join(root, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['dim'] != dim:
+                raise ValueError(f'vector store at {root} has dim {meta["dim"]}, expected {dim}')
+            dtype = meta['dtype']
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({'dim': dim, 'dtype': dtype}, f)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        for name in ('vectors.bin', 'ids.bin', 'deleted.bin'):
+            open(self._path(name), 'ab').close()
+        self._n = -1
+        self._ivf_mtime = None
+        self._ivf = None
+        self._map_lock = threading.Lock()
+        self._refresh()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    # -- mapping -----------------------------------------------------------
+
+    def _committed_rows(self) -> int:
+        return os.path.getsize(self._path('ids.bin')) // 8
+
+    def _refresh(self):
+        """Remap if another process appended rows or rebuilt the IVF index."""
+        n = self._committed_rows()
+        with self._map_lock:
+            if n != self._n:
+                if n:
+                    self._vectors = np.memmap(self._path('vectors.bin'), dtype=self.dtype, mode='r', shape=(n, self.dim))
+                    self._ids = np.memmap(self._path('ids.bin'), dtype=np.int64, mode='r', shape=(n,))
+                    self._deleted = np.memmap(self._path('deleted.bin'), dtype=np.uint8, mode='r', shape=(n,))
+                else:
+                    self._vectors = np.empty((0, self.dim), dtype=self.dtype)
+                    self._ids = np.empty(0, dtype=np.int64)
+                    self._deleted = np.empty(0, dtype=np.uint8)
+                self._n = n
+            ivf_meta = self._path('ivf_meta.json')
+            mtime = os.path.getmtime(ivf_meta) if os.path.exists(ivf_meta) else None
+            if mtime != self._ivf_mtime:
+                self._ivf = self._load_ivf() if mtime else None
+                self._ivf_mtime = mtime
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self._path('.lock'), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        self._refresh()
+        return int(self._n - np.count_nonzero(self._deleted))
+
+    # -- writes ------------------------------------------------------------
+
+    def _tombstone_rows(self, rows):
+        if len(rows) == 0:
+            return
+        deleted = np.memmap(self._path('deleted.bin'), dtype=np.uint8, mode='r+', shape=(self._committed_rows(),))
+        deleted[rows] = 1
+        deleted.flush()
+
+    def _live_rows_for(self, ids) -> np.ndarray:
+        self._refresh()
+        if not self._n:
+            return np.empty(0, dtype=np.int64)
+        mask = np.isin(self._ids, np.asarray(ids, dtype=np.int64)) & (self._deleted == 0)
+        return np.flatnonzero(mask)
+
+    def _truncate_uncommitted(self):
+        """Drop the tail of an append that crashed before ``ids.bin`` was written (call under the write lock).
+
+        Rows are addressed by position in all three files, so leftover vector or
+        tombstone bytes would shift every later append against its id.
+        """
+        n = self._committed_rows()
+        for name, size in (('vectors.bin', n * self.dim * self.dtype.itemsize), ('deleted.bin', n),
+                           ('ids.bin', n * 8)):
+            if os.path.getsize(self._path(name)) != size:
+                os.truncate(self._path(name), size)
+
+    def add(self, ids, vectors):
+        """Append vectors; ids that already exist are replaced (old rows tombstoned)."""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if not len(ids):
+            return
+        with self._write_lock():
+            self._truncate_uncommitted()
+            self._tombstone_rows(self._live_rows_for(ids))
+            # vectors first, ids last: a row only becomes visible once its id is written
+            with open(self._path('vectors.bin'), 'ab') as f:
+                f.write(vectors.astype(self.dtype).tobytes())
+            with open(self._path('deleted.bin'), 'ab') as f:
+                f.write(bytes(len(ids)))
+            with open(self._path('ids.bin'), 'ab') as f:
+                f.write(ids.tobytes())
+        self._refresh()
+
+    def remove(self, ids):
+        with self._write_lock():
+            self._tombstone_rows(self._live_rows_for(ids))
+        self._refresh()
+
+    def get(self, image_id: int) -> np.ndarray | None:
+        rows = self._live_rows_for([image_id])
+        if not len(rows):
+            return None
+        return np.asarray(self._vectors[rows[-1]], dtype=np.float32)
+
+    # -- search ------------------------------------------------------------
+
+    @staticmethod
+    def _merge_topk(scores, rows, k):
+        if scores.shape[1] > k:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, part, axis=1)
+            rows = np.take_along_axis(rows, part, axis=1)
+        return scores, rows
+
+    def _score_rows(self, queries, k, row_ranges=None, row_index=None):
+        """Top-k over contiguous ranges or an explicit row array, in bounded blocks."""
+        m = queries.shape[0]
+        best_s = np.empty((m, 0), dtype=np.float32)
+        best_r = np.empty((m, 0), dtype=np.int64)
+
+        def blocks():
+            if row_index is not None:
+                for start in range(0, len(row_index), BLOCK_ROWS):
+                    rows = np.sort(row_index[start:start + BLOCK_ROWS])
+                    yield rows, self._vectors[rows], self._deleted[rows]
+            for lo, hi in row_ranges or ():
+                for start in range(lo, hi, BLOCK_ROWS):
+                    end = min(start + BLOCK_ROWS, hi)
+                    yield np.arange(start, end), self._vectors[start:end], self._deleted[start:end]
+
+        for rows, block, dead in blocks():
+            if not len(rows):
+                continue
+            scores = queries @ np.asarray(block, dtype=np.float32).T
+            scores[:, dead.astype(bool)] = -np.inf
+            kk = min(k, scores.shape[1])
+            scores, idx = self._merge_topk(scores, np.broadcast_to(rows, scores.shape), kk)
+            best_s, best_r = self._merge_topk(np.hstack([best_s, scores]), np.hstack([best_r, idx]), k)
+        return best_s, best_r
+
+    def search(self, query, k: int = 10, mode: str = 'auto', exclude: set | None = None):
+        return self.search_batch(np.asarray(query, dtype=np.float32)[None, :], k, mode, exclude)[0]
+
+    def search_batch(self, queries, k: int = 10, mode: str = 'auto', exclude: set | None = None):
+        """Return ``[(image_id, score), ...]`` best first for each query row."""
+        self._refresh()
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self._n or k <= 0:
+            return [[] for _ in range(len(queries))]
+        want = k + len(exclude or ())
+        use_ivf = self._ivf is not None and (mode == 'ivf' or (mode == 'auto' and self._n >= self.ann_threshold))
+        results = []
+        if use_ivf:
+            for q in queries:
+                scores, rows = self._score_rows(q[None, :], want, row_ranges=[(self._ivf['built'], self._n)],
+                                                row_index=self._ivf_candidates(q))
+                results.append(self._finish(scores[0], rows[0], k, exclude))
+        else:
+            scores, rows = self._score_rows(queries, want, row_ranges=[(0, self._n)])
+            results = [self._finish(s, r, k, exclude) for s, r in zip(scores, rows)]
+        return results
+
+    def _finish(self, scores, rows, k, exclude):
+        order = np.argsort(-scores, kind='stable')
+        out = []
+        for i in order:
+            if not np.isfinite(scores[i]):
+                break
+            image_id = int(self._ids[rows[i]])
+            if exclude and image_id in exclude:
+                continue
+            out.append((image_id, float(scores[i])))
+            if len(out) == k:
+                break
+        return out
+
+    # -- IVF ---------------------------------------------------------------
+
+    def _load_ivf(self):
+        with open(self._path('ivf_meta.json')) as f:
+            meta = json.load(f)
+        return {
+            'built': meta['built'],
+            'centroids': np.load(self._path('ivf_centroids.npy')),
+            'order': np.load(self._path('ivf_order.npy'), mmap_mode='r'),
+            'offsets': np.load(self._path('ivf_offsets.npy')),
+        }
+
+    def _ivf_candidates(self, q) -> np.ndarray:
+        ivf = self._ivf
+        nprobe = min(self.nprobe, len(ivf['centroids']))
+        probes = np.argpartition(-(ivf['centroids'] @ q), nprobe - 1)[:nprobe]
+        offsets = ivf['offsets']
+        parts = [ivf['order'][offsets[c]:offsets[c + 1]] for c in probes]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _assign(self, centroids, lo, hi) -> np.ndarray:
+        out = np.empty(hi - lo, dtype=np.int32)
+        for start in range(lo, hi, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, hi)
+            block = np.asarray(self._vectors[start:end], dtype=np.float32)
+            out[start - lo:end - lo] = np.argmax(block @ centroids.T, axis=1)
+        return out
+
+    def build_ivf(self, nlist: int | None = None, iters: int = 10, sample: int = 256, seed: int = 0):
+        """Train spherical k-means on a sample and write inverted lists for all current rows."""
+        self._refresh()
+        n = self._n
+        if not n:
+            return 0
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(seed)
+        picks = np.sort(rng.choice(n, size=min(n, nlist * sample), replace=False))
+        x = np.asarray(self._vectors[picks], dtype=np.float32)
+        centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(x @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, x)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+
+        assign = self._assign(centroids, 0, n)
+        order = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        with self._write_lock():
+            np.save(self._path('ivf_centroids.npy'), centroids.astype(np.float32))
+            np.save(self._path('ivf_order.npy'), order)
+            np.save(self._path('ivf_offsets.npy'), offsets)
+            tmp = self._path('ivf_meta.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump({'built': n, 'nlist': nlist}, f)
+            os.replace(tmp, self._path('ivf_meta.json'))
+        self._refresh()
+        return nlist
+
+    def compact(self):
+        """Rewrite the files without tombstoned rows (drops the IVF index)."""
+        with self._write_lock():
+            self._refresh()
+            live = np.flatnonzero(self._deleted == 0)
+            for name, arr in (('vectors.bin', self._vectors), ('ids.bin', self._ids)):
+                tmp = self._path(name + '.tmp')
+                with open(tmp, 'wb') as f:
+                    for start in range(0, len(live), BLOCK_ROWS):
+                        f.write(np.ascontiguousarray(arr[live[start:start + BLOCK_ROWS]]).tobytes())
+                os.replace(tmp, self._path(name))
+            with open(self._path('deleted.bin'), 'wb') as f:
+                f.write(bytes(len(live)))
+            for name in ('ivf_meta.json', 'ivf_centroids.npy', 'ivf_order.npy', 'ivf_offsets.npy'):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._n = -1
+        self._refresh()
+        return len(live)
+
+
+def get_vector_store(name: str, dim: int) -> VectorStore:
+    """Per-app handle on the store for one embedding model."""
+    app = current_app._get_current_object()
+    stores = app.extensions.setdefault('vector_stores', {})
+    store = stores.get(name)
+    if store is None:
+        root = app.config.get('VECTOR_DIR') or os.path.join(app.config['UPLOAD_FOLDER'], '.vectors')
+        store = VectorStore(os.path.join(root, name), dim,
+                            dtype=app.config.get('VECTOR_DTYPE', 'float32'),
+                            ann_threshold=app.config.get('VECTOR_ANN_THRESHOLD', 1_000_000),
+                            nprobe=app.config.get('VECTOR_NPROBE', 16))
+        stores[name] = store
+    return store